@@ -0,0 +1,389 @@
+"""Economy load generator and latency benchmark.
+
+Drives the Economy, Gambling, Shop, Fishing and Trading command callbacks
+with fake contexts (see benchmarks/fakes.py) from N concurrent simulated
+users, against the in-memory/SQLite backend or a local mongod:
+
+    python -m benchmarks.economy_load --users 50 --duration 30
+    python -m benchmarks.economy_load --backend mongo --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.economy_load --compare before.json after.json
+
+Callbacks are called directly, so cooldowns and argument converters are
+skipped. Each run writes a JSON report with:
+- throughput and p50/p95/p99 latency, overall and per command
+- DB calls per command, measured by running each command alone first
+  (driver commands on mongo, collection operations on the other backends)
+- lost updates: users whose wallet/bank differ from the sum of their
+  ledger entries once the ledger is flushed
+
+Never point --mongo-uri at a production database: the run writes to and
+finally drops the benchmark users."""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+# Command -> relative weight in the mix
+DEFAULT_MIX = {"bal": 30, "dep": 10, "slots": 20, "bj": 15, "fish": 10, "buy": 10, "trade": 5}
+
+STARTING_WALLET = 1000000
+BENCH_GUILD_ID = 900000000000000000
+BENCH_USER_BASE = 910000000000000000
+
+def percentile(samples: list, q: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+def summarize(samples: list) -> dict:
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else None,
+        "p50_ms": percentile(samples, 0.50),
+        "p95_ms": percentile(samples, 0.95),
+        "p99_ms": percentile(samples, 0.99),
+        "max_ms": round(max(samples), 3) if samples else None,
+    }
+
+class EconomyLoad:
+    def __init__(self, args):
+        self.args = args
+        self.mix = args.mix
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.error_samples = []
+
+    async def setup(self):
+        # Imported here so DB_BACKEND/MONGO_URI from the command line apply
+        from utils.db import async_db, ledger_reason, mongo_metrics
+        from cogs.economy.Economy import Economy
+        from cogs.economy.Gambling import Gambling
+        from cogs.economy.Shop import Shop
+        from cogs.economy.Fishing import Fishing
+        from cogs.economy.Trading import Trading
+        from benchmarks import fakes
+
+        self.db = async_db
+        self.ledger_reason = ledger_reason
+        self.mongo_metrics = mongo_metrics
+        self.fakes = fakes
+        if not await self.db.ensure_connected():
+            raise SystemExit("Database unavailable")
+
+        self.bot = fakes.FakeBot()
+        self.guild = fakes.FakeGuild(BENCH_GUILD_ID)
+        self.channel = fakes.FakeChannel(self.guild)
+        self.cogs = {
+            "economy": Economy(self.bot),
+            "gambling": Gambling(self.bot),
+            "shop": Shop(self.bot),
+            "fishing": Fishing(self.bot),
+            "trading": Trading(self.bot),
+        }
+        self.users = [fakes.FakeMember(BENCH_USER_BASE + i, self.guild) for i in range(self.args.users)]
+        for user in self.users:
+            self.bot.users[user.id] = user
+        self.guild.members = self.users
+        self.guild.member_count = len(self.users)
+        self.locks = {user.id: asyncio.Lock() for user in self.users}
+
+        await self.cleanup()
+        self.ledger_reason.set("benchmark_seed")
+        rod = self.cogs["shop"].FISHING_ITEMS["beginner_rod"]
+        for user in self.users:
+            await self.db.update_wallet(user.id, STARTING_WALLET, self.guild.id)
+            await self.db.add_fishing_item(user.id, rod, "rod")
+        await self.db.flush_ledger()
+
+    async def cleanup(self):
+        """Drop the benchmark users' documents and ledger entries"""
+        ids = [str(user.id) for user in self.users]
+        await self.db.db.users.delete_many({"_id": {"$in": ids}})
+        await self.db.db.fish.delete_many({"user_id": {"$in": ids}})
+        await self.db.db.trade_history.delete_many({"guild_id": str(self.guild.id)})
+        now = datetime.datetime.utcnow()
+        for partition in self.db._ledger_partitions_since(now - datetime.timedelta(days=1)):
+            await self.db.db[partition].delete_many({"user_id": {"$in": ids}})
+        for user in self.users:
+            self.db.invalidate_user(user.id)
+
+    # Commands: each takes the acting user and returns the contexts it used
+
+    def ctx(self, user):
+        return self.fakes.FakeContext(self.bot, user, self.channel)
+
+    async def cmd_bal(self, user):
+        ctx = self.ctx(user)
+        cog = self.cogs["economy"]
+        await cog.balance.callback(cog, ctx)
+        return [ctx]
+
+    async def cmd_dep(self, user):
+        ctx = self.ctx(user)
+        cog = self.cogs["economy"]
+        await cog.deposit.callback(cog, ctx, random.choice(["100", "10%", "1k"]))
+        return [ctx]
+
+    async def cmd_slots(self, user):
+        ctx = self.ctx(user)
+        cog = self.cogs["gambling"]
+        await cog.slots.callback(cog, ctx, "50")
+        return [ctx]
+
+    async def cmd_bj(self, user):
+        ctx = self.ctx(user)
+        cog = self.cogs["gambling"]
+        await cog.blackjack.callback(cog, ctx, "50")
+        # Hit once half the time, then stand if the game is still running
+        for label in (["Hit"] if random.random() < 0.5 else []) + ["Stand"]:
+            message = ctx.last_view
+            if message is None or user.id not in cog.active_games:
+                break
+            button = self.fakes.find_button(message.view, label)
+            await button.callback(self.fakes.FakeInteraction(user, message))
+        cog.active_games.discard(user.id)
+        return [ctx]
+
+    async def cmd_fish(self, user):
+        ctx = self.ctx(user)
+        cog = self.cogs["fishing"]
+        items = await self.db.get_fishing_items(user.id)
+        if not items["bait"]:
+            await self.cmd_buy(user, "beginner_bait")
+        await cog.fish.callback(cog, ctx)
+        return [ctx]
+
+    async def cmd_buy(self, user, item_id: str = "pro_bait"):
+        ctx = self.ctx(user)
+        cog = self.cogs["shop"]
+        await cog.buy.callback(cog, ctx, args=item_id)
+        return [ctx]
+
+    async def cmd_trade(self, user, partner):
+        cog = self.cogs["trading"]
+        ctx, partner_ctx = self.ctx(user), self.ctx(partner)
+        await cog.trade_offer.callback(cog, ctx, partner)
+        await cog.trade_add_money.callback(cog, ctx, random.randint(1, 100))
+        await cog.trade_send.callback(cog, ctx)
+        message = ctx.last_view
+        if message is not None:
+            view = message.view
+            for member in (user, partner):
+                button = self.fakes.find_button(view, "Confirm")
+                await button.callback(self.fakes.FakeInteraction(member, message))
+            # Completed trades stay in active_trades; drop it so the next
+            # offer by either user isn't attached to this one
+            cog.active_trades.pop(view.trade_offer.trade_id, None)
+        return [ctx, partner_ctx]
+
+    async def run_command(self, name: str, user) -> None:
+        participants = [user]
+        args = ()
+        if name == "trade":
+            partner = random.choice([u for u in self.users if u.id != user.id])
+            participants.append(partner)
+            args = (partner,)
+        # One command per user at a time, like real users; trades lock both
+        # sides in id order so two trades can't deadlock
+        locks = [self.locks[u.id] for u in sorted(participants, key=lambda u: u.id)]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            self.ledger_reason.set(name)
+            start = time.perf_counter()
+            try:
+                contexts = await getattr(self, f"cmd_{name}")(user, *args)
+            except Exception as e:
+                self.errors[name] += 1
+                if len(self.error_samples) < 20:
+                    self.error_samples.append(f"{name}: {type(e).__name__}: {e}")
+                return
+            self.latencies[name].append((time.perf_counter() - start) * 1000)
+            if any(ctx.rejected for ctx in contexts):
+                self.rejected[name] += 1
+        finally:
+            for lock in locks:
+                lock.release()
+
+    # Phases
+
+    def db_call_count(self) -> int:
+        client = self.db.client
+        if hasattr(client, "opcounters"):
+            return sum(client.opcounters.values())
+        return sum(hist["count"] for hist in self.mongo_metrics.stats()["commands"].values())
+
+    async def profile_db_calls(self, rounds: int = 20) -> dict:
+        """Average DB calls per command, each command run on its own"""
+        calls = {}
+        for name in self.mix:
+            before = self.db_call_count()
+            for _ in range(rounds):
+                await self.run_command(name, random.choice(self.users))
+            await asyncio.sleep(0)
+            calls[name] = round((self.db_call_count() - before) / rounds, 2)
+        self.latencies.clear()
+        self.errors.clear()
+        self.rejected.clear()
+        return calls
+
+    async def simulated_user(self, user, deadline: float, names: list, weights: list):
+        while time.perf_counter() < deadline:
+            await self.run_command(random.choices(names, weights)[0], user)
+            if self.args.think_ms:
+                await asyncio.sleep(random.uniform(0, 2 * self.args.think_ms) / 1000)
+
+    async def check_lost_updates(self) -> dict:
+        """Compare each user's balances with the sum of their ledger deltas"""
+        await self.db.flush_ledger()
+        ids = [str(user.id) for user in self.users]
+        ledger = defaultdict(int)
+        since = self.started_at - datetime.timedelta(days=1)
+        for partition in self.db._ledger_partitions_since(since):
+            results = await self.db.db[partition].aggregate([
+                {"$match": {"user_id": {"$in": ids}}},
+                {"$group": {"_id": {"user": "$user_id", "account": "$account"}, "delta": {"$sum": "$delta"}}}
+            ]).to_list(None)
+            for result in results:
+                ledger[(result["_id"]["user"], result["_id"]["account"])] += result["delta"]
+
+        mismatched, drift = [], 0
+        async for doc in self.db.db.users.find({"_id": {"$in": ids}}, {"wallet": 1, "bank": 1}):
+            for account in ("wallet", "bank"):
+                difference = doc.get(account, 0) - ledger[(doc["_id"], account)]
+                if difference:
+                    mismatched.append(doc["_id"])
+                    drift += abs(difference)
+        return {"users_checked": len(ids), "lost_updates": len(mismatched), "total_drift": drift}
+
+    async def run(self) -> dict:
+        await self.setup()
+        random.seed(self.args.seed)
+        db_calls = await self.profile_db_calls()
+
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        self.started_at = datetime.datetime.utcnow()
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        await asyncio.gather(*(self.simulated_user(user, deadline, names, weights) for user in self.users))
+        elapsed = time.perf_counter() - start
+
+        consistency = await self.check_lost_updates()
+        all_samples = [sample for samples in self.latencies.values() for sample in samples]
+        report = {
+            "benchmark": "economy_load",
+            "started_at": self.started_at.isoformat(),
+            "config": {
+                "backend": self.args.backend,
+                "users": self.args.users,
+                "duration_s": self.args.duration,
+                "think_ms": self.args.think_ms,
+                "seed": self.args.seed,
+                "mix": self.mix,
+                "python": sys.version.split()[0],
+            },
+            "elapsed_s": round(elapsed, 3),
+            "commands": len(all_samples),
+            "throughput_per_s": round(len(all_samples) / elapsed, 2) if elapsed else 0,
+            "latency": summarize(all_samples),
+            "per_command": {
+                name: {
+                    **summarize(self.latencies[name]),
+                    "errors": self.errors[name],
+                    "rejected": self.rejected[name],
+                    "db_calls": db_calls.get(name),
+                }
+                for name in names
+            },
+            "errors": sum(self.errors.values()),
+            "error_samples": self.error_samples,
+            **consistency,
+        }
+        if not self.args.keep_data:
+            await self.cleanup()
+        await self.db.close()
+        return report
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print throughput and per-command latency changes between two reports"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        if not old or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"throughput: {before['throughput_per_s']} -> {after['throughput_per_s']}/s "
+          f"({change(before['throughput_per_s'], after['throughput_per_s'])})")
+    print(f"lost updates: {before['lost_updates']} -> {after['lost_updates']}")
+    print(f"{'command':<8}{'p50 before':>12}{'p50 after':>11}{'p99 before':>12}{'p99 after':>11}{'db calls':>14}")
+    for name, old in before["per_command"].items():
+        new = after["per_command"].get(name, {})
+        print(f"{name:<8}{old['p50_ms'] or 0:>12.2f}{new.get('p50_ms') or 0:>11.2f}"
+              f"{old['p99_ms'] or 0:>12.2f}{new.get('p99_ms') or 0:>11.2f}"
+              f"{str(old['db_calls']) + ' -> ' + str(new.get('db_calls')):>14}")
+
+def parse_mix(value: str) -> dict:
+    """'bal=30,slots=20' -> {'bal': 30, 'slots': 20}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown command {name!r}, expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=50, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--backend", choices=("memory", "sqlite", "mongo"), default="memory")
+    parser.add_argument("--mongo-uri", help="mongod to use with --backend mongo")
+    parser.add_argument("--sqlite-path", default="data/benchmark.db")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="command weights, e.g. bal=30,slots=20")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's commands")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true", help="leave the benchmark users in the database")
+    parser.add_argument("--out", help="JSON report path (default benchmarks/results/economy-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare)
+    if args.users < 2:
+        parser.error("--users must be at least 2 (trades need a partner)")
+
+    os.environ["DB_BACKEND"] = args.backend
+    os.environ["DB_SQLITE_PATH"] = args.sqlite_path
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+
+    report = asyncio.run(EconomyLoad(args).run())
+    out = args.out or os.path.join(
+        "benchmarks", "results", f"economy-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['commands']} commands in {report['elapsed_s']}s: {report['throughput_per_s']}/s, "
+          f"p50 {report['latency']['p50_ms']}ms, p99 {report['latency']['p99_ms']}ms, "
+          f"{report['errors']} errors, {report['lost_updates']} lost updates")
+    for name, stats in report["per_command"].items():
+        print(f"  {name:<6} n={stats['count']:<6} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms "
+              f"db_calls={stats['db_calls']} rejected={stats['rejected']} errors={stats['errors']}")
+    print(f"Report written to {out}")
+
+if __name__ == "__main__":
+    main()
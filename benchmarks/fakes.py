@@ -0,0 +1,165 @@
+"""Stand-ins for the discord.py objects economy command callbacks touch.
+
+Only what the Economy, Gambling, Shop, Fishing and Trading callbacks use is
+implemented: replies are recorded instead of sent, views are kept so the
+harness can press their buttons, and nothing talks to Discord."""
+import asyncio
+import itertools
+
+import discord
+
+_ids = itertools.count(1)
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, view=None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+    async def edit(self, content=None, embed=None, view=None, **kwargs):
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embed = embed
+        self.view = view
+
+    async def add_reaction(self, emoji):
+        pass
+
+    async def delete(self, **kwargs):
+        pass
+
+class FakeChannel:
+    def __init__(self, guild):
+        self.id = next(_ids)
+        self.guild = guild
+        self.messages = []
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        message = FakeMessage(self, content, embed, view)
+        self.messages.append(message)
+        return message
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str = "Benchmark Guild"):
+        self.id = guild_id
+        self.name = name
+        self.members = []
+        self.member_count = 0
+
+class FakeMember:
+    def __init__(self, user_id: int, guild: FakeGuild):
+        self.id = user_id
+        self.guild = guild
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.color = discord.Color.default()
+        self.colour = self.color
+        self.bot = False
+        self.display_avatar = None
+        self.avatar = None
+
+    def __eq__(self, other):
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, *, embed=None, view=None, ephemeral=False, **kwargs):
+        self._done = True
+        self.interaction.replies.append(FakeMessage(None, content, embed, view))
+
+    async def edit_message(self, *, content=None, embed=None, view=None, **kwargs):
+        self._done = True
+        if self.interaction.message is not None:
+            await self.interaction.message.edit(content=content, embed=embed, view=view)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+class FakeInteraction:
+    """A button press by user on message"""
+
+    def __init__(self, user: FakeMember, message: FakeMessage = None):
+        self.user = user
+        self.guild = user.guild
+        self.message = message
+        self.replies = []
+        self.response = FakeResponse(self)
+
+class FakeContext:
+    """commands.Context for one invocation by author"""
+
+    def __init__(self, bot, author: FakeMember, channel: FakeChannel):
+        self.bot = bot
+        self.author = author
+        self.guild = author.guild
+        self.channel = channel
+        self.prefix = "."
+        self.invoked_subcommand = None
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        message = await self.channel.send(content, **kwargs)
+        self.replies.append(message)
+        return message
+
+    async def reply(self, content=None, **kwargs):
+        return await self.send(content, **kwargs)
+
+    @property
+    def last_view(self):
+        """View attached to the latest reply, if any"""
+        for message in reversed(self.replies):
+            if message.view is not None:
+                return message
+        return None
+
+    @property
+    def rejected(self) -> bool:
+        """Whether the command answered with an ❌ error message"""
+        return any(
+            (message.content or "").startswith("❌") or (message.embed and (message.embed.title or "").startswith("❌"))
+            for message in self.replies
+        )
+
+class FakeBot:
+    """Just enough of commands.Bot for the cogs' constructors and callbacks;
+    create it inside the running event loop"""
+
+    def __init__(self):
+        self.users = {}
+        self.user = None
+        self.loop = asyncio.get_running_loop()
+
+    def get_user(self, user_id: int):
+        return self.users.get(user_id)
+
+    async def fetch_user(self, user_id: int):
+        return self.users.get(user_id)
+
+    async def wait_for(self, event: str, *, timeout: float = None, check=None):
+        # Nobody reacts to confirmation prompts during a benchmark
+        raise asyncio.TimeoutError
+
+    def dispatch(self, event: str, *args, **kwargs):
+        pass
+
+def find_button(view, label: str):
+    """Button on view whose label starts with label (emoji prefixes ignored)"""
+    for item in getattr(view, "children", []):
+        item_label = (getattr(item, "label", None) or "").lstrip("✅❌ ")
+        if item_label.lower().startswith(label.lower()):
+            return item
+    return None
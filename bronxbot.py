@@ -5,12 +5,18 @@ import time
 import sys
 import os
 import asyncio
-import aiohttp
 import traceback
+import ast
+import importlib
+import importlib.util
 from discord.ext import commands, tasks
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from os import system
 import logging
+from utils.db import async_db, ledger_reason, mongo_metrics, db_timings, slow_queries
+from utils.stats import StatsAggregator, StatsPublisher
+from utils.chunking import GuildChunker, member_cache_flags, process_rss
+from utils.ipc import ClusterClient
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -28,6 +34,12 @@ MAIN_GUILD_IDS = [
     1142088882222022786   # Long Island
 ]
 
+# Dashboards update_stats posts to
+STATS_ENDPOINTS = {
+    'prod': 'https://bronxbot.onrender.com/api/stats',
+    'dev': 'http://localhost:5000/api/stats'
+}
+
 # setup
 intents = discord.Intents.default()
 intents.message_content = True
@@ -36,7 +48,7 @@ intents.guilds = True
 intents.reactions = True
 
 class BronxBot(commands.AutoShardedBot):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, cluster: ClusterClient = None, **kwargs):
         self.boot_metrics = {
             'start_time': time.time(),
             'config_load_time': 0,
@@ -57,6 +69,70 @@ class BronxBot(commands.AutoShardedBot):
         self.restart_message = None
         self.MAIN_GUILD_IDS = MAIN_GUILD_IDS
         self.guild_list = []  # Add this line to store guild IDs
+        self.stats = StatsAggregator(self)
+        self.stats_publisher = StatsPublisher(STATS_ENDPOINTS)
+        self.chunker = GuildChunker(self, MAIN_GUILD_IDS)
+        # Set when started by cluster.py, see utils/ipc.py
+        self.cluster = cluster
+        self._changed_users = set()  # user ids the other clusters should drop from their caches
+        self._changed_all = False
+        self._invalidation_task = None
+        for event, handler in self.stats.listeners().items():
+            self.add_listener(handler, event)
+
+    async def setup_hook(self):
+        """Load cogs once, before connecting; on_ready fires again on reconnects"""
+        if self.cluster:
+            self.cluster.on_shutdown = self.close
+            # Each cluster caches users for itself; keep them in step
+            self.cluster.on_connect = self._resync_user_cache
+            self.cluster.broadcast_handlers['user_cache'] = self._drop_users
+            async_db.user_cache.on_change = self._user_changed
+            self.cluster.start()
+        try:
+            logging.info("Loading cogs...")
+            success_count, error_count = await CogLoader.load_all_cogs(self)
+            logging.info(f"Loaded {success_count} cogs with {error_count} errors")
+        except Exception as e:
+            logging.error(f"Error during cog loading: {e}")
+            traceback.print_exc()
+
+    # User cache invalidation across clusters
+
+    def _user_changed(self, user_id: Optional[str]):
+        """Queue a user another cluster may have cached (None: everyone) to be
+        dropped there; queued users go out together once this task yields"""
+        if user_id is None:
+            self._changed_all = True
+        else:
+            self._changed_users.add(user_id)
+        if self._invalidation_task is None or self._invalidation_task.done():
+            self._invalidation_task = asyncio.get_running_loop().create_task(self._send_invalidations())
+
+    async def _send_invalidations(self):
+        while self._changed_users or self._changed_all:
+            users = None if self._changed_all else list(self._changed_users)
+            self._changed_users, self._changed_all = set(), False
+            await self.cluster.broadcast('user_cache', {'users': users})
+
+    def _drop_users(self, data: dict, from_cluster: int):
+        async_db.user_cache.drop(data.get('users'))
+
+    async def _resync_user_cache(self):
+        # Invalidations sent or received while disconnected were lost
+        async_db.user_cache.drop(None)
+        await self.cluster.broadcast('user_cache', {'users': None})
+
+    async def close(self):
+        """Flush buffered database writes before shutting down"""
+        try:
+            await async_db.close()
+        except Exception as e:
+            logging.error(f"Error flushing database on shutdown: {e}")
+        await self.stats_publisher.close()
+        if self.cluster:
+            await self.cluster.close()
+        await super().close()
 
     async def load_cog_with_timing(self, cog_name: str) -> Tuple[bool, float]:
         """Load a cog and measure its loading time"""
@@ -76,48 +152,37 @@ class BronxBot(commands.AutoShardedBot):
         """Update bot stats"""
         # Remove web interface stats update
         try:
-            stats = {
-                'server_count': len(self.guilds),
-                'user_count': sum(g.member_count for g in self.guilds),
-                'uptime': int(time.time() - self.start_time),
+            stats = self.stats.snapshot()
+            stats.update({
                 'latency': round(self.latency * 1000, 2),
-                'guilds': [str(g.id) for g in self.guilds],
-                'shard_count': self.shard_count,
-                'shard_stats': {
-                    str(shard_id): {
-                        'status': 'online',
-                        'latency': shard.latency * 1000,
-                        'guild_count': len([g for g in self.guilds if (g.id >> 22) % self.shard_count == shard_id]),
-                        'uptime': int(time.time() - self.start_time)
-                    }
-                    for shard_id, shard in enumerate(self.shards.values())
-                }
-            }
+                'database': async_db.health_status(),
+                'leaderboards': async_db.leaderboards.stats(),
+                'mongo': mongo_metrics.stats(),
+                'db_methods': db_timings.stats(),
+                'slow_queries': slow_queries.entries(20),
+                'publisher': self.stats_publisher.status(),
+                'member_cache': {**self.chunker.stats(), 'rss_bytes': process_rss()}
+            })
+            if self.cluster:
+                # The launcher merges every cluster's stats and posts them
+                await self.cluster.send({'op': 'stats', 'stats': stats})
+                return
+
             # Store stats locally
-            with open('data/stats.json', 'w') as f:
-                json.dump(stats, f, indent=2)
-            
+            await asyncio.to_thread(self._write_stats_file, stats)
+
             # Send stats to both prod and dev environments
-            async with aiohttp.ClientSession() as session:
-                endpoints = {
-                    'prod': 'https://bronxbot.onrender.com/api/stats',
-                    'dev': 'http://localhost:5000/api/stats'
-                }
-                
-                for env, url in endpoints.items():
-                    try:
-                        async with session.post(url, json=stats) as resp:
-                            result = await resp.text()
-                            if resp.status == 200:
-                                logging.info(f"[{env.upper()}] Stats updated successfully: {result}")
-                            else:
-                                logging.error(f"[{env.upper()}] Failed to update stats: {resp.status} - {result}")
-                                
-                    except Exception as e:
-                        logging.error(f"[{env.upper()}] Failed to update stats: {e}")
+            for env, delivered in (await self.stats_publisher.publish(stats)).items():
+                if delivered:
+                    logging.info(f"[{env.upper()}] Stats updated successfully")
         except Exception as e:
             logging.error(f"Error updating stats: {e}")
 
+    @staticmethod
+    def _write_stats_file(stats: dict):
+        with open('data/stats.json', 'w') as f:
+            json.dump(stats, f, separators=(',', ':'))
+
     @update_stats.before_loop
     async def before_update_stats(self):
         """Wait until the bot is ready before starting the stats update loop"""
@@ -127,13 +192,8 @@ class BronxBot(commands.AutoShardedBot):
     async def update_guilds(self):
         """Update guild list for the web interface"""
         try:
-            self.guild_list = [str(g.id) for g in self.guilds]
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post('https://bronxbot.onrender.com/api/stats', 
-                                      json={'guilds': self.guild_list}) as resp:
-                    if resp.status != 200:
-                        print(f"Failed to update guild list: {resp.status}")
+            # Guild changes reach the dashboard as update_stats deltas
+            self.guild_list = self.stats.guild_ids
         except Exception as e:
             print(f"Error updating guild list: {e}")
 
@@ -142,9 +202,21 @@ class BronxBot(commands.AutoShardedBot):
         await self.wait_until_ready()
 
 
-bot = BronxBot(command_prefix='.', intents=intents, shard_count=2, case_insensitive=True)
+# Guilds are chunked by bot.chunker instead of all at startup, see utils/chunking.py
+# Under cluster.py this process runs only its cluster's range of shards
+cluster = ClusterClient.from_env()
+shard_options = {'shard_count': cluster.shard_count, 'shard_ids': cluster.shard_ids} if cluster else {'shard_count': 2}
+bot = BronxBot(command_prefix='.', intents=intents, case_insensitive=True, cluster=cluster, **shard_options,
+               member_cache_flags=member_cache_flags(), chunk_guilds_at_startup=False)
 bot.remove_command('help')
 
+@bot.before_invoke
+async def tag_ledger_reason(ctx):
+    """Label balance changes made while a command runs with its name, and
+    start chunking the guild the first time it uses a command"""
+    ledger_reason.set(ctx.command.qualified_name)
+    bot.chunker.request(ctx.guild)
+
 # loading config
 COG_DATA = {
     "cogs": {
@@ -182,6 +254,12 @@ COG_DATA = {
     }
 }
 
+# Cogs that must finish loading before another starts. Cogs importing
+# another cog module (e.g. "from cogs.Help import ...") are added automatically.
+COG_DEPENDENCIES = {
+    "cogs.Status": ["cogs.Help"],
+}
+
 class CogLoader:
     @staticmethod
     def get_color_escape(color_name: str) -> str:
@@ -198,11 +276,108 @@ class CogLoader:
             tb = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
             return False, tb, time.time() - start
 
+    @staticmethod
+    def module_imports(cog: str) -> List[str]:
+        """Modules a cog imports at top level, read from its source"""
+        try:
+            spec = importlib.util.find_spec(cog)
+            with open(spec.origin) as f:
+                tree = ast.parse(f.read())
+        except Exception:
+            return []
+        modules = []
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                modules.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules.append(node.module)
+        return modules
+
+    @classmethod
+    def dependency_graph(cls, cogs: List[str]) -> Dict[str, List[str]]:
+        """cog -> cogs it waits for: COG_DEPENDENCIES plus cogs it imports.
+        Edges that would form a cycle are dropped with a warning."""
+        graph = {}
+        for cog in cogs:
+            deps = list(COG_DEPENDENCIES.get(cog, []))
+            deps += [module for module in cls.module_imports(cog) if module in cogs]
+            graph[cog] = [dep for dep in dict.fromkeys(deps) if dep in cogs and dep != cog]
+
+        def reaches(start: str, target: str, seen: set) -> bool:
+            if start == target:
+                return True
+            seen.add(start)
+            return any(reaches(dep, target, seen) for dep in graph[start] if dep not in seen)
+
+        for cog, deps in graph.items():
+            for dep in list(deps):
+                if reaches(dep, cog, set()):
+                    logging.warning(f"Ignoring cyclic cog dependency {cog} -> {dep}")
+                    deps.remove(dep)
+        return graph
+
+    @classmethod
+    def import_dependencies(cls, cog: str) -> float:
+        """Import everything a cog imports so load_extension finds it cached.
+        The cog module itself is left alone: load_extension executes it anew."""
+        start = time.time()
+        for module in cls.module_imports(cog):
+            try:
+                importlib.import_module(module)
+            except Exception:
+                pass  # load_extension reports the real error
+        return time.time() - start
+
+    @staticmethod
+    def critical_path(graph: Dict[str, List[str]], timings: Dict[str, dict]) -> List[str]:
+        """Chain of cogs that determined when loading finished: from the last
+        cog to finish, follow whichever dependency it was still waiting on"""
+        if not timings:
+            return []
+        cog = max(timings, key=lambda c: timings[c]['finished'])
+        path = [cog]
+        while True:
+            timing = timings[cog]
+            waited_for = [dep for dep in graph[cog] if dep in timings and timings[dep]['finished'] > timing['imported']]
+            if not waited_for:
+                break
+            cog = max(waited_for, key=lambda c: timings[c]['finished'])
+            path.append(cog)
+        return path[::-1]
+
     @classmethod
     async def load_all_cogs(cls, bot: BronxBot) -> Tuple[int, int]:
-        """Load all cogs and display results grouped by type"""
-        results = []
+        """Load all cogs concurrently, each once its dependencies are loaded,
+        and display results grouped by type.
+
+        Per cog, the import phase imports its dependencies in a worker thread
+        and the setup phase is load_extension (module body and setup()).
+        Timings and the critical path are recorded in bot.boot_metrics."""
         errors = []
+        cogs = list(COG_DATA["cogs"])
+        graph = cls.dependency_graph(cogs)
+        results = {}
+        timings = {}
+        tasks = {}
+        started = time.time()
+
+        async def load(cog: str):
+            import_time = await asyncio.to_thread(cls.import_dependencies, cog)
+            imported = time.time() - started
+            for dep in graph[cog]:
+                await tasks[dep]
+            results[cog] = await cls.load_extension_safe(bot, cog)
+            timings[cog] = {
+                'import': import_time,
+                'setup': results[cog][2],
+                'imported': imported,
+                'finished': time.time() - started
+            }
+
+        for cog in cogs:
+            tasks[cog] = asyncio.create_task(load(cog))
+        await asyncio.gather(*tasks.values())
+        total_time = time.time() - started
 
         print(f"{cls.get_color_escape('info')}=== COG LOADING STATUS ===\033[0m".center(100))
         
@@ -216,13 +391,16 @@ class CogLoader:
             cog_results = []
             
             for cog in cog_groups[cog_type]:
-                success, error, load_time = await cls.load_extension_safe(bot, cog)
+                success, error, _ = results[cog]
+                timing = timings[cog]
+                bot.cog_load_times[cog] = timing['import'] + timing['setup']
                 
                 status = "LOADED" if success else "ERROR"
                 color = cls.get_color_escape('success' if success else 'error')
                 cog_color = cls.get_color_escape(cog_type)
                 
-                line = f"[bronxbot] {cog_color}{cog:<24}\033[0m : {color}{status}\033[0m ({load_time:.2f}s)"
+                line = (f"[bronxbot] {cog_color}{cog:<24}\033[0m : {color}{status}\033[0m "
+                        f"(import {timing['import']:.2f}s, setup {timing['setup']:.2f}s)")
                 cog_results.append(line)
                 
                 if not success:
@@ -231,11 +409,21 @@ class CogLoader:
             print('\n'.join(cog_results))
             print()
 
+        path = cls.critical_path(graph, timings)
+        bot.boot_metrics.update({
+            'total_cog_load_time': total_time,
+            'cog_import_times': {cog: timing['import'] for cog, timing in timings.items()},
+            'cog_setup_times': {cog: timing['setup'] for cog, timing in timings.items()},
+            'cog_critical_path': path,
+            'cog_critical_path_time': timings[path[-1]]['finished'] if path else 0
+        })
+
         # summary
         success_count = len(COG_DATA["cogs"]) - len(errors)
         total = len(COG_DATA["cogs"])
         
-        print(f"{cls.get_color_escape('success' if not errors else 'warning')}[SUMMARY] Loaded {success_count}/{total} cogs ({len(errors)} errors)\033[0m")
+        print(f"{cls.get_color_escape('success' if not errors else 'warning')}[SUMMARY] Loaded {success_count}/{total} cogs ({len(errors)} errors) in {total_time:.2f}s\033[0m")
+        print(f"[SUMMARY] Critical path: {' -> '.join(path)} ({bot.boot_metrics['cog_critical_path_time']:.2f}s)")
         
         # detailed error report if needed
         if errors:
@@ -250,17 +438,13 @@ class CogLoader:
 async def on_ready():
     """Called when the bot is ready"""
     logging.info(f"Bot ready as {bot.user.name} ({bot.user.id})")
+    if bot.cluster:
+        # Lets a rolling restart move on to the next cluster
+        await bot.cluster.send({'op': 'ready'})
     
-    # Load all cogs using CogLoader
-    try:
-        logging.info("Loading cogs...")
-        success_count, error_count = await CogLoader.load_all_cogs(bot)
-        logging.info(f"Loaded {success_count} cogs with {error_count} errors")
-    except Exception as e:
-        logging.error(f"Error during cog loading: {e}")
-        traceback.print_exc()
-    
-    # Start the stats update loop after cogs are loaded
+    # Cogs were loaded in BronxBot.setup_hook
+
+    # Start the stats update loop
     if not hasattr(bot, 'update_stats'):
         logging.error("update_stats task not found")
         return
@@ -268,11 +452,8 @@ async def on_ready():
         bot.update_stats.start()
         logging.info("Started stats update loop")
 
-    guild_cache_start = time.time()
-    # Build guild cache
-    for guild in bot.guilds:
-        await guild.chunk()
-    bot.boot_metrics['guild_cache_time'] = time.time() - guild_cache_start
+    # Build guild cache for the main guilds; others are chunked on first use
+    bot.boot_metrics['guild_cache_time'] = await bot.chunker.chunk_priority_guilds()
     
     # Update presence
     await bot.change_presence(
@@ -289,7 +470,6 @@ async def on_ready():
             
             bot.boot_metrics['total_boot_time'] = time.time() - bot.boot_metrics['start_time']
             bot.boot_metrics['ready_time'] = time.time() - bot.start_time
-            bot.boot_metrics['total_cog_load_time'] = sum(bot.cog_load_times.values())
             
             boot_info = (
                 f"✅ Boot completed in `{bot.boot_metrics['total_boot_time']:.2f}s`\n\n"
@@ -297,6 +477,7 @@ async def on_ready():
                 f"• Config Load: `{bot.boot_metrics['config_load_time']:.2f}s`\n"
                 f"• Guild Cache: `{bot.boot_metrics['guild_cache_time']:.2f}s`\n"
                 f"• Total Cog Load: `{bot.boot_metrics['total_cog_load_time']:.2f}s`\n"
+                f"• Critical Path: `{' → '.join(c.split('.')[-1] for c in bot.boot_metrics.get('cog_critical_path', []))}`\n"
                 f"• Ready Time: `{bot.boot_metrics['ready_time']:.2f}s`\n\n"
                 f"**Individual Cog Load Times:**\n" + 
                 "\n".join([f"• `{cog.split('.')[-1]}: {time:.2f}s`" 
@@ -414,31 +595,51 @@ async def on_command_error(ctx: commands.Context, error: Exception):
         print(f"Unhandled error in {ctx.command}: {error}")
         traceback.print_exception(type(error), error, error.__traceback__)
 
+# Per cluster, so clusters restarting at once don't pick up each other's message
+RESTART_INFO_PATH = f"data/restart_info.{cluster.cluster_id}.json" if cluster else "data/restart_info.json"
+
 @bot.command(name="restart", aliases=["reboot"])
 @commands.is_owner()
-async def restart(ctx):
-    """Restart the bot"""
+async def restart(ctx, cluster_id: int = None):
+    """Restart the bot
+    Under cluster.py: a rolling restart of every cluster, or only cluster_id"""
+    if bot.cluster and cluster_id is not None and cluster_id != bot.cluster.cluster_id:
+        try:
+            await bot.cluster.request('restart', cluster=cluster_id)
+        except Exception as e:
+            return await ctx.reply(f"❌ Couldn't restart cluster {cluster_id}: {e}")
+        return await ctx.reply(f"🔄 Restarting cluster {cluster_id}...")
+
     embed = discord.Embed(
-        description="🔄 Restarting bot...",
+        description="🔄 Restarting bot..." if not bot.cluster else "🔄 Rolling restart of all clusters...",
         color=discord.Color.orange()
     )
     msg = await ctx.reply(embed=embed)
     
-    with open("data/restart_info.json", "w") as f:
+    with open(RESTART_INFO_PATH, "w") as f:
         json.dump({
             "channel_id": ctx.channel.id,
             "message_id": msg.id
         }, f)
     
+    if bot.cluster:
+        try:
+            await bot.cluster.request('restart', cluster=cluster_id)
+        except Exception as e:
+            os.remove(RESTART_INFO_PATH)
+            await msg.edit(embed=discord.Embed(description=f"❌ Restart failed: {e}", color=discord.Color.red()))
+        return
+    
+    await async_db.close()  # Flush buffered writes; execv skips normal shutdown
     os.execv(sys.executable, ['python'] + sys.argv)
 
-if os.path.exists("data/restart_info.json"):
+if os.path.exists(RESTART_INFO_PATH):
     try:
-        with open("data/restart_info.json", "r") as f:
+        with open(RESTART_INFO_PATH, "r") as f:
             restart_info = json.load(f)
             bot.restart_channel = restart_info["channel_id"]
             bot.restart_message = restart_info["message_id"]
-        os.remove("data/restart_info.json")
+        os.remove(RESTART_INFO_PATH)
     except Exception as e:
         print(f"Failed to load restart info: {e}")
 
@@ -448,19 +649,25 @@ if __name__ == "__main__":
     # Print startup info
     logging.info(f"Python version: {platform.python_version()}")
     logging.info(f"Discord.py version: {discord.__version__}")
-    logging.info(f"Starting BronxBot with {bot.shard_count} shards")
+    if cluster:
+        logging.info(f"Starting BronxBot cluster {cluster.cluster_id} with shards "
+                     f"{cluster.shard_ids[0]}-{cluster.shard_ids[-1]} of {cluster.shard_count}")
+    else:
+        logging.info(f"Starting BronxBot with {bot.shard_count} shards")
     
     # Run the Discord bot
     if dev:
         logging.info("Running in development mode")
-        system("clear" if os.name == "posix" else "cls")
-        if os.name == "posix":
+        if not cluster:  # clusters share the launcher's terminal
+            system("clear" if os.name == "posix" else "cls")
+        if os.name == "posix" and not cluster:
             sys.stdout.write("\x1b]2;BronxBot (DEV)\x07")
         bot.run(config['DEV_TOKEN'], log_handler=None)  # Disable default discord.py logging
     else:
         try:
-            system("clear" if os.name == "posix" else "cls")
-            if os.name == "posix":
+            if not cluster:  # clusters share the launcher's terminal
+                system("clear" if os.name == "posix" else "cls")
+            if os.name == "posix" and not cluster:
                 sys.stdout.write("\x1b]2;BronxBot\x07")
             bot.run(config['TOKEN'], log_handler=None)  # Disable default discord.py logging
         except Exception as e:
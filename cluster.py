@@ -0,0 +1,356 @@
+"""Cluster launcher: runs BronxBot as several processes, each owning a
+contiguous range of shards, so event handling isn't limited to one core.
+
+    python cluster.py --clusters 4 --shards 16
+
+Each cluster is `python bronxbot.py` started with BRONX_CLUSTER_ID,
+BRONX_SHARD_IDS, BRONX_SHARD_COUNT and BRONX_IPC_PATH, and connects back
+over a Unix socket (see utils/ipc.py). Through it the launcher:
+- collects every cluster's stats, and writes and posts the merged stats
+  to the dashboard (clusters don't post themselves)
+- answers `.shards` with every cluster's shards
+- forwards broadcasts between clusters, such as user cache invalidations
+- runs `.restart` as a rolling restart, one cluster at a time, each
+  waiting until the previous one is ready again
+- restarts clusters that exit unexpectedly, with backoff
+
+Clusters are started one after another (the next once the previous is
+ready, or after --spawn-timeout) to stay inside Discord's identify limit."""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from utils.ipc import MAX_MESSAGE_SIZE, encode, read_message, shard_ranges
+from utils.stats import StatsPublisher
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Dashboards the merged stats are posted to, as in bronxbot.py
+STATS_ENDPOINTS = {
+    'prod': 'https://bronxbot.onrender.com/api/stats',
+    'dev': 'http://localhost:5000/api/stats'
+}
+
+class Cluster:
+    """One bot process and its IPC connection"""
+
+    def __init__(self, cluster_id: int, shard_ids: List[int]):
+        self.id = cluster_id
+        self.shard_ids = shard_ids
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.ready = asyncio.Event()
+        self.stats: Optional[dict] = None
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+        self.stopping = False
+
+    @property
+    def status(self) -> str:
+        if self.process is None or self.process.returncode is not None:
+            return 'stopped'
+        return 'ready' if self.ready.is_set() else 'starting'
+
+    async def send(self, message: dict) -> bool:
+        if self.writer is None or self.writer.is_closing():
+            return False
+        self.writer.write(encode(message))
+        await self.writer.drain()
+        return True
+
+class ClusterLauncher:
+    def __init__(self, shard_count: int, clusters: int, ipc_path: str, stats_interval: float = 30,
+                 spawn_timeout: float = 120, stop_timeout: float = 30):
+        self.shard_count = shard_count
+        self.clusters = [Cluster(cluster_id, shard_ids)
+                         for cluster_id, shard_ids in enumerate(shard_ranges(shard_count, clusters))]
+        self.ipc_path = ipc_path
+        self.stats_interval = stats_interval
+        self.spawn_timeout = spawn_timeout
+        self.stop_timeout = stop_timeout
+        self.command = [sys.executable, os.path.join(ROOT, 'bronxbot.py')]
+        self.started_at = time.time()
+        self.publisher = StatsPublisher(STATS_ENDPOINTS)
+        self.logger = logging.getLogger('ClusterLauncher')
+        self._restart_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._guild_lists = None
+        self._guilds = []
+
+    # Processes
+
+    async def spawn(self, cluster: Cluster) -> None:
+        """Start cluster's process and wait until it is ready (or spawn_timeout)"""
+        cluster.ready.clear()
+        cluster.stats = None
+        cluster.stopping = False
+        env = {
+            **os.environ,
+            'BRONX_CLUSTER_ID': str(cluster.id),
+            'BRONX_SHARD_IDS': ','.join(map(str, cluster.shard_ids)),
+            'BRONX_SHARD_COUNT': str(self.shard_count),
+            'BRONX_IPC_PATH': self.ipc_path
+        }
+        cluster.process = await asyncio.create_subprocess_exec(*self.command, cwd=ROOT, env=env)
+        cluster.started_at = time.time()
+        self.logger.info(f"Cluster {cluster.id} (shards {cluster.shard_ids[0]}-{cluster.shard_ids[-1]}) "
+                         f"started as pid {cluster.process.pid}")
+        asyncio.get_running_loop().create_task(self._watch(cluster, cluster.process))
+        try:
+            await asyncio.wait_for(cluster.ready.wait(), self.spawn_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Cluster {cluster.id} not ready after {self.spawn_timeout:.0f}s, continuing")
+
+    async def _watch(self, cluster: Cluster, process: asyncio.subprocess.Process) -> None:
+        """Restart cluster with backoff if its process exits on its own"""
+        code = await process.wait()
+        if cluster.stopping or self._stopping.is_set() or cluster.process is not process:
+            return
+        cluster.restarts += 1
+        delay = min(60, 2 ** min(cluster.restarts, 6))
+        self.logger.error(f"Cluster {cluster.id} exited with {code}, restarting in {delay}s")
+        await asyncio.sleep(delay)
+        if not self._stopping.is_set() and cluster.process is process:
+            async with self._restart_lock:
+                await self.spawn(cluster)
+
+    async def stop(self, cluster: Cluster) -> None:
+        """Ask cluster to shut down cleanly; terminate, then kill, if it doesn't"""
+        cluster.stopping = True
+        process = cluster.process
+        if process is None or process.returncode is not None:
+            return
+        if not await cluster.send({'op': 'shutdown'}):
+            process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), self.stop_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Cluster {cluster.id} didn't stop in {self.stop_timeout:.0f}s, terminating")
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), 10)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+
+    async def rolling_restart(self, cluster_ids: List[int] = None) -> None:
+        """Restart clusters one at a time, each once the previous is ready"""
+        async with self._restart_lock:
+            for cluster in self.clusters:
+                if cluster_ids is not None and cluster.id not in cluster_ids:
+                    continue
+                self.logger.info(f"Restarting cluster {cluster.id}")
+                await self.stop(cluster)
+                await self.spawn(cluster)
+            self.logger.info("Rolling restart finished")
+
+    # IPC
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        cluster = None
+        try:
+            while (message := await read_message(reader)) is not None:
+                if cluster is None:
+                    cluster_id = message.get('cluster')
+                    if message.get('op') != 'hello' or not isinstance(cluster_id, int) or not 0 <= cluster_id < len(self.clusters):
+                        self.logger.warning(f"Dropping IPC connection that sent {message.get('op')!r} first")
+                        return
+                    cluster = self.clusters[cluster_id]
+                    cluster.writer = writer
+                    continue
+                await self._handle(cluster, message)
+        except Exception as e:
+            self.logger.error(f"IPC connection error: {e}")
+        finally:
+            if cluster is not None and cluster.writer is writer:
+                cluster.writer = None
+            writer.close()
+
+    async def _handle(self, cluster: Cluster, message: dict) -> None:
+        op = message.get('op')
+        if op == 'ready':
+            cluster.ready.set()
+            cluster.restarts = 0
+        elif op == 'stats':
+            cluster.stats = message.get('stats')
+        elif op == 'broadcast':
+            forward = {'op': 'broadcast', 'topic': message.get('topic'), 'data': message.get('data'), 'from': cluster.id}
+            await asyncio.gather(*(other.send(forward) for other in self.clusters if other is not cluster),
+                                 return_exceptions=True)
+        elif op == 'request':
+            reply = {'op': 'reply', 'id': message.get('id')}
+            try:
+                reply['result'] = await self._call(message.get('method'), message.get('params') or {})
+            except Exception as e:
+                reply['error'] = str(e)
+            await cluster.send(reply)
+
+    async def _call(self, method: str, params: dict):
+        if method == 'clusters':
+            return self.cluster_info()
+        if method == 'stats':
+            return self.merged_stats()
+        if method == 'restart':
+            cluster_id = params.get('cluster')
+            if cluster_id is not None and not 0 <= cluster_id < len(self.clusters):
+                raise ValueError(f"No cluster {cluster_id}")
+            if self._restart_lock.locked():
+                raise RuntimeError("Clusters are already being started or restarted")
+            asyncio.get_running_loop().create_task(
+                self.rolling_restart(None if cluster_id is None else [cluster_id])
+            )
+            return 'scheduled'
+        raise ValueError(f"Unknown method {method!r}")
+
+    # Stats
+
+    def cluster_info(self) -> Dict[str, dict]:
+        now = time.time()
+        info = {}
+        for cluster in self.clusters:
+            stats = cluster.stats or {}
+            info[str(cluster.id)] = {
+                'shards': cluster.shard_ids,
+                'pid': cluster.process.pid if cluster.process else None,
+                'status': cluster.status,
+                'uptime': int(now - cluster.started_at) if cluster.started_at else 0,
+                'restarts': cluster.restarts,
+                'server_count': stats.get('server_count', 0),
+                'user_count': stats.get('user_count', 0),
+                'latency': stats.get('latency'),
+                'shard_stats': stats.get('shard_stats', {})
+            }
+        return info
+
+    def merged_stats(self) -> Optional[dict]:
+        """One stats payload for the whole bot from every cluster's last
+        report. Database metrics can't be merged, so the top-level ones are
+        cluster 0's (or the first reporting) and each cluster's are under
+        clusters."""
+        reports = [(cluster, cluster.stats) for cluster in self.clusters if cluster.stats]
+        if not reports:
+            return None
+
+        # Rebuild the guild list only when a cluster's changed, so unchanged
+        # lists stay the same object for the delta encoder
+        guild_lists = [stats.get('guilds', []) for _, stats in reports]
+        if guild_lists != self._guild_lists:
+            self._guild_lists = guild_lists
+            self._guilds = [guild_id for guilds in guild_lists for guild_id in guilds]
+
+        merged = dict(reports[0][1])
+        latencies = [stats['latency'] for _, stats in reports if stats.get('latency') is not None]
+        merged.update({
+            'server_count': sum(stats.get('server_count', 0) for _, stats in reports),
+            'user_count': sum(stats.get('user_count', 0) for _, stats in reports),
+            'uptime': int(time.time() - self.started_at),
+            'latency': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'guilds': self._guilds,
+            'shard_count': self.shard_count,
+            'shard_stats': {shard_id: shard for _, stats in reports
+                            for shard_id, shard in stats.get('shard_stats', {}).items()},
+            'clusters': {
+                str(cluster.id): {
+                    'status': cluster.status,
+                    'shards': cluster.shard_ids,
+                    **{key: value for key, value in stats.items() if key not in ('guilds', 'shard_stats')}
+                }
+                for cluster, stats in reports
+            },
+            'publisher': self.publisher.status()
+        })
+        return merged
+
+    async def _stats_loop(self) -> None:
+        while not self._stopping.is_set():
+            await asyncio.sleep(self.stats_interval)
+            try:
+                stats = self.merged_stats()
+                if stats is None:
+                    continue
+                await asyncio.to_thread(self._write_stats_file, stats)
+                for env, delivered in (await self.publisher.publish(stats)).items():
+                    if delivered:
+                        self.logger.info(f"[{env.upper()}] Stats updated successfully")
+            except Exception as e:
+                self.logger.error(f"Error updating stats: {e}")
+
+    @staticmethod
+    def _write_stats_file(stats: dict):
+        with open(os.path.join(ROOT, 'data', 'stats.json'), 'w') as f:
+            json.dump(stats, f, separators=(',', ':'))
+
+    # Lifecycle
+
+    async def run(self) -> None:
+        if os.path.exists(self.ipc_path):
+            os.remove(self.ipc_path)
+        server = await asyncio.start_unix_server(self._serve, path=self.ipc_path, limit=MAX_MESSAGE_SIZE)
+        os.chmod(self.ipc_path, 0o600)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        self.logger.info(f"Launching {len(self.clusters)} clusters for {self.shard_count} shards")
+        stats_task = loop.create_task(self._stats_loop())
+        async with self._restart_lock:
+            for cluster in self.clusters:
+                if self._stopping.is_set():
+                    break
+                await self.spawn(cluster)
+
+        await self._stopping.wait()
+        self.logger.info("Shutting down clusters")
+        stats_task.cancel()
+        await asyncio.gather(*(self.stop(cluster) for cluster in self.clusters))
+        await self.publisher.close()
+        server.close()
+        await server.wait_closed()
+        if os.path.exists(self.ipc_path):
+            os.remove(self.ipc_path)
+
+async def recommended_shards(token: str) -> Optional[int]:
+    """Shard count Discord recommends for this bot"""
+    headers = {'Authorization': f'Bot {token}'}
+    async with aiohttp.ClientSession() as session:
+        async with session.get('https://discord.com/api/v10/gateway/bot', headers=headers) as resp:
+            if resp.status != 200:
+                return None
+            return (await resp.json()).get('shards')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clusters', type=int, default=int(os.getenv('CLUSTER_COUNT', os.cpu_count() or 1)),
+                        help="processes to run (default: CLUSTER_COUNT or the number of CPUs)")
+    parser.add_argument('--shards', type=int, default=int(os.getenv('SHARD_COUNT', 0)) or None,
+                        help="total shards (default: SHARD_COUNT, else Discord's recommendation)")
+    parser.add_argument('--ipc-path', default=os.getenv('CLUSTER_IPC_PATH', os.path.join(ROOT, 'data', 'cluster.sock')))
+    parser.add_argument('--spawn-timeout', type=float, default=120,
+                        help="seconds to wait for a cluster to be ready before starting the next")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    shard_count = args.shards
+    if shard_count is None:
+        with open(os.path.join(ROOT, 'data', 'config.json')) as f:
+            config = json.load(f)
+        token = config['DEV_TOKEN'] if config.get('DEV', False) else config['TOKEN']
+        try:
+            shard_count = asyncio.run(recommended_shards(token))
+        except Exception as e:
+            logging.error(f"Couldn't get the recommended shard count: {e}")
+        shard_count = shard_count or 2
+
+    launcher = ClusterLauncher(shard_count, args.clusters, args.ipc_path, spawn_timeout=args.spawn_timeout)
+    asyncio.run(launcher.run())
+
+if __name__ == "__main__":
+    main()
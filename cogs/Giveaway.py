@@ -18,9 +18,10 @@ class Giveaway(commands.Cog):
         self.check_giveaways.start()
         self.logger.info("Giveaway cog initialized")
 
-    def cog_unload(self):
+    async def cog_unload(self):
         """Clean up when cog is unloaded"""
         self.check_giveaways.cancel()
+        await async_db.flush_stats()
 
     @tasks.loop(seconds=30)
     async def check_giveaways(self):
@@ -363,7 +364,7 @@ class Giveaway(commands.Cog):
                 winner = random.choice(participants)
                 
                 # Award prize to winner
-                await async_db.update_wallet(winner.id, giveaway_data['amount'], giveaway_data['guild_id'])
+                await async_db.update_wallet(winner.id, giveaway_data['amount'], giveaway_data['guild_id'], reason="giveaway")
                 
                 embed.add_field(
                     name="🏆 Winner",
@@ -144,8 +144,18 @@ class ModMail(commands.Cog, ErrorHandler):
         """Check if user is in any of the allowed guilds"""
         for guild_id in self.allowed_guilds:
             guild = self.bot.get_guild(guild_id)
-            if guild and guild.get_member(user.id):
+            if guild is None:
+                continue
+            if guild.get_member(user.id):
                 return True
+            # Members aren't cached until the guild is chunked, so ask the API
+            try:
+                await guild.fetch_member(user.id)
+                return True
+            except discord.NotFound:
+                continue
+            except discord.HTTPException as e:
+                self.logger.warning(f"Failed to fetch member {user.id} in guild {guild_id}: {e}")
         return False
     
     async def create_new_modmail(self, user_message):
@@ -3,6 +3,7 @@ from discord.ext import commands
 import datetime
 from cogs.logging.logger import CogLogger
 from cogs.Help import HelpPaginator
+from utils.db import async_db
 
 class Status(commands.Cog):
     def __init__(self, bot):
@@ -14,7 +15,8 @@ class Status(commands.Cog):
     def update_shard_stats(self):
         """Update stats for all shards."""
         shard_count = self.bot.shard_count or 1
-        for shard_id in range(shard_count):
+        # Only this process's shards under cluster.py; see cluster_shard_stats
+        for shard_id in getattr(self.bot, "shard_ids", None) or range(shard_count):
             guilds = [g for g in self.bot.guilds if getattr(g, "shard_id", 0) == shard_id]
             users = sum(g.member_count or 0 for g in guilds)
             latency = 0
@@ -37,10 +39,39 @@ class Status(commands.Cog):
                 'last_seen': discord.utils.utcnow()
             })
 
+    async def cluster_shard_stats(self, shard_stats: dict) -> int:
+        """Add other clusters' shards to shard_stats when running under
+        cluster.py. Returns the number of clusters (0 when standalone)."""
+        cluster = getattr(self.bot, "cluster", None)
+        if cluster is None:
+            return 0
+        try:
+            clusters = await cluster.request("clusters")
+        except Exception as e:
+            self.logger.error(f"Failed to get cluster stats: {e}")
+            return 0
+        now = discord.utils.utcnow()
+        for cluster_id, info in clusters.items():
+            if int(cluster_id) == cluster.cluster_id:
+                continue
+            for shard_id in info["shards"]:
+                stats = info["shard_stats"].get(str(shard_id), {})
+                shard_stats[shard_id] = {
+                    'start_time': now - datetime.timedelta(seconds=stats.get('uptime', 0)),
+                    'last_seen': now,
+                    'status': stats.get('status', 'offline') if info["status"] == "ready" else 'offline',
+                    'guild_count': stats.get('guild_count', 0),
+                    'user_count': stats.get('user_count', 0),
+                    'latency': stats.get('latency', 0)
+                }
+        return len(clusters)
+
     @commands.command(name="shards", aliases=["status"])
     async def shards(self, ctx):
         """View bot shard status."""
         self.update_shard_stats()
+        shard_stats = dict(self.shard_stats)
+        clusters = await self.cluster_shard_stats(shard_stats)
 
         pages = []
         overview = discord.Embed(
@@ -48,23 +79,29 @@ class Status(commands.Cog):
             color=getattr(ctx.author, "color", discord.Color.blue())
         )
 
-        total_guilds = sum(s['guild_count'] for s in self.shard_stats.values())
-        total_users = sum(s['user_count'] for s in self.shard_stats.values())
+        total_guilds = sum(s['guild_count'] for s in shard_stats.values())
+        total_users = sum(s['user_count'] for s in shard_stats.values())
         avg_latency = (
-            sum(s['latency'] for s in self.shard_stats.values()) / len(self.shard_stats)
-            if self.shard_stats else 0
+            sum(s['latency'] for s in shard_stats.values()) / len(shard_stats)
+            if shard_stats else 0
         )
 
+        db_health = async_db.health_status()
+        db_emoji = {"closed": "🟢", "half_open": "🟡"}.get(db_health['state'], "🔴")
+        db_ping = f"{db_health['ping_ms']:.1f}ms" if db_health['ping_ms'] is not None else "n/a"
+
         overview.description = (
             f"**Total Servers:** `{total_guilds:,}`\n"
             f"**Total Users:** `{total_users:,}`\n"
             f"**Average Latency:** `{avg_latency:.1f}ms`\n"
-            f"**Shards:** `{self.bot.shard_count or 1}`\n\n"
+            f"**Shards:** `{self.bot.shard_count or 1}`"
+            + (f" across `{clusters}` clusters\n" if clusters else "\n") +
+            f"**Database:** {db_emoji} `{db_health['state']}` | `{db_ping}`\n\n"
             "**Shard Status**\n"
         )
 
         # Add short status for first few shards
-        for shard_id, stats in list(self.shard_stats.items())[:3]:
+        for shard_id, stats in sorted(shard_stats.items())[:3]:
             status = stats.get('status', 'offline')
             emoji = "🟢" if status == "online" else "🔴"
             overview.description += (
@@ -72,13 +109,13 @@ class Status(commands.Cog):
                 f"`{stats['latency']:.1f}ms`\n"
             )
 
-        if len(self.shard_stats) > 3:
+        if len(shard_stats) > 3:
             overview.description += "*Use the arrows to see more shards*"
 
         pages.append(overview)
 
         # Create detail pages - 5 shards per page
-        shards = list(self.shard_stats.items())
+        shards = sorted(shard_stats.items())
         for i in range(0, len(shards), 5):
             embed = discord.Embed(
                 title="🔋 Shard Details",
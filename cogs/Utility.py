@@ -321,6 +321,7 @@ class Utility(commands.Cog, ErrorHandler):
     @commands.command()
     async def roleinfo(self, ctx, *, role: discord.Role):
         """Show info about a role."""
+        await self.bot.chunker.ensure_chunked(ctx.guild)
         embed = discord.Embed(
             title=f"Role: {role.name}",
             color=role.color
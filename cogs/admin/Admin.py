@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
 from cogs.logging.logger import CogLogger
-from utils.db import async_db as db
+from utils.db import async_db as db, INTEREST_RATES, mongo_metrics, db_timings, slow_queries
+from utils.chunking import member_cache_report, process_rss
 import json
 import datetime
 import random
@@ -222,16 +223,9 @@ class Admin(commands.Cog):
         if shop_type not in self.SHOP_TYPES:
             return await ctx.reply(f"Invalid shop type! Use one of: {', '.join(self.SHOP_TYPES.keys())}")
             
-        collection = getattr(self.db.db, f"shop_{shop_type}", None)
-        if not collection:
-            return await ctx.reply("❌ Invalid shop collection!")
-            
-        result = await collection.delete_one({
-            "id": item_id,
-            "guild_id": str(ctx.guild.id) if ctx.guild else None
-        })
+        removed = await self.db.remove_shop_item(item_id, shop_type, ctx.guild.id if ctx.guild else None)
         
-        if result.deleted_count > 0:
+        if removed:
             embed = discord.Embed(
                 description=f"✨ Removed item `{item_id}` from {self.SHOP_TYPES[shop_type]['icon']} {shop_type} shop!",
                 color=0x2b2d31
@@ -302,10 +296,6 @@ class Admin(commands.Cog):
         if shop_type not in self.SHOP_TYPES:
             return await ctx.reply(f"Invalid shop type! Use one of: {', '.join(self.SHOP_TYPES.keys())}")
             
-        collection = getattr(self.db.db, f"shop_{shop_type}", None)
-        if not collection:
-            return await ctx.reply("❌ Invalid shop collection!")
-            
         # Convert value to appropriate type
         try:
             if field in ["price", "duration", "amount"]:
@@ -316,15 +306,12 @@ class Admin(commands.Cog):
                 value = None
                 
             # Update the item
-            result = await collection.update_one(
-                {
-                    "id": item_id,
-                    "guild_id": str(ctx.guild.id) if ctx.guild else None
-                },
-                {"$set": {field: value}}
+            updated = await self.db.update_shop_item(
+                item_id, shop_type, {field: value},
+                ctx.guild.id if ctx.guild else None
             )
             
-            if result.modified_count > 0:
+            if updated:
                 embed = discord.Embed(
                     description=f"✨ Updated `{field}` to `{value}` for item `{item_id}`!",
                     color=0x2b2d31
@@ -563,8 +550,17 @@ class Admin(commands.Cog):
             return await ctx.reply(embed=embed)
             
         try:
+            # Record the wipe in the ledger, then start the money supply over
+            # at zero so entries from before the reset stop counting
+            supply = await self.db.get_money_supply()
+            self.db.record_ledger(None, "all", -supply, 0, "reset_economy")
+            
             # Delete all user data (balances, inventory, fish collections)
             await self.db.db.users.delete_many({})
+            await self.db.db.fish.delete_many({})
+            self.db.user_cache.clear()
+            self.db.leaderboards.invalidate()
+            await self.db.reset_money_supply()
             
             # Delete all active potions
             await self.db.db.active_potions.delete_many({})
@@ -602,6 +598,281 @@ class Admin(commands.Cog):
             self.logger.error(f"Failed to reset economy: {e}")
             await ctx.reply("❌ An error occurred while resetting the economy")
 
+    @commands.command()
+    @commands.is_owner()
+    async def migrate_inventories(self, ctx, batch_size: int = 500):
+        """Compact legacy inventory arrays into counted items (Bot Owner Only)
+        Usage: .migrate_inventories [batch_size]"""
+        message = await ctx.reply("⏳ Migrating inventories...")
+        try:
+            migrated = await self.db.migrate_inventories(batch_size=max(1, batch_size))
+            await message.edit(content=f"✅ Migrated **{migrated:,}** inventories")
+        except Exception as e:
+            self.logger.error(f"Failed to migrate inventories: {e}")
+            await message.edit(content="❌ An error occurred while migrating inventories")
+
+    @commands.command()
+    @commands.is_owner()
+    async def migrate_fish(self, ctx, batch_size: int = 500):
+        """Move legacy fish arrays into the fish collection (Bot Owner Only)
+        Usage: .migrate_fish [batch_size]"""
+        message = await ctx.reply("⏳ Migrating fish...")
+        try:
+            migrated = await self.db.migrate_fish(batch_size=max(1, batch_size))
+            await message.edit(content=f"✅ Migrated fish for **{migrated:,}** users")
+        except Exception as e:
+            self.logger.error(f"Failed to migrate fish: {e}")
+            await message.edit(content="❌ An error occurred while migrating fish")
+
+    @commands.command()
+    @commands.is_owner()
+    async def migrate_stats(self, ctx):
+        """Add the old SQLite guild stats to the stats collection (Bot Owner Only)
+        Usage: .migrate_stats"""
+        message = await ctx.reply("⏳ Migrating guild stats...")
+        try:
+            migrated = await self.db.migrate_guild_stats()
+            await message.edit(content=f"✅ Migrated stats for **{migrated:,}** guilds")
+        except Exception as e:
+            self.logger.error(f"Failed to migrate guild stats: {e}")
+            await message.edit(content="❌ An error occurred while migrating guild stats")
+
+    @commands.command()
+    @commands.is_owner()
+    async def backfill_networth(self, ctx):
+        """Recompute stale net_worth fields used by leaderboards (Bot Owner Only)"""
+        try:
+            updated = await self.db.backfill_net_worth()
+            await ctx.reply(f"✅ Updated net worth for **{updated:,}** users")
+        except Exception as e:
+            self.logger.error(f"Failed to backfill net worth: {e}")
+            await ctx.reply("❌ An error occurred while backfilling net worth")
+
+    @commands.command()
+    @commands.is_owner()
+    async def interest_run(self, ctx, *args):
+        """Pay daily interest to every eligible user (Bot Owner Only)
+        Usage: .interest_run [dry] [base=0.0003] [per_level=0.0005] [random_max=0.001] [cap=0.01]"""
+        dry_run = "dry" in args
+        rates = {}
+        for arg in args:
+            if "=" in arg:
+                key, _, value = arg.partition("=")
+                if key not in INTEREST_RATES:
+                    return await ctx.reply(f"❌ Unknown rate `{key}`. Use one of: {', '.join(INTEREST_RATES)}")
+                try:
+                    rates[key] = float(value)
+                except ValueError:
+                    return await ctx.reply(f"❌ Invalid rate: `{arg}`")
+        
+        try:
+            report = await self.db.apply_interest(dry_run=dry_run, rates=rates)
+        except Exception as e:
+            self.logger.error(f"Interest run failed: {e}")
+            return await ctx.reply("❌ An error occurred while applying interest")
+        
+        embed = discord.Embed(
+            title="🏦 Interest Simulation" if dry_run else "🏦 Interest Paid",
+            description=(
+                f"**Users:** {report['users']:,}\n"
+                f"**Total payout:** {report['total']:,} {self.currency}\n"
+                f"**Largest payout:** {report['max'] or 0:,} {self.currency}"
+            ),
+            color=0x2b2d31
+        )
+        if rates:
+            embed.set_footer(text="Rates: " + ", ".join(f"{k}={v}" for k, v in rates.items()))
+        await ctx.reply(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def ledger(self, ctx, hours: int = 24):
+        """Money supply and net payouts per command from the ledger (Bot Owner Only)
+        Usage: .ledger [hours]"""
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=max(1, hours))
+        supply, totals = await asyncio.gather(
+            self.db.get_money_supply(),
+            self.db.get_ledger_totals(since)
+        )
+        
+        rows = sorted(totals.items(), key=lambda kv: abs(kv[1]["delta"]), reverse=True)[:15]
+        lines = [
+            f"`{reason or 'unknown'}` • **{total['delta']:+,}** {self.currency} ({total['count']:,} entries)"
+            for reason, total in rows
+        ]
+        embed = discord.Embed(
+            title=f"📒 Ledger - last {hours}h",
+            description="\n".join(lines) or "No balance changes recorded",
+            color=0x2b2d31
+        )
+        embed.add_field(name="Money Supply", value=f"**{supply:,}** {self.currency}")
+        await ctx.reply(embed=embed)
+
+    @commands.command(aliases=["queryaudit"])
+    @commands.is_owner()
+    async def dbaudit(self, ctx, apply: str = None):
+        """Explain registered hot queries and flag collection scans (Bot Owner Only)
+        Usage: .dbaudit [apply] - 'apply' (re)creates manifest indexes first"""
+        if apply == "apply":
+            result = await self.db.ensure_indexes()
+            await ctx.reply(f"🔧 Ensured **{result['ensured']}** indexes ({result['failed']} failed)")
+        
+        report = await self.db.audit_queries()
+        if not report:
+            return await ctx.reply("❌ Database unavailable")
+        
+        lines = []
+        for entry in report:
+            if entry["error"]:
+                lines.append(f"❌ **{entry['name']}** (`{entry['collection']}`): {entry['error'][:80]}")
+            else:
+                icon = "⚠️" if entry["collscan"] else "✅"
+                lines.append(f"{icon} **{entry['name']}** (`{entry['collection']}`): {' → '.join(entry['stages'])}")
+        
+        scans = sum(1 for entry in report if entry["collscan"])
+        embed = discord.Embed(
+            title="🔍 Query Plan Audit",
+            description="\n".join(lines),
+            color=discord.Color.orange() if scans else discord.Color.green()
+        )
+        embed.set_footer(text=f"{scans} of {len(report)} queries use a COLLSCAN")
+        await ctx.reply(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def dbpool(self, ctx, reset: str = None):
+        """Show connection pool wait and per-command server time (Bot Owner Only)
+        Usage: .dbpool [reset] - 'reset' clears the histograms afterwards"""
+        stats = mongo_metrics.stats()
+        wait = stats["pool_wait"]
+        conns = stats["connections"]
+        
+        def fmt(value):
+            return f"{value:.0f}ms" if value is not None else "n/a"
+        
+        embed = discord.Embed(title="🏊 Connection Pool", color=discord.Color.blue())
+        embed.add_field(
+            name="Checkout Wait",
+            value=(f"`{wait['count']:,}` checkouts | p50 `{fmt(wait['p50_ms'])}` | "
+                   f"p95 `{fmt(wait['p95_ms'])}` | p99 `{fmt(wait['p99_ms'])}` | max `{fmt(wait['max_ms'])}`"),
+            inline=False
+        )
+        embed.add_field(
+            name="Connections",
+            value=(f"Open `{conns['open']}` | In use `{conns['checked_out']}`\n"
+                   f"Checkout failures: `{sum(stats['checkout_failures'].values())}`"),
+            inline=False
+        )
+        
+        busiest = sorted(stats["commands"].items(), key=lambda item: item[1]["count"], reverse=True)[:10]
+        if busiest:
+            embed.add_field(
+                name="Server Time by Command",
+                value="\n".join(
+                    f"`{name}`: {hist['count']:,} | p50 `{fmt(hist['p50_ms'])}` | p95 `{fmt(hist['p95_ms'])}`"
+                    for name, hist in busiest
+                ),
+                inline=False
+            )
+        await ctx.reply(embed=embed)
+        
+        if reset == "reset":
+            mongo_metrics.reset()
+
+    @commands.command()
+    @commands.is_owner()
+    async def dbstats(self, ctx, view: str = "methods"):
+        """Show per-method/per-collection database timings (Bot Owner Only)
+        Usage: .dbstats [methods|collections|slow|reset]"""
+        if view == "reset":
+            db_timings.reset()
+            mongo_metrics.reset()
+            slow_queries.clear()
+            return await ctx.reply("✅ Database timings reset")
+        
+        if view == "slow":
+            entries = slow_queries.entries(10)
+            if not entries:
+                return await ctx.reply(f"No queries slower than {slow_queries.threshold_ms:.0f}ms yet")
+            lines = []
+            for entry in reversed(entries):
+                target = f"{entry['collection']}.{entry['name']}" if entry["collection"] else entry["name"]
+                line = f"**{target}** `{entry['ms']:.0f}ms` <t:{int(entry['ts'])}:R>"
+                if entry["shape"]:
+                    line += f"\n```json\n{json.dumps(entry['shape'], default=str)[:300]}```"
+                lines.append(line)
+            embed = discord.Embed(
+                title=f"🐢 Slow Queries (>{slow_queries.threshold_ms:.0f}ms)",
+                description="\n".join(lines)[:4000],
+                color=discord.Color.orange()
+            )
+            return await ctx.reply(embed=embed)
+        
+        if view == "collections":
+            rows = {name: stats for name, stats in mongo_metrics.stats()["collections"].items()}
+            title = "📚 Database Timings by Collection"
+        else:
+            rows = db_timings.stats()
+            title = "⏱️ Database Timings by Method"
+        if not rows:
+            return await ctx.reply("No database calls recorded yet")
+        
+        def fmt(value):
+            return f"{value:.0f}" if value is not None else "-"
+        
+        busiest = sorted(rows.items(), key=lambda item: item[1]["avg_ms"] * item[1]["count"], reverse=True)[:20]
+        table = [f"{'name':<24}{'calls':>7}{'err':>5}{'p50':>6}{'p95':>6}{'p99':>6}"]
+        for name, stats in busiest:
+            table.append(
+                f"{name[:23]:<24}{stats['count']:>7}{stats['errors']:>5}"
+                f"{fmt(stats['p50_ms']):>6}{fmt(stats['p95_ms']):>6}{fmt(stats['p99_ms']):>6}"
+            )
+        embed = discord.Embed(
+            title=title,
+            description="```\n" + "\n".join(table) + "\n```",
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"Latency in ms, busiest {len(busiest)} of {len(rows)} by total time")
+        await ctx.reply(embed=embed)
+
+    @commands.command()
+    @commands.is_owner()
+    async def memcache(self, ctx, count: int = 15):
+        """Show member cache size per guild (Bot Owner Only)
+        Usage: .memcache [count] - largest guilds by approximate cache size"""
+        report = member_cache_report(self.bot.guilds)
+        chunker = self.bot.chunker.stats()
+        rss = process_rss()
+        
+        largest = sorted(report.values(), key=lambda guild: guild["approx_bytes"], reverse=True)[:count]
+        table = [f"{'guild':<22}{'cached':>8}{'members':>9}{'KiB':>8}"]
+        for guild in largest:
+            marker = "" if guild["chunked"] else "*"
+            table.append(
+                f"{(guild['name'] + marker)[:21]:<22}{guild['cached']:>8}"
+                f"{guild['member_count']:>9}{guild['approx_bytes'] // 1024:>8}"
+            )
+        embed = discord.Embed(
+            title="👥 Member Cache",
+            description="```\n" + "\n".join(table) + "\n```",
+            color=discord.Color.blue()
+        )
+        embed.add_field(
+            name="Chunking",
+            value=(f"Chunked `{chunker['chunked']}` | Not chunked `{chunker['unchunked']}` | "
+                   f"Pending `{chunker['pending']}` | Failures `{chunker['failures']}`"),
+            inline=False
+        )
+        embed.add_field(
+            name="Totals",
+            value=(f"Cached members `{sum(guild['cached'] for guild in report.values()):,}` | "
+                   f"~`{sum(guild['approx_bytes'] for guild in report.values()) / 2**20:.1f}` MiB | "
+                   f"RSS `{f'{rss / 2**20:.0f} MiB' if rss else 'n/a'}`"),
+            inline=False
+        )
+        embed.set_footer(text="* not chunked yet | sizes extrapolated from a sample of members")
+        await ctx.reply(embed=embed)
+
 async def setup(bot):
     """Initialize the Admin cog with proper error handling"""
     try:
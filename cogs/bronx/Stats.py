@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from cogs.logging.logger import CogLogger
-from utils.db import db
+from utils.db import async_db as db
 
 logger = CogLogger('Stats')
 guilds = [1259717095382319215, 1299747094449623111, 1142088882222022786]
@@ -598,6 +598,14 @@ class VoteBans(commands.Cog):
         
         guild = message.guild
         target_user = guild.get_member(int(user_id_str))
+        if target_user is None:
+            # Members aren't cached until the guild is chunked, so ask the API
+            try:
+                target_user = await guild.fetch_member(int(user_id_str))
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                logger.error(f"Failed to fetch vote ban target {user_id_str}: {e}")
         
         # Build final embed
         user = self.bot.get_user(vote_info["user_id"])
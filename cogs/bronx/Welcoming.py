@@ -3,7 +3,7 @@ import random
 import json
 from discord.ext import commands
 from cogs.logging.logger import CogLogger
-from utils.db import db
+from utils.db import async_db as db
 
 logger = CogLogger('Welcoming')
 
@@ -31,6 +31,10 @@ class Welcoming(commands.Cog):
         self.bot = bot
         self.main_guilds = getattr(self.bot, "MAIN_GUILD_IDS", [])
 
+    async def cog_unload(self):
+        """Write out buffered join/leave stats before unloading"""
+        await db.flush_stats()
+
     async def cog_check(self, ctx):
         """Check if the guild has permission to use this cog's commands."""
         return ctx.guild and ctx.guild.id in self.main_guilds
@@ -13,13 +13,30 @@ class Economy(commands.Cog):
         self.currency = "<:bronkbuk:1377389238290747582>"
         self.active_games = set()
 
+    @staticmethod
+    def _parse_bank_amount(amount: str):
+        """Turn a deposit/withdraw argument into an amount for the bank transfer
+        helpers: 'all', a percentage string, or an int (with k/m suffixes).
+        Returns None if it can't be parsed."""
+        if amount.lower() in ['all', 'max']:
+            return 'all'
+        if amount.endswith('%'):
+            return amount
+        try:
+            if amount.lower().endswith('k'):
+                return int(float(amount[:-1]) * 1000)
+            elif amount.lower().endswith('m'):
+                return int(float(amount[:-1]) * 1000000)
+            return int(amount)
+        except ValueError:
+            return None
+
     @commands.command(aliases=['bal', 'cash', 'bb'])
     async def balance(self, ctx, member: discord.Member = None):
         """Check your balance"""
         member = member or ctx.author
-        wallet = await db.get_wallet_balance(member.id, ctx.guild.id)
-        bank = await db.get_bank_balance(member.id, ctx.guild.id)
-        bank_limit = await db.get_bank_limit(member.id, ctx.guild.id)
+        user = await db.get_user_snapshot(member.id)
+        wallet, bank, bank_limit = user["wallet"], user["bank"], user["bank_limit"]
         
         embed = discord.Embed(
             title=f"{member.display_name}'s Balance",
@@ -38,10 +55,8 @@ class Economy(commands.Cog):
         """Deposit money into your bank"""
         try:
             if not amount:
-                wallet = await db.get_wallet_balance(ctx.author.id, ctx.guild.id)
-                bank = await db.get_bank_balance(ctx.author.id, ctx.guild.id)
-                limit = await db.get_bank_limit(ctx.author.id, ctx.guild.id)
-                space = limit - bank
+                user = await db.get_user_snapshot(ctx.author.id)
+                wallet, space = user["wallet"], user["bank_limit"] - user["bank"]
                 
                 embed = discord.Embed(
                     description=(
@@ -59,48 +74,26 @@ class Economy(commands.Cog):
                 )
                 return await ctx.reply(embed=embed)
 
-            wallet = await db.get_wallet_balance(ctx.author.id, ctx.guild.id)
-            bank = await db.get_bank_balance(ctx.author.id, ctx.guild.id)
-            limit = await db.get_bank_limit(ctx.author.id, ctx.guild.id)
-            space = limit - bank
-
-            # Parse amount
-            if amount.lower() in ['all', 'max']:
-                amount = min(wallet, space)
-            elif amount.endswith('%'):
-                try:
-                    percentage = float(amount[:-1])
-                    if not 0 < percentage <= 100:
-                        return await ctx.reply("Percentage must be between 0 and 100!")
-                    amount = min(int((percentage / 100) * wallet), space)
-                except ValueError:
-                    return await ctx.reply("Invalid percentage!")
-            else:
-                try:
-                    if amount.lower().endswith('k'):
-                        amount = int(float(amount[:-1]) * 1000)
-                    elif amount.lower().endswith('m'):
-                        amount = int(float(amount[:-1]) * 1000000)
-                    else:
-                        amount = int(amount)
-                except ValueError:
-                    return await ctx.reply("Invalid amount!")
+            spec = self._parse_bank_amount(amount)
+            if spec is None:
+                return await ctx.reply("Invalid amount!")
 
-            if amount <= 0:
-                return await ctx.reply("Amount must be positive!")
-            if amount > wallet:
+            try:
+                result = await db.move_wallet_to_bank(ctx.author.id, spec, ctx.guild.id)
+            except ValueError as e:
+                return await ctx.reply(f"{e}!")
+
+            if result["reason"] == "insufficient":
                 return await ctx.reply("You don't have that much in your wallet!")
-            if amount > space:
+            if result["reason"] == "no_space":
+                space = max(result["bank_limit"] - result["bank"], 0)
                 return await ctx.reply(f"Your bank can only hold {space:,} more coins!")
+            if result["reason"] == "too_small":
+                return await ctx.reply("Amount must be positive!")
+            if result["reason"]:
+                return await ctx.reply("❌ Failed to deposit money!")
 
-            if await db.update_wallet(ctx.author.id, -amount, ctx.guild.id):
-                if await db.update_bank(ctx.author.id, amount, ctx.guild.id):
-                    await ctx.reply(f"💰 Deposited **{amount:,}** {self.currency} into your bank!")
-                else:
-                    await db.update_wallet(ctx.author.id, amount, ctx.guild.id)
-                    await ctx.reply("❌ Failed to deposit money! Transaction reverted.")
-            else:
-                await ctx.reply("❌ Failed to deposit money!")
+            await ctx.reply(f"💰 Deposited **{result['moved']:,}** {self.currency} into your bank!")
                 
         except Exception as e:
             self.logger.error(f"Deposit error: {e}")
@@ -112,8 +105,8 @@ class Economy(commands.Cog):
         """Withdraw money from your bank"""
         try:
             if not amount:
-                wallet = await db.get_wallet_balance(ctx.author.id, ctx.guild.id)
-                bank = await db.get_bank_balance(ctx.author.id, ctx.guild.id)
+                user = await db.get_user_snapshot(ctx.author.id)
+                wallet, bank = user["wallet"], user["bank"]
                 
                 embed = discord.Embed(
                     description=(
@@ -131,43 +124,23 @@ class Economy(commands.Cog):
                 )
                 return await ctx.reply(embed=embed)
 
-            bank = await db.get_bank_balance(ctx.author.id, ctx.guild.id)
-
-            # Parse amount
-            if amount.lower() in ['all', 'max']:
-                amount = bank
-            elif amount.endswith('%'):
-                try:
-                    percentage = float(amount[:-1])
-                    if not 0 < percentage <= 100:
-                        return await ctx.reply("Percentage must be between 0 and 100!")
-                    amount = int((percentage / 100) * bank)
-                except ValueError:
-                    return await ctx.reply("Invalid percentage!")
-            else:
-                try:
-                    if amount.lower().endswith('k'):
-                        amount = int(float(amount[:-1]) * 1000)
-                    elif amount.lower().endswith('m'):
-                        amount = int(float(amount[:-1]) * 1000000)
-                    else:
-                        amount = int(amount)
-                except ValueError:
-                    return await ctx.reply("Invalid amount!")
+            spec = self._parse_bank_amount(amount)
+            if spec is None:
+                return await ctx.reply("Invalid amount!")
 
-            if amount <= 0:
-                return await ctx.reply("Amount must be positive!")
-            if amount > bank:
+            try:
+                result = await db.move_bank_to_wallet(ctx.author.id, spec, ctx.guild.id)
+            except ValueError as e:
+                return await ctx.reply(f"{e}!")
+
+            if result["reason"] == "insufficient":
                 return await ctx.reply("You don't have that much in your bank!")
+            if result["reason"] == "too_small":
+                return await ctx.reply("Amount must be positive!")
+            if result["reason"]:
+                return await ctx.reply("❌ Failed to withdraw money!")
 
-            if await db.update_bank(ctx.author.id, -amount, ctx.guild.id):
-                if await db.update_wallet(ctx.author.id, amount, ctx.guild.id):
-                    await ctx.reply(f"💸 Withdrew **{amount:,}** {self.currency} from your bank!")
-                else:
-                    await db.update_bank(ctx.author.id, amount, ctx.guild.id)
-                    await ctx.reply("❌ Failed to withdraw money! Transaction reverted.")
-            else:
-                await ctx.reply("❌ Failed to withdraw money!")
+            await ctx.reply(f"💸 Withdrew **{result['moved']:,}** {self.currency} from your bank!")
         except Exception as e:
             self.logger.error(f"Withdraw error: {e}")
             await ctx.reply("An error occurred while processing your withdrawal.")
@@ -243,6 +216,15 @@ class Economy(commands.Cog):
         else:
             return await self._show_server_leaderboard(ctx)
 
+    @staticmethod
+    def _format_age(seconds: float) -> str:
+        """Footer note for how old cached leaderboard data is"""
+        if seconds < 5:
+            return "Updated just now"
+        if seconds < 120:
+            return f"Updated {int(seconds)}s ago"
+        return f"Updated {int(seconds // 60)}m ago"
+
     async def _show_server_leaderboard(self, ctx):
         """Show server-specific leaderboard"""
         try:
@@ -252,31 +234,41 @@ class Economy(commands.Cog):
                     color=0xff0000
                 ))
 
-            member_ids = [str(member.id) for member in ctx.guild.members if not member.bot]
-            
-            if not member_ids:
-                return await ctx.reply(embed=discord.Embed(
-                    description="No users found in this server",
-                    color=0x2b2d31
-                ))
-
-            cursor = db.db.users.find({
-                "_id": {"$in": member_ids},
-                "$or": [
-                    {"wallet": {"$gt": 0}},
-                    {"bank": {"$gt": 0}}
-                ]
-            })
-
+            # Sync members before reading, or a board built from the
+            # unsynced guild would be cached until the next refresh
+            if not ctx.guild.chunked:
+                await self.bot.chunker.ensure_chunked(ctx.guild)
+                if ctx.guild.chunked:
+                    await self._sync_guild(ctx.guild)
+
+            # Cached rows over-fetch a little so members who left while we were offline can be skipped
+            rows, age = await db.leaderboards.get(ctx.guild.id)
+            members = {}
+            missing = [int(user_doc["_id"]) for user_doc in rows if ctx.guild.get_member(int(user_doc["_id"])) is None]
+            if missing and not ctx.guild.chunked:
+                # Chunking failed, or the member cache policy doesn't keep
+                # everyone; look the rest up directly
+                missing = missing[:100]
+                fetched = await ctx.guild.query_members(user_ids=missing, limit=len(missing), cache=False)
+                members = {member.id: member for member in fetched}
             users = []
-            async for user_doc in cursor:
-                member = ctx.guild.get_member(int(user_doc["_id"]))
-                if member:
-                    total = user_doc.get("wallet", 0) + user_doc.get("bank", 0)
+            stale = []
+            for user_doc in rows:
+                user_id = int(user_doc["_id"])
+                member = ctx.guild.get_member(user_id) or members.get(user_id)
+                if member is None:
+                    stale.append(user_doc["_id"])
+                elif not member.bot and len(users) < 10:
                     users.append({
                         "member": member,
-                        "total": round(total)
+                        "total": round(user_doc.get("net_worth", 0))
                     })
+            if ctx.guild.chunked:
+                # Only trust a missing member once the member cache is complete
+                for user_id in stale:
+                    await db.remove_guild_member(ctx.guild.id, user_id)
+                if stale:
+                    db.leaderboards.invalidate(ctx.guild.id)
 
             if not users:
                 embed = discord.Embed(
@@ -285,9 +277,6 @@ class Economy(commands.Cog):
                 )
                 return await ctx.reply(embed=embed)
             
-            users.sort(key=lambda x: x["total"], reverse=True)
-            users = users[:10]
-            
             content = []
             total_wealth = 0
             position_emojis = {1: "🥇", 2: "🥈", 3: "🥉"}
@@ -307,7 +296,7 @@ class Economy(commands.Cog):
             
             formatted_total = "{:,}".format(total_wealth)
             average_wealth = "{:,}".format(total_wealth // len(content)) if content else "0"
-            embed.set_footer(text=f"Total Wealth: ${formatted_total} $BB • Average: ${average_wealth} $BB")
+            embed.set_footer(text=f"Total Wealth: ${formatted_total} $BB • Average: ${average_wealth} $BB • {self._format_age(age)}")
             
             await ctx.reply(embed=embed)
             
@@ -327,18 +316,8 @@ class Economy(commands.Cog):
                     color=0xff0000
                 ))
             
-            pipeline = [
-                {
-                    "$group": {
-                        "_id": "$_id",
-                        "total": {"$sum": {"$add": ["$wallet", "$bank"]}}
-                    }
-                },
-                {"$sort": {"total": -1}},
-                {"$limit": 10}
-            ]
-            
-            users = await db.db.users.aggregate(pipeline).to_list(10)
+            rows, age = await db.leaderboards.get()
+            users = rows[:10]
             
             if not users:
                 return await ctx.reply(embed=discord.Embed(
@@ -352,7 +331,7 @@ class Economy(commands.Cog):
             
             for i, user in enumerate(users, 1):
                 user_id = int(user['_id'])
-                total = user['total']
+                total = user['net_worth']
                 total_wealth += total
                 
                 member = ctx.guild.get_member(user_id) or self.bot.get_user(user_id)
@@ -376,7 +355,7 @@ class Economy(commands.Cog):
             
             formatted_total = "{:,}".format(total_wealth)
             average_wealth = "{:,}".format(total_wealth // len(content)) if content else "0"
-            embed.set_footer(text=f"Total Wealth: ${formatted_total} • Average: ${average_wealth}")
+            embed.set_footer(text=f"Total Wealth: ${formatted_total} • Average: ${average_wealth} • {self._format_age(age)}")
             
             await ctx.reply(embed=embed)
             
@@ -387,36 +366,14 @@ class Economy(commands.Cog):
                 color=0xff0000
             ))
 
-    async def calculate_daily_interest(self, user_id: int, guild_id: int = None) -> float:
-        """Calculate and apply daily interest"""
-        wallet = await db.get_wallet_balance(user_id, guild_id)
-        interest_level = await db.get_interest_level(user_id)
-
-        base_rate = 0.0003  # Base rate of 0.03%
-        level_bonus = interest_level * 0.0005  # Each level adds 0.05% (0.0005)
-        random_bonus = random.randint(0, 100) / 100000  # 0-0.1% random bonus
-        total_rate = base_rate + level_bonus + random_bonus
-        
-        # Calculate interest based on wallet + bank balance
-        bank = await db.get_bank_balance(user_id, guild_id)
-        total_balance = wallet + bank
-        interest = total_balance * total_rate
-        
-        # Apply minimum (1 coin) and maximum (1% of total balance) bounds
-        interest = max(1, min(interest, total_balance * 0.01))
-        
-        # Apply the interest to wallet
-        if await db.update_wallet(user_id, int(interest), guild_id):
-            return interest
-        return 0
-
-
     @commands.command(aliases=['interest', 'i'])
     @commands.cooldown(1, 86400, commands.BucketType.user)
     async def claim_interest(self, ctx):
         """Claim your daily interest"""
-        interest = await self.calculate_daily_interest(ctx.author.id, ctx.guild.id)
-        if interest > 0:
+        interest = await db.claim_interest(ctx.author.id, ctx.guild.id)
+        if interest is None:
+            await ctx.reply("❌ You've already received interest in the last 24 hours!")
+        elif interest > 0:
             await ctx.reply(f"💰 You earned **{interest:,}** {self.currency} in daily interest!")
         else:
             await ctx.reply("❌ Failed to claim interest. Try again later.")
@@ -426,10 +383,9 @@ class Economy(commands.Cog):
     @commands.cooldown(1, 3, commands.BucketType.user)
     async def interest_status(self, ctx):
         """Check your current interest rate and level"""
-        wallet = await db.get_wallet_balance(ctx.author.id, ctx.guild.id)
-        bank = await db.get_bank_balance(ctx.author.id, ctx.guild.id)
+        user = await db.get_user_snapshot(ctx.author.id)
+        wallet, bank, level = user["wallet"], user["bank"], user["interest_level"]
         total_balance = wallet + bank
-        level = await db.get_interest_level(ctx.author.id)
         
         # Calculate current rate in percentage
         current_rate_percent = (0.03 + (level * 0.05))  # 0.03% base + 0.05% per level
@@ -561,8 +517,8 @@ class Economy(commands.Cog):
         
         async def create_upgrade_embed(user_id, guild_id):
             # Get current bank stats
-            current_limit = await db.get_bank_limit(user_id, guild_id)
-            current_balance = await db.get_bank_balance(user_id, guild_id)
+            user = await db.get_user_snapshot(user_id)
+            current_limit, current_balance = user["bank_limit"], user["bank"]
             
             # Dynamic pricing formula (example: 10% of current limit + base 1000)
             base_cost = 1000
@@ -603,8 +559,8 @@ class Economy(commands.Cog):
                         return await interaction.response.send_message("This isn't your upgrade!", ephemeral=True)
                     
                     # Verify balance again in case it changed
-                    fresh_balance = await db.get_bank_balance(user_id, guild_id)
-                    fresh_limit = await db.get_bank_limit(user_id, guild_id)
+                    fresh = await db.get_user_snapshot(user_id)
+                    fresh_balance, fresh_limit = fresh["bank"], fresh["bank_limit"]
                     fresh_cost = int(fresh_limit * 0.1) + base_cost
                     
                     if fresh_balance < fresh_cost:
@@ -640,5 +596,40 @@ class Economy(commands.Cog):
         embed, view = await create_upgrade_embed(ctx.author.id, ctx.guild.id)
         await ctx.reply(embed=embed, view=view)
 
+    # Guild membership tracking for server leaderboards
+
+    async def _sync_guild(self, guild):
+        member_ids = [member.id for member in guild.members if not member.bot]
+        try:
+            updated = await db.sync_guild_members(guild.id, member_ids)
+            if updated:
+                db.leaderboards.invalidate(guild.id)
+                self.logger.info(f"Synced {updated} economy members for guild {guild.id}")
+        except Exception as e:
+            self.logger.error(f"Failed to sync members for guild {guild.id}: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_members_chunked(self, guild):
+        await self._sync_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        # Synced from on_guild_members_chunked once the chunker gets to it
+        self.bot.chunker.request(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        await db.remove_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if not member.bot:
+            await db.add_guild_member(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        if not member.bot:
+            await db.remove_guild_member(member.guild.id, member.id)
+
 async def setup(bot):
     await bot.add_cog(Economy(bot))
\ No newline at end of file
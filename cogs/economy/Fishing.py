@@ -12,6 +12,7 @@ class Fishing(commands.Cog):
         self.bot = bot
         self.logger = CogLogger(self.__class__.__name__)
         self.currency = "<:bronkbuk:1377389238290747582>"
+        self.FISH_PER_PAGE = 5
         self.DEFAULT_FISHING_ITEMS = {
             "bait_shop": {
                 "beginner_bait": {
@@ -114,8 +115,10 @@ class Fishing(commands.Cog):
     @commands.cooldown(1, 3, commands.BucketType.user)
     async def fish_inventory(self, ctx):
         """View your fishing inventory"""
-        fishing_items = await db.get_fishing_items(ctx.author.id)
-        fish = await db.get_fish(ctx.author.id)
+        fishing_items, summary = await asyncio.gather(
+            db.get_fishing_items(ctx.author.id),
+            db.get_fish_summary(ctx.author.id)
+        )
         
         pages = []
         
@@ -145,29 +148,11 @@ class Fishing(commands.Cog):
         
         pages.append(equip_embed)
         
-        # Fish collection pages
-        if fish:
-            fish_by_type = {}
-            for f in fish:
-                fish_by_type.setdefault(f["type"], []).append(f)
-                
-            for fish_type, fish_list in fish_by_type.items():
-                embed = discord.Embed(
-                    title=f"🐟 {fish_type.title()} Fish Collection",
-                    color=discord.Color.blue()
-                )
-                
-                total_value = sum(f["value"] for f in fish_list)
-                embed.description = f"Total Value: **{total_value}** {self.currency}\nAmount: {len(fish_list)}"
-                
-                for fish in sorted(fish_list, key=lambda x: x["value"], reverse=True)[:5]:
-                    embed.add_field(
-                        name=f"{fish['name']} ({fish['value']} {self.currency})",
-                        value=f"Caught: {fish['caught_at'].split('T')[0]}",
-                        inline=False
-                    )
-                    
-                pages.append(embed)
+        # Fish collection pages, FISH_PER_PAGE per page, fetched as they're viewed
+        if summary:
+            for fish_type, totals in summary.items():
+                for skip in range(0, totals["count"], self.FISH_PER_PAGE):
+                    pages.append((fish_type, totals, skip))
         else:
             pages.append(discord.Embed(
                 title="🐟 Fish Collection",
@@ -175,6 +160,8 @@ class Fishing(commands.Cog):
                 color=discord.Color.blue()
             ))
         
+        cog = self
+        
         class PaginationView(discord.ui.View):
             def __init__(self, pages, author, timeout=60):
                 super().__init__(timeout=timeout)
@@ -184,7 +171,7 @@ class Fishing(commands.Cog):
                 
             async def update_message(self, interaction):
                 self.current_page %= len(self.pages)  # Wrap around
-                page = self.pages[self.current_page]
+                page = await cog._render_fish_page(self.author, self.pages[self.current_page])
                 self.update_buttons()
                 await interaction.response.edit_message(embed=page, view=self)
                 
@@ -222,41 +209,54 @@ class Fishing(commands.Cog):
                 return True
         
         view = PaginationView(pages, ctx.author)
+        view.update_buttons()
         await ctx.reply(embed=pages[0], view=view)
 
+    async def _render_fish_page(self, author, page) -> discord.Embed:
+        """Build a fish collection page; pages are (type, totals, skip) until viewed"""
+        if isinstance(page, discord.Embed):
+            return page
+        fish_type, totals, skip = page
+        fish_list = await db.get_fish(author.id, fish_type=fish_type, skip=skip, limit=self.FISH_PER_PAGE)
+        
+        embed = discord.Embed(
+            title=f"🐟 {fish_type.title()} Fish Collection",
+            color=discord.Color.blue()
+        )
+        embed.description = f"Total Value: **{totals['value']}** {self.currency}\nAmount: {totals['count']}"
+        
+        for fish in fish_list:
+            embed.add_field(
+                name=f"{fish['name']} ({fish['value']} {self.currency})",
+                value=f"Caught: {fish['caught_at'].split('T')[0]}",
+                inline=False
+            )
+        return embed
+
     @commands.command(name="sellfish", aliases=["sellf", 'sell_fish', 'sf'])
     @commands.cooldown(1, 3, commands.BucketType.user)
     async def sellfish(self, ctx, fish_id: str = "all"):
         """Sell fish from your inventory"""
-        fish = await db.get_fish(ctx.author.id)
-        if not fish:
-            return await ctx.reply("You don't have any fish to sell!")
-            
         if fish_id.lower() == "all":
-            total_value = sum(f["value"] for f in fish)
-            if await db.update_balance(ctx.author.id, total_value):
-                await db.clear_fish(ctx.author.id)
-                embed = discord.Embed(
-                    title="🐟 Fish Sold!",
-                    description=f"Sold {len(fish)} fish for **{total_value}** {self.currency}",
-                    color=discord.Color.green()
-                )
-                return await ctx.reply(embed=embed)
-            await ctx.reply("❌ Failed to sell fish!")
-        else:
-            fish_to_sell = next((f for f in fish if f["id"] == fish_id), None)
-            if not fish_to_sell:
-                return await ctx.reply("❌ Fish not found in your inventory!")
-                
-            if await db.update_balance(ctx.author.id, fish_to_sell["value"]):
-                await db.remove_fish(ctx.author.id, fish_id)
-                embed = discord.Embed(
-                    title="🐟 Fish Sold!",
-                    description=f"Sold {fish_to_sell['name']} for **{fish_to_sell['value']}** {self.currency}",
-                    color=discord.Color.green()
-                )
-                return await ctx.reply(embed=embed)
-            await ctx.reply("❌ Failed to sell fish!")
+            count, total_value = await db.sell_all_fish(ctx.author.id)
+            if not count:
+                return await ctx.reply("You don't have any fish to sell!")
+            embed = discord.Embed(
+                title="🐟 Fish Sold!",
+                description=f"Sold {count} fish for **{total_value}** {self.currency}",
+                color=discord.Color.green()
+            )
+            return await ctx.reply(embed=embed)
+        
+        fish_sold = await db.sell_fish(ctx.author.id, fish_id)
+        if not fish_sold:
+            return await ctx.reply("❌ Fish not found in your inventory!")
+        embed = discord.Embed(
+            title="🐟 Fish Sold!",
+            description=f"Sold {fish_sold['name']} for **{fish_sold['value']}** {self.currency}",
+            color=discord.Color.green()
+        )
+        await ctx.reply(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(Fishing(bot))
\ No newline at end of file
@@ -144,7 +144,7 @@ class Gambling(commands.Cog):
             # Check for bust
             player_total = self._hand_value(player_hand)
             if player_total > 21:
-                await db.update_wallet(user_id, -bet, interaction.guild.id)
+                await db.update_wallet(user_id, -bet, interaction.guild.id, reason="blackjack")
                 embed = self._blackjack_embed(
                     f"Bust! You lose {bet:,} {self.currency}",
                     player_hand,
@@ -196,7 +196,7 @@ class Gambling(commands.Cog):
                 winnings = 0
                 
             # Update balance
-            await db.update_wallet(user_id, winnings, interaction.guild.id)
+            await db.update_wallet(user_id, winnings, interaction.guild.id, reason="blackjack")
             
             # Send final result
             embed = self._blackjack_embed(
@@ -226,7 +226,7 @@ class Gambling(commands.Cog):
             # Check for bust
             player_total = self._hand_value(player_hand)
             if player_total > 21:
-                await db.update_wallet(user_id, -new_bet, interaction.guild.id)
+                await db.update_wallet(user_id, -new_bet, interaction.guild.id, reason="blackjack")
                 embed = self._blackjack_embed(
                     f"Bust! You lose {new_bet:,} {self.currency}",
                     player_hand,
@@ -262,7 +262,7 @@ class Gambling(commands.Cog):
                 winnings = 0
                 
             # Update balance
-            await db.update_wallet(user_id, winnings, interaction.guild.id)
+            await db.update_wallet(user_id, winnings, interaction.guild.id, reason="blackjack")
             
             # Send final result
             embed = self._blackjack_embed(
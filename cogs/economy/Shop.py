@@ -266,6 +266,15 @@ class Shop(commands.Cog):
             }
         }
 
+        # Register static items with the shared catalog, ahead of DB shops
+        db.catalog.register_static("fishing_items", self.FISHING_ITEMS, priority=0)
+        db.catalog.register_static("shop_items", self.SHOP_ITEMS, priority=1)
+        for event_name, event_data in self.SEASONAL_EVENTS.items():
+            db.catalog.register_static(
+                f"seasonal_{event_name}", event_data["items"], priority=2,
+                active_months=event_data["active_months"]
+            )
+
         # Initialize shop stats
         self.stats = ShopStats(self)
 
@@ -610,7 +619,7 @@ class Shop(commands.Cog):
                 await ctx.reply(f"❌ Amount too large for {item_id}. Maximum 100 per item.")
                 return
                 
-            item = await self._find_item_in_shops(item_id, user_id)
+            item = await self._find_item_in_shops(item_id, user_id, guild_id)
             if not item:
                 await ctx.reply(f"❌ Item `{item_id}` not found in any shop.")
                 return
@@ -659,58 +668,31 @@ class Shop(commands.Cog):
             
         return True
 
-    async def _find_item_in_shops(self, item_id: str, user_id: int = None) -> dict:
-        # Check fishing items first
-        if item_id in self.FISHING_ITEMS:
-            item = self.FISHING_ITEMS[item_id].copy()
+    async def _find_item_in_shops(self, item_id: str, user_id: int = None, guild_id: int = None) -> dict:
+        source, item = await db.catalog.lookup(item_id, guild_id)
+        if not item:
+            return None
+
+        # For free fishing items, check if user already has them
+        if source == "fishing_items" and item["price"] == 0 and user_id:
+            user_fishing_items = await db.get_fishing_items(user_id)
             
-            # For free items, check if user already has them
-            if item["price"] == 0 and user_id:
-                user_fishing_items = await db.get_fishing_items(user_id)
-                
-                if item["type"] == "rod":
-                    # Check if user already has this specific rod
-                    has_rod = any(r["id"] == item_id for r in user_fishing_items.get("rods", []))
-                    if has_rod:
+            if item["type"] == "rod":
+                # Check if user already has this specific rod
+                has_rod = any(r["id"] == item_id for r in user_fishing_items.get("rods", []))
+                if has_rod:
+                    item["unavailable"] = True
+                    item["reason"] = "You already own this rod."
+                    
+            elif item["type"] == "bait":
+                # For free bait, check if user has any bait at all
+                if item_id == "beginner_bait":
+                    has_any_bait = len(user_fishing_items.get("bait", [])) > 0
+                    if has_any_bait:
                         item["unavailable"] = True
-                        item["reason"] = "You already own this rod."
-                        return item
-                        
-                elif item["type"] == "bait":
-                    # For free bait, check if user has any bait at all
-                    if item_id == "beginner_bait":
-                        has_any_bait = len(user_fishing_items.get("bait", [])) > 0
-                        if has_any_bait:
-                            item["unavailable"] = True
-                            item["reason"] = "You already have bait."
-                            return item
-            
-            return item
-            
-        # Check general shop items
-        if item_id in self.SHOP_ITEMS:
-            return self.SHOP_ITEMS[item_id].copy()
-            
-        # Check seasonal items
-        seasonal_items = self.get_current_seasonal_items()
-        if item_id in seasonal_items:
-            return seasonal_items[item_id].copy()
-            
-        # Check database shop items (for future expansion)
-        shop_types = ["items", "fishing", "potions", "upgrades"]
+                        item["reason"] = "You already have bait."
         
-        for shop_type in shop_types:
-            try:
-                collection = getattr(db.db, f"shop_{shop_type}", None)
-                if collection:
-                    item = await collection.find_one({"id": item_id})
-                    if item:
-                        item['_shop_type'] = shop_type
-                        return item
-            except:
-                continue
-                
-        return None
+        return item
 
     async def _confirm_purchase(self, ctx, purchase_plan: list, total_cost: int) -> bool:
         embed = discord.Embed(
@@ -806,12 +788,7 @@ class Shop(commands.Cog):
                 return await db.increase_bank_limit(user_id, item.get("amount", 0), guild_id)
             else:
                 # General item - add to inventory
-                result = await db.db.users.update_one(
-                    {"_id": str(user_id)},
-                    {"$push": {"inventory": item}},
-                    upsert=True
-                )
-                return result.modified_count > 0 or result.upserted_id is not None
+                return await db.add_to_inventory(user_id, guild_id, item)
                 
         except Exception as e:
             self.logger.error(f"Failed to purchase {item.get('name', 'unknown')}: {e}")
@@ -1123,7 +1100,7 @@ class Shop(commands.Cog):
 
     async def add_to_wishlist(self, ctx, item_id: str):
         """Add item to user's wishlist"""
-        item = await self._find_item_in_shops(item_id, ctx.author.id)
+        item = await self._find_item_in_shops(item_id, ctx.author.id, ctx.guild.id if ctx.guild else None)
         if not item:
             return await ctx.reply(f"❌ Item `{item_id}` not found in any shop.")
         
@@ -1,6 +1,6 @@
 from discord.ext import commands
 from cogs.logging.logger import CogLogger
-from utils.db import async_db as db
+from utils.db import async_db as db, ledger_reason
 from typing import Dict, List, Optional, Tuple
 from collections import Counter
 import discord
@@ -223,38 +223,28 @@ class TradeConfirmationView(discord.ui.View):
     async def verify_trade_validity(self) -> bool:
         """Verify that both users still have what they're trading"""
         
-        # Check initiator's items and currency
-        initiator_inventory = await db.get_inventory(self.trade_offer.initiator_id, self.trade_offer.guild_id)
-        initiator_balance = await db.get_wallet_balance(self.trade_offer.initiator_id, self.trade_offer.guild_id)
-        
-        # Only check currency if they're actually trading currency
-        if self.trade_offer.initiator_currency > 0:
-            if initiator_balance < self.trade_offer.initiator_currency:
-                return False
-        
-        # Only check items if they're actually trading items
-        if self.trade_offer.initiator_items:
-            # Count required items for initiator
-            required_items = Counter(item['id'] for item in self.trade_offer.initiator_items)
-            available_items = Counter(item['id'] for item in initiator_inventory)
-            for item_id, required_count in required_items.items():
-                if available_items[item_id] < required_count:
-                    return False
-        
-        # Check target's items and currency
-        target_inventory = await db.get_inventory(self.trade_offer.target_id, self.trade_offer.guild_id)
-        target_balance = await db.get_wallet_balance(self.trade_offer.target_id, self.trade_offer.guild_id)
+        # Fetch both sides at once, one read per user
+        initiator, target = await asyncio.gather(
+            db.get_user_snapshot(self.trade_offer.initiator_id, fields=("inventory",)),
+            db.get_user_snapshot(self.trade_offer.target_id, fields=("inventory",))
+        )
         
+        return (self._has_trade_side(initiator, self.trade_offer.initiator_items, self.trade_offer.initiator_currency)
+                and self._has_trade_side(target, self.trade_offer.target_items, self.trade_offer.target_currency))
+    
+    @staticmethod
+    def _has_trade_side(user: dict, items: List[Dict], currency: int) -> bool:
+        """Check a user snapshot still covers one side of the trade"""
         # Only check currency if they're actually trading currency
-        if self.trade_offer.target_currency > 0:
-            if target_balance < self.trade_offer.target_currency:
-                return False
+        if currency > 0 and user["wallet"] < currency:
+            return False
         
         # Only check items if they're actually trading items
-        if self.trade_offer.target_items:
-            # Count required items for target
-            required_items = Counter(item['id'] for item in self.trade_offer.target_items)
-            available_items = Counter(item['id'] for item in target_inventory)
+        if items:
+            required_items = Counter(item['id'] for item in items)
+            available_items = Counter()
+            for item in user["inventory"]:
+                available_items[item.get('id')] += item.get('quantity', 1)
             for item_id, required_count in required_items.items():
                 if available_items[item_id] < required_count:
                     return False
@@ -263,6 +253,7 @@ class TradeConfirmationView(discord.ui.View):
     
     async def _perform_trade_exchange(self) -> bool:
         """Perform the actual item and currency exchange"""
+        ledger_reason.set("trade")  # Runs from a button callback, outside any command
         try:
             # Remove items from initiator, add to target
             for item in self.trade_offer.initiator_items:
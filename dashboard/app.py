@@ -4,6 +4,8 @@ import json
 from functools import wraps
 import time
 import os
+import gzip
+import threading
 from pymongo import MongoClient
 import pymongo.errors
 from dotenv import load_dotenv
@@ -316,14 +318,60 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Where this worker is in the bot's stats stream (see utils/stats.py)
+STATS_PROTOCOL = 1
+stats_stream = {'stream': None, 'seq': None}
+stats_lock = threading.Lock()
+
+def apply_stats_payload(payload: dict):
+    """Apply a full snapshot or delta to bot_stats. Returns the seq now
+    held, or None if a delta doesn't follow on from it (resync needed)."""
+    if payload.get('type') == 'full':
+        bot_stats.clear()
+        bot_stats.update(payload['stats'])
+    elif payload.get('stream') != stats_stream['stream'] or payload.get('base') != stats_stream['seq']:
+        return None
+    else:
+        bot_stats.update(payload.get('set', {}))
+        for key in payload.get('unset', []):
+            bot_stats.pop(key, None)
+        removed = set(payload.get('guilds_removed', []))
+        if removed or payload.get('guilds_added'):
+            guilds = [guild_id for guild_id in bot_stats.get('guilds', []) if guild_id not in removed]
+            bot_stats['guilds'] = guilds + payload.get('guilds_added', [])
+    stats_stream.update(stream=payload.get('stream'), seq=payload.get('seq'))
+    return stats_stream['seq']
+
 @app.route('/api/stats', methods=['GET', 'POST'])
 def api_stats():
     global bot_stats
     if request.method == 'POST':
-        bot_stats.update(request.json)
-        return jsonify({"status": "success"})
+        data = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            data = gzip.decompress(data)
+        payload = json.loads(data)
+        with stats_lock:
+            if payload.get('protocol') != STATS_PROTOCOL:
+                # Plain stats dict from an older bot
+                bot_stats.update(payload)
+                return jsonify({"status": "success"})
+            if apply_stats_payload(payload) is None:
+                same_stream = payload.get('stream') == stats_stream['stream']
+                return jsonify({"status": "resync", "seq": stats_stream['seq'] if same_stream else None}), 409
+            return jsonify({"status": "success", "seq": stats_stream['seq']})
     return jsonify(bot_stats)
 
+@app.route('/api/stats/db')
+def api_db_stats():
+    """Database timings from the bot's last stats post"""
+    mongo = bot_stats.get('mongo', {})
+    return jsonify({
+        'methods': bot_stats.get('db_methods', {}),
+        'collections': mongo.get('collections', {}),
+        'pool_wait': mongo.get('pool_wait'),
+        'slow_queries': bot_stats.get('slow_queries', [])
+    })
+
 @app.route('/')
 def home():
     user_id = request.cookies.get('user_id')
@@ -405,7 +453,8 @@ def health():
     return jsonify({
         'status': 'ok',
         'mongodb_available': MONGODB_AVAILABLE,
-        'discord_configured': load_config()
+        'discord_configured': load_config(),
+        'bot_database': bot_stats.get('database')
     })
 
 @app.route('/servers')
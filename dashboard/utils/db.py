@@ -7,6 +7,7 @@ import asyncio
 import logging
 from typing import Dict, Any, Optional
 import threading
+from bson import ObjectId
 
 # Initialize default config
 config = {
@@ -91,15 +92,29 @@ class AsyncDatabase:
         user = await self.db.users.find_one({"_id": str(user_id)})
         return user.get("bank_limit", 10000) if user else 10000
 
+    async def _users_changed(self, *user_ids) -> None:
+        """Tell the bot to drop these users from its cache (it polls
+        user_changes, see utils/db.py in the bot). The stamp comes from the
+        server's clock, which the bot compares it against."""
+        await self.db.user_changes.update_one(
+            {"_id": ObjectId()},
+            {"$set": {"users": [str(user_id) for user_id in user_ids]}, "$currentDate": {"at": True}},
+            upsert=True
+        )
+
     async def update_wallet(self, user_id: int, amount: int, guild_id: int = None) -> bool:
         """Update user's wallet balance"""
         if not await self.ensure_connected():
             return False
         result = await self.db.users.update_one(
             {"_id": str(user_id)},
-            {"$inc": {"wallet": amount}},
+            [
+                {"$set": {"wallet": {"$add": [{"$ifNull": ["$wallet", 0]}, amount]}}},
+                {"$set": {"net_worth": {"$add": [{"$ifNull": ["$wallet", 0]}, {"$ifNull": ["$bank", 0]}]}}}
+            ],
             upsert=True
         )
+        await self._users_changed(user_id)
         return result.modified_count > 0 or result.upserted_id is not None
 
     async def update_bank(self, user_id: int, amount: int, guild_id: int = None) -> bool:
@@ -108,9 +123,13 @@ class AsyncDatabase:
             return False
         result = await self.db.users.update_one(
             {"_id": str(user_id)},
-            {"$inc": {"bank": amount}},
+            [
+                {"$set": {"bank": {"$add": [{"$ifNull": ["$bank", 0]}, amount]}}},
+                {"$set": {"net_worth": {"$add": [{"$ifNull": ["$wallet", 0]}, {"$ifNull": ["$bank", 0]}]}}}
+            ],
             upsert=True
         )
+        await self._users_changed(user_id)
         return result.modified_count > 0 or result.upserted_id is not None
 
     async def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
@@ -202,6 +221,7 @@ class AsyncDatabase:
             {"$inc": {"bank_limit": amount}},
             upsert=True
         )
+        await self._users_changed(user_id)
         return result.modified_count > 0 or result.upserted_id is not None
 
     async def get_global_net_worth(self, user_id: int, excluded_guilds: list = None) -> int:
@@ -222,8 +242,16 @@ class AsyncDatabase:
         """Get user's inventory"""
         if not await self.ensure_connected():
             return []
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("inventory", []) if user else []
+        user = await self.db.users.find_one({"_id": str(user_id)}, projection={"items": 1, "inventory": 1})
+        if not user:
+            return []
+        # Counted items map, plus any legacy array the bot hasn't compacted yet
+        inventory = [
+            dict(entry.get("meta", {}), quantity=entry.get("qty", 0))
+            for entry in (user.get("items") or {}).values()
+            if entry.get("qty", 0) > 0
+        ]
+        return inventory + user.get("inventory", [])
 
     async def add_potion(self, user_id: int, potion: dict) -> bool:
         """Add active potion effect to user"""
@@ -242,11 +270,20 @@ class AsyncDatabase:
         """Remove item from user's inventory"""
         if not await self.ensure_connected():
             return False
+        key = str(item_id).replace(".", "_").lstrip("$")
         result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$pull": {"inventory": {"id": item_id}}}
+            {"_id": str(user_id), f"items.{key}.qty": {"$gt": 0}},
+            {"$unset": {f"items.{key}": ""}}
         )
-        return result.modified_count > 0
+        if result.modified_count == 0:
+            result = await self.db.users.update_one(
+                {"_id": str(user_id)},
+                {"$pull": {"inventory": {"id": item_id}}}
+            )
+        if result.modified_count == 0:
+            return False
+        await self._users_changed(user_id)
+        return True
 
 
 class SyncDatabase:
@@ -0,0 +1,101 @@
+"""Smoke tests for the non-Mongo storage backends in utils/storage.py"""
+import asyncio
+
+import pytest
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.storage import MemoryClient, SQLiteClient
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def client(request, tmp_path):
+    if request.param == "memory":
+        client = MemoryClient()
+    else:
+        client = SQLiteClient(str(tmp_path / "storage.db"))
+    yield client
+    asyncio.run(client.aclose())
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_insert_find_and_upsert(client):
+    async def scenario():
+        users = client.bronxbot.users
+        await users.insert_one({"_id": "1", "wallet": 10, "guilds": ["a"]})
+        assert await users.find_one({"_id": "1"}, projection={"wallet": 1}) == {"_id": "1", "wallet": 10}
+        # Upserts seed the new document from the filter's equality fields
+        await users.update_one({"_id": "2", "guilds": "b"}, {"$inc": {"wallet": 5}}, upsert=True)
+        assert await users.find_one({"_id": "2"}) == {"_id": "2", "guilds": "b", "wallet": 5}
+        docs = await users.find({"wallet": {"$gt": 0}}).sort("wallet", -1).to_list(None)
+        assert [doc["_id"] for doc in docs] == ["1", "2"]
+    run(scenario())
+
+
+def test_guarded_updates_are_atomic(client):
+    async def scenario():
+        users = client.bronxbot.users
+        await users.insert_one({"_id": "1", "wallet": 100})
+
+        async def spend():
+            return await users.find_one_and_update(
+                {"_id": "1", "wallet": {"$gte": 30}},
+                {"$inc": {"wallet": -30}},
+                return_document=ReturnDocument.AFTER
+            )
+        results = await asyncio.gather(*(spend() for _ in range(10)))
+        assert sum(1 for doc in results if doc is not None) == 3
+        assert (await users.find_one({"_id": "1"}))["wallet"] == 10
+
+        await asyncio.gather(*(users.update_one({"_id": "1"}, {"$inc": {"wallet": 1}}) for _ in range(50)))
+        assert (await users.find_one({"_id": "1"}))["wallet"] == 60
+    run(scenario())
+
+
+def test_bulk_write_reports_duplicate_keys(client):
+    async def scenario():
+        stats = client.bronxbot.stats
+        await stats.insert_one({"_id": "1", "marked": True})
+        with pytest.raises(BulkWriteError) as error:
+            await stats.bulk_write([
+                UpdateOne({"_id": "1", "marked": {"$ne": True}}, {"$set": {"marked": True}}, upsert=True),
+                UpdateOne({"_id": "2", "marked": {"$ne": True}}, {"$set": {"marked": True}}, upsert=True),
+            ], ordered=False)
+        details = error.value.details
+        assert [err["code"] for err in details["writeErrors"]] == [11000]
+        assert details["nUpserted"] == 1
+    run(scenario())
+
+
+def test_explain_plans_from_created_indexes(client):
+    async def scenario():
+        users = client.bronxbot.users
+
+        async def stages(query, sort=None):
+            cursor = users.find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+            found = []
+            while plan:
+                found.append(plan["stage"])
+                plan = plan.get("inputStage")
+            return found
+
+        leaderboard = ({"guilds": "1", "net_worth": {"$gt": 0}}, [("net_worth", -1)])
+        assert await stages({"_id": "1"}) == ["IDHACK"]
+        assert await stages(*leaderboard) == ["SORT", "COLLSCAN"]
+
+        await users.create_index([("net_worth", -1), ("_id", 1)])
+        assert await stages(*leaderboard) == ["FETCH", "IXSCAN"]
+        await users.create_index([("guilds", 1), ("net_worth", -1)])
+        plan = (await users.find(leaderboard[0]).sort(leaderboard[1]).explain())["queryPlanner"]["winningPlan"]
+        assert plan["inputStage"]["indexName"] == "guilds_1_net_worth_-1"
+        assert await stages({"wallet": {"$gt": 0}}) == ["COLLSCAN"]
+
+        await users.drop_index("guilds_1_net_worth_-1")
+        assert "guilds_1_net_worth_-1" not in await users.index_information()
+    run(scenario())
@@ -0,0 +1,144 @@
+"""Guild chunking scheduler and member cache policy.
+
+Guilds are not chunked at startup (chunk_guilds_at_startup=False). On ready
+GuildChunker chunks MAIN_GUILD_IDS; any other guild is chunked the first
+time a command is used in it. At most per_shard chunk requests run at
+once on each shard. Guilds nobody uses keep only the members the
+MemberCacheFlags policy caches from events."""
+import array
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+import discord
+
+def member_cache_flags(policy: str = None) -> discord.MemberCacheFlags:
+    """MemberCacheFlags from a policy string: "all", "none", or a comma
+    separated list of flags to enable ("joined,voice"). Defaults to the
+    MEMBER_CACHE_POLICY env var, then "all"."""
+    policy = (policy or os.getenv('MEMBER_CACHE_POLICY') or 'all').strip().lower()
+    if policy == 'all':
+        return discord.MemberCacheFlags.all()
+    if policy == 'none':
+        return discord.MemberCacheFlags.none()
+    flags = discord.MemberCacheFlags.none()
+    for name in filter(None, (part.strip() for part in policy.split(','))):
+        if name not in discord.MemberCacheFlags.VALID_FLAGS:
+            raise ValueError(f"Unknown member cache flag '{name}', expected one of {sorted(discord.MemberCacheFlags.VALID_FLAGS)}")
+        setattr(flags, name, True)
+    return flags
+
+def _shallow_size(obj) -> int:
+    """getsizeof obj plus the values in its slots, not following references
+    to other discord objects (guild, state, ...)"""
+    size = sys.getsizeof(obj)
+    for cls in type(obj).__mro__:
+        for slot in getattr(cls, '__slots__', ()):
+            value = getattr(obj, slot, None)
+            if isinstance(value, (str, bytes, tuple, list, dict, int, float, array.array)):
+                size += sys.getsizeof(value)
+    return size
+
+def member_size(member: discord.Member) -> int:
+    """Approximate bytes one cached member holds, including its user"""
+    return _shallow_size(member) + _shallow_size(member._user)
+
+class GuildChunker:
+    """Chunks guilds on demand with bounded concurrency per shard"""
+
+    def __init__(self, bot, priority_guild_ids: Iterable[int] = (), per_shard: int = None):
+        self.bot = bot
+        self.priority_guild_ids = list(priority_guild_ids)
+        self.per_shard = per_shard or int(os.getenv('CHUNK_CONCURRENCY_PER_SHARD', 2))
+        self.logger = logging.getLogger('GuildChunker')
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self._pending: Dict[int, asyncio.Task] = {}
+        self.chunk_times: Dict[int, float] = {}
+        self.failures = defaultdict(int)
+
+    def _semaphore(self, shard_id: int) -> asyncio.Semaphore:
+        if shard_id not in self._semaphores:
+            self._semaphores[shard_id] = asyncio.Semaphore(self.per_shard)
+        return self._semaphores[shard_id]
+
+    def request(self, guild: Optional[discord.Guild]) -> Optional[asyncio.Task]:
+        """Schedule guild to be chunked, unless it already is or is queued.
+        Returns the chunking task, if any, without waiting for it."""
+        if guild is None or guild.chunked:
+            return None
+        task = self._pending.get(guild.id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._chunk(guild))
+            self._pending[guild.id] = task
+        return task
+
+    async def ensure_chunked(self, guild: Optional[discord.Guild]) -> None:
+        """Wait until guild's member list is complete"""
+        task = self.request(guild)
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def _chunk(self, guild: discord.Guild) -> None:
+        try:
+            async with self._semaphore(guild.shard_id):
+                if guild.chunked:
+                    return
+                start = time.time()
+                await guild.chunk()
+                self.chunk_times[guild.id] = time.time() - start
+            self.bot.dispatch('guild_members_chunked', guild)
+        except Exception as e:
+            self.failures[guild.id] += 1
+            self.logger.error(f"Failed to chunk guild {guild.id}: {e}")
+        finally:
+            self._pending.pop(guild.id, None)
+
+    async def chunk_priority_guilds(self) -> float:
+        """Chunk the priority guilds this bot is in. Returns seconds taken."""
+        start = time.time()
+        guilds = [self.bot.get_guild(guild_id) for guild_id in self.priority_guild_ids]
+        tasks = [task for task in map(self.request, guilds) if task is not None]
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.time() - start
+
+    def stats(self) -> dict:
+        chunked = sum(1 for guild in self.bot.guilds if guild.chunked)
+        return {
+            'chunked': chunked,
+            'unchunked': len(self.bot.guilds) - chunked,
+            'pending': len(self._pending),
+            'per_shard': self.per_shard,
+            'failures': sum(self.failures.values()),
+            'chunk_time_total': round(sum(self.chunk_times.values()), 3)
+        }
+
+def member_cache_report(guilds: Iterable[discord.Guild], sample: int = 20) -> Dict[int, dict]:
+    """Per guild: members cached vs member_count, whether it is chunked and
+    an approximate size of its member cache, extrapolated from up to sample
+    members."""
+    report = {}
+    for guild in guilds:
+        members = guild.members
+        sampled = members[:sample]
+        per_member = sum(map(member_size, sampled)) / len(sampled) if sampled else 0
+        report[guild.id] = {
+            'name': guild.name,
+            'cached': len(members),
+            'member_count': guild.member_count or 0,
+            'chunked': guild.chunked,
+            'approx_bytes': int(per_member * len(members))
+        }
+    return report
+
+def process_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, where /proc exists"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
@@ -1,12 +1,23 @@
 import motor.motor_asyncio
 import pymongo
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError
 import json
 import datetime
 import os
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+import time
+import contextvars
+import functools
+import math
+import random
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from typing import Callable, Dict, Any, Optional
 import threading
+import sqlite3
+from utils.storage import create_client, StorageClient
 
 def load_config() -> dict:
     """Load config from environment variables, then config.json as fallback."""
@@ -15,7 +26,18 @@ def load_config() -> dict:
         "TOKEN": os.getenv("DISCORD_TOKEN"),
         "CLIENT_ID": os.getenv("DISCORD_CLIENT_ID"),
         "CLIENT_SECRET": os.getenv("DISCORD_CLIENT_SECRET"),
-        "OWNER_ID": os.getenv("DISCORD_BOT_OWNER_ID")
+        "OWNER_ID": os.getenv("DISCORD_BOT_OWNER_ID"),
+        # Connection pool and driver tuning, see mongo_client_options
+        "MONGO_MAX_POOL_SIZE": os.getenv("MONGO_MAX_POOL_SIZE"),
+        "MONGO_MIN_POOL_SIZE": os.getenv("MONGO_MIN_POOL_SIZE"),
+        "MONGO_MAX_IDLE_TIME_MS": os.getenv("MONGO_MAX_IDLE_TIME_MS"),
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "MONGO_COMPRESSORS": os.getenv("MONGO_COMPRESSORS"),
+        "MONGO_READ_PREFERENCE": os.getenv("MONGO_READ_PREFERENCE"),
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        # Storage backend for AsyncDatabase: mongo, memory or sqlite (see utils/storage.py)
+        "DB_BACKEND": os.getenv("DB_BACKEND"),
+        "DB_SQLITE_PATH": os.getenv("DB_SQLITE_PATH")
     }
     if not all([config["MONGO_URI"], config["TOKEN"], config["CLIENT_ID"]]):
         try:
@@ -30,6 +52,905 @@ def load_config() -> dict:
 
 config = load_config()
 
+# Driver defaults for the pool settings load_config leaves unset
+MONGO_POOL_DEFAULTS = {
+    "MONGO_MAX_POOL_SIZE": 100,
+    "MONGO_MIN_POOL_SIZE": 5,
+    "MONGO_MAX_IDLE_TIME_MS": 300000,
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": 5000,
+    "MONGO_COMPRESSORS": "zstd,snappy,zlib",
+    "MONGO_READ_PREFERENCE": "primary",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": 10000
+}
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram in milliseconds.
+
+    Bucket i counts samples <= BOUNDS[i], the last bucket everything above.
+    Percentiles are read off the bucket bounds, which is precise enough to
+    tell a 2ms wait from a 200ms one."""
+    BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, ms: float) -> None:
+        i = 0
+        while i < len(self.BOUNDS) and ms > self.BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(float(self.BOUNDS[i]), self.max) if i < len(self.BOUNDS) else self.max, 2)
+        return round(self.max, 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum / self.total, 2) if self.total else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 2),
+            "buckets": dict(zip([str(b) for b in self.BOUNDS] + ["inf"], self.counts))
+        }
+
+def query_shape(value):
+    """Structure of a filter/update/pipeline with every value replaced by "?".
+
+    Keys and operators stay, so slow-query entries show which fields and
+    operators a query used without leaking ids or balances. Lists collapse
+    to their distinct element shapes ({"$in": [1, 2, 3]} -> {"$in": ["?"]})."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+# Parts of a command document worth showing in the slow-query log
+QUERY_SHAPE_FIELDS = ("filter", "query", "pipeline", "updates", "deletes", "update", "sort")
+
+class SlowQueryLog:
+    """Most recent calls slower than threshold_ms, newest last.
+
+    Fed by MongoMetrics (individual commands, with their redacted shape) and
+    by the AsyncDatabase method timer (whole method calls). Every entry is
+    also logged as a warning."""
+
+    def __init__(self, threshold_ms: float = 100.0, max_entries: int = 200):
+        self.threshold_ms = threshold_ms
+        self._entries = deque(maxlen=max_entries)
+        self.logger = logging.getLogger('AsyncDatabase.slow')
+
+    def add(self, kind: str, name: str, ms: float, collection: str = None, shape=None) -> None:
+        entry = {
+            "ts": time.time(),
+            "kind": kind,
+            "name": name,
+            "collection": collection,
+            "ms": round(ms, 2),
+            "shape": shape
+        }
+        self._entries.append(entry)
+        target = f"{collection}.{name}" if collection else name
+        self.logger.warning(f"Slow {kind} {target}: {ms:.1f}ms" + (f" {json.dumps(shape, default=str)}" if shape else ""))
+
+    def entries(self, limit: int = None) -> list:
+        entries = list(self._entries)
+        return entries[-limit:] if limit else entries
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+slow_queries = SlowQueryLog(threshold_ms=float(os.getenv('DB_SLOW_QUERY_MS', 100)))
+
+class MongoMetrics(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    """Driver event listener separating pool wait from server time.
+
+    Pool checkout wait is measured from ConnectionCheckOutStarted to the
+    matching checked out/failed event (same thread, since the driver checks
+    out synchronously on its caller's thread). Server time comes from the
+    command succeeded/failed events, per command name and per collection;
+    commands slower than slow_queries.threshold_ms are logged with their
+    redacted shape. Shared by the Motor and pymongo clients, so everything
+    is guarded by one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = {}
+        self._in_flight = {}
+        self.pool_wait = LatencyHistogram()
+        self.commands = defaultdict(LatencyHistogram)
+        self.collections = defaultdict(LatencyHistogram)
+        self.checkout_failures = defaultdict(int)
+        self.command_failures = defaultdict(int)
+        self.collection_failures = defaultdict(int)
+        self.connections = {"created": 0, "closed": 0, "checked_out": 0}
+
+    # Command events
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        if isinstance(target, str):
+            self._in_flight[(event.connection_id, event.request_id)] = (target, event.command)
+
+    def _finish(self, event, failed: bool) -> None:
+        collection, command = self._in_flight.pop((event.connection_id, event.request_id), (None, None))
+        ms = event.duration_micros / 1000
+        with self._lock:
+            self.commands[event.command_name].record(ms)
+            if collection:
+                self.collections[collection].record(ms)
+            if failed:
+                self.command_failures[event.command_name] += 1
+                if collection:
+                    self.collection_failures[collection] += 1
+        if ms >= slow_queries.threshold_ms:
+            shape = None
+            if command is not None:
+                shape = {field: query_shape(command[field]) for field in QUERY_SHAPE_FIELDS if field in command}
+            slow_queries.add("command", event.command_name, ms, collection=collection, shape=shape)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    # Connection pool events
+    def connection_check_out_started(self, event):
+        self._checkout_started[(event.address, threading.get_ident())] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = self._checkout_started.pop((event.address, threading.get_ident()), None)
+        with self._lock:
+            self.connections["checked_out"] += 1
+            if started is not None:
+                self.pool_wait.record((time.perf_counter() - started) * 1000)
+
+    def connection_check_out_failed(self, event):
+        started = self._checkout_started.pop((event.address, threading.get_ident()), None)
+        with self._lock:
+            self.checkout_failures[str(event.reason)] += 1
+            if started is not None:
+                self.pool_wait.record((time.perf_counter() - started) * 1000)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections["checked_out"] -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections["created"] += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections["closed"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Histogram summaries for the stats payload and .dbpool"""
+        with self._lock:
+            return {
+                "pool_wait": self.pool_wait.stats(),
+                "checkout_failures": dict(self.checkout_failures),
+                "connections": {
+                    **self.connections,
+                    "open": self.connections["created"] - self.connections["closed"]
+                },
+                "commands": {name: hist.stats() for name, hist in sorted(self.commands.items())},
+                "command_failures": dict(self.command_failures),
+                "collections": {
+                    name: {**hist.stats(), "errors": self.collection_failures.get(name, 0)}
+                    for name, hist in sorted(self.collections.items())
+                }
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.pool_wait = LatencyHistogram()
+            self.commands.clear()
+            self.collections.clear()
+            self.checkout_failures.clear()
+            self.command_failures.clear()
+            self.collection_failures.clear()
+
+mongo_metrics = MongoMetrics()
+
+class MethodTimings:
+    """Call count, error count and latency histogram per AsyncDatabase method.
+
+    Only exceptions that escape the method count as errors; most methods
+    log and return a default instead, those failures show up per
+    collection in mongo_metrics."""
+
+    def __init__(self):
+        self.latency = defaultdict(LatencyHistogram)
+        self.errors = defaultdict(int)
+
+    def record(self, name: str, ms: float, error: bool = False) -> None:
+        self.latency[name].record(ms)
+        if error:
+            self.errors[name] += 1
+        if ms >= slow_queries.threshold_ms:
+            slow_queries.add("method", name, ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-method summaries without buckets, for .dbstats and the dashboard"""
+        result = {}
+        for name, hist in sorted(self.latency.items()):
+            summary = hist.stats()
+            summary.pop("buckets")
+            summary["total_ms"] = round(hist.sum, 2)
+            summary["errors"] = self.errors.get(name, 0)
+            result[name] = summary
+        return result
+
+    def reset(self) -> None:
+        self.latency.clear()
+        self.errors.clear()
+
+db_timings = MethodTimings()
+
+# Public coroutines timed_methods leaves alone: the connection check every
+# other method already goes through, and shutdown
+UNTIMED_METHODS = {"ensure_connected", "ping", "close"}
+
+def timed(name: str):
+    """Record each call of the decorated coroutine in db_timings under name"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                db_timings.record(name, (time.perf_counter() - start) * 1000, error=True)
+                raise
+            db_timings.record(name, (time.perf_counter() - start) * 1000)
+            return result
+        return wrapper
+    return decorator
+
+def timed_methods(cls):
+    """Wrap every public coroutine method cls defines with timed(). Private
+    helpers aren't wrapped: they run inside public methods, which would
+    then be timed (and logged as slow) twice."""
+    for name, attr in list(vars(cls).items()):
+        if asyncio.iscoroutinefunction(attr) and not name.startswith("_") and name not in UNTIMED_METHODS:
+            setattr(cls, name, timed(name)(attr))
+    return cls
+
+def mongo_client_options(config: dict) -> Dict[str, Any]:
+    """MongoClient/AsyncIOMotorClient keyword arguments from load_config().
+
+    Compressors are only offered to the server if their package is
+    installed (zstandard for zstd, python-snappy for snappy); zlib is in
+    the standard library."""
+    def setting(key):
+        value = config.get(key)
+        return MONGO_POOL_DEFAULTS[key] if value in (None, "") else value
+
+    compressors = []
+    for name in str(setting("MONGO_COMPRESSORS")).split(","):
+        name = name.strip().lower()
+        module = {"zstd": "zstandard", "snappy": "snappy"}.get(name)
+        if module:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        if name:
+            compressors.append(name)
+
+    options = {
+        "maxPoolSize": int(setting("MONGO_MAX_POOL_SIZE")),
+        "minPoolSize": int(setting("MONGO_MIN_POOL_SIZE")),
+        "maxIdleTimeMS": int(setting("MONGO_MAX_IDLE_TIME_MS")),
+        "waitQueueTimeoutMS": int(setting("MONGO_WAIT_QUEUE_TIMEOUT_MS")),
+        "readPreference": setting("MONGO_READ_PREFERENCE"),
+        "serverSelectionTimeoutMS": int(setting("MONGO_SERVER_SELECTION_TIMEOUT_MS")),
+        "event_listeners": [mongo_metrics]
+    }
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+# Values returned for fields a user document doesn't have yet
+USER_DEFAULTS = {
+    "wallet": 0,
+    "bank": 0,
+    "bank_limit": 10000,
+    "interest_level": 0,
+    "inventory": [],
+    "items": {},
+    "fish": [],
+    "fishing_rods": [],
+    "fishing_bait": []
+}
+
+# Fields every user snapshot includes
+SNAPSHOT_FIELDS = ("wallet", "bank", "bank_limit", "interest_level")
+
+MAX_BALANCE = 9223372036854775807  # int64 max
+# Pipeline stage recomputing the materialized net_worth leaderboards sort on
+NET_WORTH_STAGE = {"$set": {"net_worth": {"$add": [{"$ifNull": ["$wallet", 0]}, {"$ifNull": ["$bank", 0]}]}}}
+# Bump to make the next process that connects backfill net_worth again
+NET_WORTH_BACKFILL_VERSION = 1
+
+# Set on a guild's stats document once its counts from the SQLite
+# guild_stats table (where stats lived before) have been added to it
+STATS_IMPORTED_FIELD = "sqlite_imported"
+
+# Users written outside the bot (by the dashboard, see dashboard/utils/db.py)
+# are listed in user_changes, stamped with the server's clock. Every bot
+# process polls it and drops them from its own UserCache. Each poll looks
+# back USER_CHANGES_OVERLAP before the newest change it has seen, so a
+# change that committed late with an earlier stamp isn't missed.
+USER_CHANGES_OVERLAP = datetime.timedelta(seconds=30)
+USER_CHANGES_TTL = 600  # seconds a change is kept
+
+# Daily interest: base + interest_level * per_level + a random bonus of up
+# to random_max (in 1/100 steps), capped at cap of the user's wallet + bank
+INTEREST_RATES = {"base": 0.0003, "per_level": 0.0005, "random_max": 0.001, "cap": 0.01}
+INTEREST_PERIOD = datetime.timedelta(days=1)
+# Scratch field apply_interest totals the amounts it paid from, then unsets
+INTEREST_PAID_FIELD = "_interest_paid"
+
+# Server error code for a duplicate key
+DUPLICATE_KEY_ERROR = 11000
+
+# Money supply checkpoints only take ledger entries written at least
+# LEDGER_SETTLE ago, so inserts still in flight aren't skipped, and look for
+# entries up to LEDGER_LATE_WINDOW older than the checkpoint
+LEDGER_SETTLE = datetime.timedelta(seconds=60)
+LEDGER_LATE_WINDOW = datetime.timedelta(days=1)
+
+# What the current task is doing, recorded as the reason on ledger entries
+# when a balance update doesn't pass one (set per command in bronxbot.py)
+ledger_reason = contextvars.ContextVar("ledger_reason", default=None)
+
+# Declarative index manifest, applied by AsyncDatabase.ensure_indexes:
+# collection -> [(keys, create_index options)]
+INDEX_MANIFEST = {
+    "users": [
+        ([("net_worth", -1), ("_id", 1)], {}),  # Global leaderboard (covered)
+        ([("guilds", 1), ("net_worth", -1)], {}),  # Server leaderboards
+        ([("interest_claimed_at", 1)], {}),  # Interest batch eligibility
+    ],
+    "fish": [
+        ([("user_id", 1), ("caught_at", -1)], {}),  # Newest catches, sell-all cutoff
+        ([("user_id", 1), ("type", 1), ("value", -1)], {}),  # Per-type pages by value
+    ],
+    "trade_history": [
+        ([("initiator_id", 1), ("completed_at", -1)], {}),  # Trade history/stats ($or branch)
+        ([("target_id", 1), ("completed_at", -1)], {}),  # Trade history/stats ($or branch)
+        ([("guild_id", 1), ("completed_at", -1)], {}),  # Trade leaderboard
+    ],
+    "purchases": [
+        ([("timestamp", -1)], {}),  # Today's activity
+        ([("item_id", 1)], {}),  # Popular items
+    ],
+    "wishlists": [
+        ([("user_id", 1)], {}),
+    ],
+    "shops": [
+        ([("guild_id", 1), ("type", 1)], {}),
+    ],
+    **{
+        f"shop_{shop_type}": [([("id", 1), ("guild_id", 1)], {})]
+        for shop_type in ("items", "fishing", "potions", "upgrades", "bait", "rod", "fish")
+    },
+    "active_potions": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),  # TTL
+    ],
+    "active_buffs": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),  # TTL
+    ],
+    "global_buffs": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),  # TTL
+    ],
+    "user_changes": [
+        ([("at", 1)], {"expireAfterSeconds": USER_CHANGES_TTL}),  # Polled by time; TTL
+    ],
+}
+
+# Hot queries checked by AsyncDatabase.audit_queries:
+# (name, collection, filter or filter factory, sort, limit)
+HOT_QUERIES = [
+    ("global leaderboard", "users", {"net_worth": {"$gt": 0}}, [("net_worth", -1)], 10),
+    ("server leaderboard", "users", {"guilds": "0", "net_worth": {"$gt": 0}}, [("net_worth", -1)], 10),
+    ("fish pages", "fish", {"user_id": "0", "type": "normal"}, [("value", -1)], 5),
+    ("fish sell-all", "fish", {"user_id": "0", "caught_at": {"$lte": "9999"}}, None, 0),
+    ("trade history", "trade_history",
+     {"$or": [{"initiator_id": "0"}, {"target_id": "0"}]}, [("completed_at", -1)], 10),
+    ("trade stats", "trade_history",
+     lambda: {"$or": [{"initiator_id": "0"}, {"target_id": "0"}],
+              "completed_at": {"$gte": datetime.datetime.utcnow() - datetime.timedelta(days=30)}}, None, 0),
+    ("trade leaderboard", "trade_history",
+     lambda: {"guild_id": "0", "completed_at": {"$gte": datetime.datetime.utcnow() - datetime.timedelta(days=30)}},
+     None, 0),
+    ("purchases today", "purchases",
+     lambda: {"timestamp": {"$gte": datetime.datetime.utcnow() - datetime.timedelta(days=1)}}, None, 0),
+    ("wishlist", "wishlists", {"user_id": "0"}, None, 1),
+    ("shop item", "shop_items", {"id": "vip", "guild_id": None}, None, 1),
+]
+
+class BalanceUpdate:
+    """Outcome of a guarded wallet/bank update.
+
+    Truthy when the update was applied, so existing `if await ...` checks
+    keep working. guard_failed is set when the user didn't have enough
+    money for a deduction; balance holds the new value on success."""
+    __slots__ = ("applied", "guard_failed", "balance")
+
+    def __init__(self, applied: bool, guard_failed: bool = False, balance: Optional[int] = None):
+        self.applied = applied
+        self.guard_failed = guard_failed
+        self.balance = balance
+
+    def __bool__(self) -> bool:
+        return self.applied
+
+    def __repr__(self) -> str:
+        return f"BalanceUpdate(applied={self.applied}, guard_failed={self.guard_failed}, balance={self.balance})"
+
+class UserCache:
+    """Bounded LRU cache of user documents with a per-entry TTL.
+
+    Writers either merge their post-image into an existing entry or
+    invalidate it. Fills that race with a write for the same user are
+    discarded so a stale read can never overwrite a newer write.
+
+    on_change, if set, is called with the user id after every write (None
+    after clear()); under cluster.py it tells the other processes to drop
+    those users, which they do with drop()."""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_change: Optional[Callable[[Optional[str]], None]] = None
+        self._entries = OrderedDict()  # user_id -> (expires_at, doc)
+        self._inflight = {}  # user_id -> [epoch, pending fills]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, user_id) -> Optional[dict]:
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return doc
+
+    def begin_fill(self, user_id) -> int:
+        """Register an in-flight read and return its epoch"""
+        state = self._inflight.setdefault(str(user_id), [0, 0])
+        state[1] += 1
+        return state[0]
+
+    def finish_fill(self, user_id, epoch: int, doc: Optional[dict]) -> None:
+        """Store a document read from the database unless a write raced it.
+        Pass doc=None to abandon a failed read."""
+        key = str(user_id)
+        state = self._inflight.get(key)
+        if state is None:
+            return
+        state[1] -= 1
+        if state[1] <= 0:
+            del self._inflight[key]
+        if doc is not None and state[0] == epoch:
+            self._store(key, doc)
+
+    def merge(self, user_id, fields: dict) -> None:
+        """Write updated fields through to a cached document, if present"""
+        key = str(user_id)
+        self._changed(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        doc = dict(entry[1])
+        doc.update(fields)
+        self._store(key, doc)
+
+    def merge_entry(self, user_id, field: str, entry_key: str, value) -> None:
+        """Write one entry of a map field through to a cached document;
+        a value of None removes the entry"""
+        key = str(user_id)
+        self._changed(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        doc = dict(entry[1])
+        mapping = dict(doc.get(field) or {})
+        if value is None:
+            mapping.pop(entry_key, None)
+        else:
+            mapping[entry_key] = value
+        doc[field] = mapping
+        self._store(key, doc)
+
+    def invalidate(self, user_id) -> None:
+        key = str(user_id)
+        self._changed(key)
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.drop(None)
+        if self.on_change is not None:
+            self.on_change(None)
+
+    def drop(self, user_ids: Optional[list]) -> None:
+        """Forget users another process wrote to, or everyone for None,
+        without reporting it to on_change"""
+        if user_ids is None:
+            for state in self._inflight.values():
+                state[0] += 1
+            self._entries.clear()
+            return
+        for user_id in user_ids:
+            key = str(user_id)
+            self._bump(key)
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _changed(self, key: str) -> None:
+        self._bump(key)
+        if self.on_change is not None:
+            self.on_change(key)
+
+    def _bump(self, key: str) -> None:
+        state = self._inflight.get(key)
+        if state is not None:
+            state[0] += 1
+
+    def _store(self, key: str, doc: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, doc)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+class CircuitBreaker:
+    """Database health as seen by the background ping monitor.
+
+    closed: healthy, calls go through.
+    open: pings keep failing, calls fail fast without touching the driver.
+    half_open: reset_timeout has passed since opening; calls go through
+    again until the next ping decides whether to close or re-open."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+# Shop collections item lookups resolve against, highest priority first
+SHOP_COLLECTIONS = ("items", "fishing", "potions", "upgrades")
+# Every shop_* collection the catalog mirrors for listings
+ALL_SHOP_COLLECTIONS = SHOP_COLLECTIONS + ("bait", "rod", "fish")
+# Item type buy_item dispatches on, by collection
+SHOP_ITEM_TYPES = {"items": "item", "fishing": "fishing", "potions": "potion", "upgrades": "upgrade"}
+
+class ShopCatalog:
+    """In-memory id -> item index over every shop.
+
+    Mirrors the shop_* collections (global items plus per-guild overlays)
+    and any static item dicts cogs register, so resolving an item is a
+    dict lookup instead of up to four find_one calls. The index reloads
+    when the shop version stamp in the meta collection changes; it is
+    checked at most every check_interval seconds, and immediately after a
+    local write bumps it."""
+
+    def __init__(self, database: "AsyncDatabase", check_interval: float = 30.0):
+        self.database = database
+        self.check_interval = check_interval
+        self.version = None
+        self._index = {}  # item_id -> [(priority, source, guild_id, active_months, item)]
+        self._static = {}
+        self._collections = {}  # shop_type -> [item]
+        self._stale = True
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def register_static(self, source: str, items: Dict[str, dict], priority: int, active_months: list = None) -> None:
+        """Add a cog's static item dict to the index, replacing any previous
+        registration under the same source name. Items with active_months
+        only resolve during those months."""
+        for item_id in list(self._static):
+            self._static[item_id] = [c for c in self._static[item_id] if c[1] != source]
+            if not self._static[item_id]:
+                del self._static[item_id]
+        for item_id, item in items.items():
+            self._static.setdefault(item_id, []).append((priority, source, None, active_months, item))
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    async def ensure_fresh(self) -> None:
+        """Reload the index if it was invalidated or the version stamp moved"""
+        if not self._stale and time.monotonic() - self._checked_at < self.check_interval:
+            return
+        async with self._lock:
+            if not self._stale and time.monotonic() - self._checked_at < self.check_interval:
+                return
+            if not await self.database.ensure_connected():
+                return  # Keep serving the last good index
+            try:
+                version = await self.database.get_shop_version()
+                if self._stale or version != self.version:
+                    await self._reload(version)
+                self._checked_at = time.monotonic()
+                self._stale = False
+            except Exception as e:
+                self.database.logger.error(f"Failed to refresh shop catalog: {e}")
+
+    async def _reload(self, version: int) -> None:
+        results = await asyncio.gather(*(
+            getattr(self.database.db, f"shop_{shop_type}").find({}).to_list(None)
+            for shop_type in ALL_SHOP_COLLECTIONS
+        ))
+        index = {}
+        collections = {}
+        for priority, (shop_type, items) in enumerate(zip(ALL_SHOP_COLLECTIONS, results), start=100):
+            collections[shop_type] = items
+            if shop_type not in SHOP_COLLECTIONS:
+                continue
+            for item in items:
+                if "id" not in item:
+                    continue
+                item = dict(item, _shop_type=shop_type)
+                index.setdefault(item["id"], []).append((priority, shop_type, item.get("guild_id"), None, item))
+        self._index = index
+        self._collections = collections
+        self.version = version
+
+    async def lookup(self, item_id: str, guild_id: int = None, sources: tuple = None) -> tuple:
+        """Resolve an item id to (source, item copy), or (None, None).
+
+        Lower priority wins; within a source a guild's own item overrides
+        the global one. sources restricts which static sources or shop
+        collections are considered."""
+        await self.ensure_fresh()
+        guild_id = str(guild_id) if guild_id else None
+        month = None
+        best = None
+        for priority, source, owner, active_months, item in self._static.get(item_id, []) + self._index.get(item_id, []):
+            if sources is not None and source not in sources:
+                continue
+            if owner is not None and owner != guild_id:
+                continue
+            if active_months:
+                month = month or datetime.datetime.now().month
+                if month not in active_months:
+                    continue
+            rank = (priority, owner is None)
+            if best is None or rank < best[0]:
+                best = (rank, source, item)
+        if best is None:
+            return None, None
+        return best[1], best[2].copy()
+
+    async def resolve(self, item_id: str, guild_id: int = None, sources: tuple = None) -> Optional[dict]:
+        return (await self.lookup(item_id, guild_id, sources))[1]
+
+    async def items_for(self, shop_type: str, guild_id: int = None) -> Optional[list]:
+        """Items in one shop collection visible to a guild (global items
+        plus the guild's own), or None if the catalog doesn't mirror it."""
+        await self.ensure_fresh()
+        if shop_type not in self._collections:
+            return None
+        guild_id = str(guild_id) if guild_id else None
+        return [
+            dict(item) for item in self._collections[shop_type]
+            if item.get("guild_id") is None or (guild_id and item.get("guild_id") == guild_id)
+        ]
+
+class LeaderboardCache:
+    """Top-K net worth per scope ("global" or a guild id), kept in memory.
+
+    Reads are served from the cached rows; only a scope's first read waits
+    on the database. A background loop refreshes scopes that are older
+    than interval seconds, or sooner once refresh_after balance changes
+    have been noted, and forgets scopes nobody has read for idle_ttl
+    seconds. Refresh timings are kept for stats()."""
+
+    GLOBAL = "global"
+
+    def __init__(self, database: "AsyncDatabase", size: int = 20, interval: float = 60.0,
+                 refresh_after: int = 500, idle_ttl: float = 600.0):
+        self.database = database
+        self.size = size
+        self.interval = interval
+        self.refresh_after = refresh_after
+        self.idle_ttl = idle_ttl
+        self._entries = {}  # scope -> {"rows", "refreshed_at", "mutations", "read_at"}
+        self._inflight = {}
+        self._mutations = 0
+        self._wake = asyncio.Event()
+        self._task = None
+        self.refreshes = 0
+        self.refresh_ms_total = 0.0
+        self.last_refresh_ms = 0.0
+        self.max_refresh_ms = 0.0
+
+    def note_mutation(self) -> None:
+        """Count a balance change; enough of them trigger an early refresh"""
+        self._mutations += 1
+        if self._mutations % self.refresh_after == 0:
+            self._wake.set()
+
+    def invalidate(self, scope=None) -> None:
+        if scope is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(scope), None)
+
+    async def get(self, scope=GLOBAL) -> tuple[list, float]:
+        """Cached rows ({_id, net_worth}, richest first) and their age in seconds"""
+        scope = str(scope)
+        self._ensure_loop()
+        entry = self._entries.get(scope)
+        if entry is None:
+            await self.refresh(scope)
+            entry = self._entries.get(scope)
+            if entry is None:
+                return [], 0.0
+        entry["read_at"] = time.monotonic()
+        return entry["rows"], time.monotonic() - entry["refreshed_at"]
+
+    async def refresh(self, scope: str) -> None:
+        """Recompute one scope; concurrent callers share a single query"""
+        task = self._inflight.get(scope)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._refresh(scope))
+            self._inflight[scope] = task
+            task.add_done_callback(lambda _: self._inflight.pop(scope, None))
+        await asyncio.shield(task)
+
+    async def _refresh(self, scope: str) -> None:
+        mutations = self._mutations
+        start = time.perf_counter()
+        try:
+            if scope == self.GLOBAL:
+                rows = await self.database.get_top_net_worth(self.size)
+            else:
+                rows = await self.database.get_guild_leaderboard(scope, self.size)
+        except Exception as e:
+            self.database.logger.error(f"Leaderboard refresh failed for {scope}: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.refreshes += 1
+        self.refresh_ms_total += elapsed
+        self.last_refresh_ms = elapsed
+        self.max_refresh_ms = max(self.max_refresh_ms, elapsed)
+
+        now = time.monotonic()
+        previous = self._entries.get(scope)
+        self._entries[scope] = {
+            "rows": rows,
+            "refreshed_at": now,
+            "mutations": mutations,
+            "read_at": previous["read_at"] if previous else now
+        }
+
+    def _ensure_loop(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(self.interval, 5.0))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                now = time.monotonic()
+                for scope, entry in list(self._entries.items()):
+                    if now - entry["read_at"] > self.idle_ttl:
+                        del self._entries[scope]
+                    elif (now - entry["refreshed_at"] >= self.interval
+                          or self._mutations - entry["mutations"] >= self.refresh_after):
+                        await self.refresh(scope)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.database.logger.error(f"Leaderboard refresh loop error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scopes": len(self._entries),
+            "refreshes": self.refreshes,
+            "last_refresh_ms": round(self.last_refresh_ms, 2),
+            "avg_refresh_ms": round(self.refresh_ms_total / self.refreshes, 2) if self.refreshes else 0.0,
+            "max_refresh_ms": round(self.max_refresh_ms, 2)
+        }
+
+@timed_methods
 class AsyncDatabase:
     """Async database class for use with Discord bot (MongoDB)"""
     _instance = None
@@ -44,13 +965,52 @@ class AsyncDatabase:
 
     def __init__(self):
         self.logger = logging.getLogger('AsyncDatabase')
-        self._connected = False
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('DB_FAILURE_THRESHOLD', 3)),
+            reset_timeout=float(os.getenv('DB_RESET_TIMEOUT', 30))
+        )
+        self.health_interval = float(os.getenv('DB_HEALTH_INTERVAL', 10))
+        self.ping_timeout = float(os.getenv('DB_PING_TIMEOUT', 5))
+        self.ping_rtt = None
+        self.last_ping = None
+        self._health_task = None
+        self._setup_task = None
+        self.user_changes_interval = float(os.getenv('USER_CHANGES_POLL_INTERVAL', 5))
+        self._user_changes_task = None
+        self._user_changes_since = None  # newest user_changes stamp seen
+        self._user_changes_seen = {}  # _id -> stamp, for changes inside the overlap
+        self._stats_buffer = defaultdict(int)  # (guild_id, stat_type) -> pending increment
+        self.stats_flush_interval = float(os.getenv('STATS_FLUSH_INTERVAL', 10))
+        self.stats_flush_size = int(os.getenv('STATS_FLUSH_SIZE', 500))
+        self._stats_flush_task = None
+        self._ledger_buffer = []
+        self.ledger_flush_interval = float(os.getenv('LEDGER_FLUSH_INTERVAL', 5))
+        self.ledger_flush_size = int(os.getenv('LEDGER_FLUSH_SIZE', 1000))
+        self.ledger_retention_days = int(os.getenv('LEDGER_RETENTION_DAYS', 90))
+        self._ledger_flush_task = None
+        self._ledger_size_flush_task = None  # early flush once ledger_flush_size are buffered
+        self._ledger_partitions = set()
+        self._ledger_rolled_up = None
+        self.leaderboards = LeaderboardCache(
+            self,
+            size=int(os.getenv('LEADERBOARD_SIZE', 20)),
+            interval=float(os.getenv('LEADERBOARD_REFRESH_INTERVAL', 60)),
+            refresh_after=int(os.getenv('LEADERBOARD_REFRESH_AFTER', 500))
+        )
+        self.catalog = ShopCatalog(self, check_interval=float(os.getenv('SHOP_CATALOG_CHECK_INTERVAL', 30)))
+        self.user_cache = UserCache(
+            max_size=int(os.getenv('USER_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('USER_CACHE_TTL', 60))
+        )
 
     @property
     def client(self):
         if self._client is None:
             MONGO_URI = os.getenv('MONGO_URI', config['MONGO_URI'])
-            self._client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+            self._client = create_client(
+                config,
+                lambda: motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, **mongo_client_options(config))
+            )
         return self._client
 
     @property
@@ -60,143 +1020,1025 @@ class AsyncDatabase:
         return self._db
 
     async def ensure_connected(self) -> bool:
-        """Ensure database connection is active."""
-        if not self._connected:
-            try:
-                await self.client.admin.command('ping')
-                self._connected = True
-                self.logger.info("Async database connection established")
-            except Exception as e:
+        """Check the circuit breaker before touching the database.
+
+        The first call pings and starts the background health monitor;
+        after that this never does I/O, so a dead server fails fast
+        instead of every call waiting on the driver timeout."""
+        if self._health_task is None:
+            self.start_health_monitor()
+            self.start_user_changes_watch()
+            await self.ping()
+        return self.breaker.allow()
+
+    async def ping(self) -> bool:
+        """Ping the server, record the round trip and update the breaker"""
+        previous = self.breaker.state
+        first = self.last_ping is None
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.client.admin.command('ping'), timeout=self.ping_timeout)
+        except Exception as e:
+            if first:
+                # Never connected: no point letting calls through to wait on the driver
+                self.breaker.record_failure()
+                self.breaker.trip()
                 self.logger.error(f"Async database connection failed: {e}")
-                return False
+            else:
+                self.breaker.record_failure()
+                if self.breaker.state != previous:
+                    self.logger.error(f"Async database circuit {self.breaker.state}: {e}")
+            return False
+        finally:
+            self.last_ping = time.time()
+        self.ping_rtt = (time.perf_counter() - start) * 1000
+        self.breaker.record_success()
+        if first or previous != CircuitBreaker.CLOSED:
+            self.logger.info("Async database connection established")
+            if self._setup_task is None:
+                self._setup_task = asyncio.get_running_loop().create_task(self._prepare_collections())
         return True
 
+    async def _prepare_collections(self) -> None:
+        """Create indexes and run pending one-shot backfills, once per process"""
+        try:
+            await self.ensure_indexes()
+            await self._backfill_net_worth_once()
+        except Exception as e:
+            self._setup_task = None  # Retry on the next reconnect
+            self.logger.error(f"Failed to prepare collections: {e}")
+
+    def start_health_monitor(self) -> None:
+        """Start the background ping loop on the running event loop"""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    def stop_health_monitor(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    def start_user_changes_watch(self) -> None:
+        """Start polling user_changes on the running event loop"""
+        if self._user_changes_task is None or self._user_changes_task.done():
+            self._user_changes_task = asyncio.get_running_loop().create_task(self._user_changes_loop())
+
+    def stop_user_changes_watch(self) -> None:
+        if self._user_changes_task is not None:
+            self._user_changes_task.cancel()
+            self._user_changes_task = None
+
+    async def _user_changes_loop(self):
+        while True:
+            await asyncio.sleep(self.user_changes_interval)
+            try:
+                await self.poll_user_changes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Failed to poll user changes: {e}")
+
+    async def poll_user_changes(self) -> int:
+        """Drop users written outside the bot since the last poll from the
+        user cache. Returns the number of new changes read."""
+        if not self.breaker.allow():
+            return 0
+        query = {}
+        if self._user_changes_since is not None:
+            query = {"at": {"$gte": self._user_changes_since - USER_CHANGES_OVERLAP}}
+        changes = [
+            change for change in await self.db.user_changes.find(query).to_list(None)
+            if change["_id"] not in self._user_changes_seen
+        ]
+        if not changes:
+            return 0
+        self.user_cache.drop([user_id for change in changes for user_id in change.get("users", [])])
+        for change in changes:
+            self._user_changes_seen[change["_id"]] = change["at"]
+        self._user_changes_since = max(self._user_changes_seen.values())
+        cutoff = self._user_changes_since - USER_CHANGES_OVERLAP
+        self._user_changes_seen = {key: at for key, at in self._user_changes_seen.items() if at >= cutoff}
+        return len(changes)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.ping()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Database health check error: {e}")
+
+    def health_status(self) -> Dict[str, Any]:
+        """Breaker state and last ping round trip, for status commands and the dashboard"""
+        return {
+            "state": self.breaker.state,
+            "ping_ms": round(self.ping_rtt, 2) if self.ping_rtt is not None else None,
+            "last_ping": self.last_ping,
+            "consecutive_failures": self.breaker.failures,
+            "pool_wait_p95_ms": mongo_metrics.pool_wait.percentile(0.95)
+        }
+
+    async def _get_user(self, user_id: int) -> dict:
+        """Get a user document, served from the cache when possible.
+
+        Missing users are cached as an empty dict so repeated lookups for
+        new users don't hit the database either."""
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        epoch = self.user_cache.begin_fill(user_id)
+        try:
+            user = await self.db.users.find_one({"_id": str(user_id)}) or {}
+        except Exception:
+            self.user_cache.finish_fill(user_id, epoch, None)
+            raise
+        self.user_cache.finish_fill(user_id, epoch, user)
+        return user
+
+    async def _update_user(self, user_id: int, update, upsert: bool = True, guard: Dict[str, Any] = None) -> Optional[dict]:
+        """Apply a scalar-field update and write the post-image through to the cache.
+
+        update may be an operator document or an aggregation pipeline of
+        $set stages. Only the fields it touches are returned from the
+        server, so this stays as cheap as a plain update_one. guard adds
+        conditions to the filter; a guarded update returns None when they
+        don't match."""
+        doc = await self.db.users.find_one_and_update(
+            {"_id": str(user_id), **(guard or {})},
+            update,
+            projection=self._touched_fields(update),
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            self.user_cache.invalidate(user_id)
+        else:
+            self.user_cache.merge(user_id, doc)
+        return doc
+
+    async def _update_user_before(self, user_id: int, update, projection: Dict[str, int],
+                                  upsert: bool = True, guard: Dict[str, Any] = None) -> Optional[dict]:
+        """Apply an update and return the projected pre-image ({} if the
+        upsert created the document), for callers that need to know what
+        changed. They write the post-image through to the cache themselves.
+        Returns None when a non-upsert update doesn't match."""
+        before = await self.db.users.find_one_and_update(
+            {"_id": str(user_id), **(guard or {})},
+            update,
+            projection=projection,
+            upsert=upsert,
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is None and not upsert:
+            self.user_cache.invalidate(user_id)
+            return None
+        return before or {}
+
+    async def get_user_snapshot(self, user_id: int, fields: tuple = ()) -> Dict[str, Any]:
+        """Get wallet, bank, bank_limit, interest_level and any extra fields in one read.
+
+        Served from the user cache when possible, otherwise from a single
+        projected find_one so large arrays the caller didn't ask for never
+        leave the server. Missing fields are filled from USER_DEFAULTS and
+        inventory is returned as a list with quantities, like get_inventory."""
+        wanted = list(dict.fromkeys(SNAPSHOT_FIELDS + tuple(fields)))
+        if not await self.ensure_connected():
+            user = {}
+        else:
+            user = self.user_cache.get(user_id)
+            if user is None:
+                projection = {field: 1 for field in wanted}
+                if "inventory" in projection:
+                    projection["items"] = 1
+                user = await self.db.users.find_one(
+                    {"_id": str(user_id)},
+                    projection=projection
+                ) or {}
+
+        snapshot = {}
+        for field in wanted:
+            value = user.get(field, USER_DEFAULTS.get(field))
+            if isinstance(value, list):
+                value = list(value)
+            snapshot[field] = value
+        if "inventory" in snapshot:
+            snapshot["inventory"] = self._inventory_list(user)
+        return snapshot
+
+    @staticmethod
+    def _inventory_key(item_id: str) -> str:
+        """Key for an item in the items map, safe to use in a dotted update path"""
+        return str(item_id).replace(".", "_").lstrip("$") or "unknown"
+
+    @staticmethod
+    def _item_metadata(item_id: str, item_data: dict) -> dict:
+        """Clean copy of an item's fields, without MongoDB-specific fields or a quantity"""
+        meta = {
+            'id': item_id,
+            'name': item_data.get('name', item_id),
+            'description': item_data.get('description', ''),
+            'type': item_data.get('type', 'item'),
+            'price': item_data.get('price', 0),
+            'value': item_data.get('value', item_data.get('price', 0))
+        }
+        
+        # If the item has additional properties, include them
+        for key, value in item_data.items():
+            if key not in meta and not key.startswith('_') and key != 'quantity':
+                meta[key] = value
+        return meta
+
+    @classmethod
+    def _inventory_counts(cls, user: dict) -> Dict[str, dict]:
+        """The user's items map ({key: {qty, meta}}), with any legacy
+        inventory array that hasn't been compacted yet folded in"""
+        counts = {
+            key: {"qty": entry.get("qty", 0), "meta": entry.get("meta", {})}
+            for key, entry in (user.get("items") or {}).items()
+            if entry.get("qty", 0) > 0
+        }
+        for item in user.get("inventory") or []:
+            item_id = item.get("id", item.get("name", "unknown"))
+            key = cls._inventory_key(item_id)
+            entry = counts.setdefault(key, {"qty": 0, "meta": cls._item_metadata(item_id, item)})
+            entry["qty"] += item.get("quantity", 1)
+        return counts
+
+    @classmethod
+    def _inventory_list(cls, user: dict) -> list:
+        """Inventory as a list of item dicts with a quantity field"""
+        return [
+            dict(entry["meta"], quantity=entry["qty"])
+            for entry in cls._inventory_counts(user).values()
+        ]
+
+    @classmethod
+    def _compact_inventory_update(cls, user: dict) -> tuple:
+        """Filter and update that fold a legacy inventory array into the
+        items map. The filter matches the array exactly, so a stale read
+        never applies twice or drops concurrent changes."""
+        inc, set_ = {}, {}
+        for key, entry in cls._inventory_counts({"inventory": user["inventory"]}).items():
+            inc[f"items.{key}.qty"] = entry["qty"]
+            set_[f"items.{key}.meta"] = entry["meta"]
+        update = {"$unset": {"inventory": ""}}
+        if inc:
+            update["$inc"] = inc
+            update["$set"] = set_
+        return {"_id": user["_id"], "inventory": user["inventory"]}, update
+
+    async def _apply_inventory_batch(self, batch: list) -> int:
+        try:
+            result = await self.db.users.bulk_write(batch, ordered=False)
+            return result.modified_count
+        except BulkWriteError as e:
+            self.logger.error(f"Inventory migration batch had {len(e.details.get('writeErrors', []))} errors")
+            return e.details.get("nModified", 0)
+
+    async def migrate_inventories(self, batch_size: int = 500) -> int:
+        """Compact every legacy inventory array into the counted items map.
+
+        Users are streamed with a cursor and rewritten in unordered
+        bulk_write batches, so memory stays bounded by batch_size. Safe to
+        re-run; returns the number of users migrated."""
+        if not await self.ensure_connected():
+            return 0
+        
+        migrated = 0
+        batch = []
+        cursor = self.db.users.find(
+            {"inventory": {"$exists": True}},
+            projection={"inventory": 1},
+            batch_size=batch_size
+        )
+        async for user in cursor:
+            batch.append(UpdateOne(*self._compact_inventory_update(user)))
+            if len(batch) >= batch_size:
+                migrated += await self._apply_inventory_batch(batch)
+                batch = []
+        if batch:
+            migrated += await self._apply_inventory_batch(batch)
+        
+        self.user_cache.clear()
+        self.logger.info(f"Migrated {migrated} inventories to counted items")
+        return migrated
+
+    @staticmethod
+    def _touched_fields(update) -> Dict[str, int]:
+        """Projection of the top-level fields an update document or pipeline writes"""
+        if isinstance(update, list):
+            operators = [fields for stage in update for op, fields in stage.items() if op != "$unset"]
+        else:
+            operators = list(update.values())
+        return {field.split('.')[0]: 1 for fields in operators for field in fields}
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop a cached user document after writing to it outside this class"""
+        self.user_cache.invalidate(user_id)
+
     async def get_wallet_balance(self, user_id: int, guild_id: int = None) -> int:
         """Get user's wallet balance"""
         if not await self.ensure_connected():
             return 0
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("wallet", 0) if user else 0
+        user = await self._get_user(user_id)
+        return user.get("wallet", 0)
 
     async def get_bank_balance(self, user_id: int, guild_id: int = None) -> int:
         """Get user's bank balance"""
         if not await self.ensure_connected():
             return 0
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("bank", 0) if user else 0
+        user = await self._get_user(user_id)
+        return user.get("bank", 0)
+
+    async def get_bank_limit(self, user_id: int, guild_id: int = None) -> int:
+        """Get user's bank limit"""
+        if not await self.ensure_connected():
+            return 10000
+        user = await self._get_user(user_id)
+        return user.get("bank_limit", 10000)
+
+    async def _increment_balance(self, user_id: int, field: str, amount: int, guild_id: int = None,
+                                 reason: str = None) -> BalanceUpdate:
+        """Atomically add amount to a balance field in one round trip.
+
+        Deductions are guarded server-side so the balance can never go
+        negative, and the result is clamped to MAX_BALANCE inside the
+        pipeline update instead of in Python. guild_id, when given, is
+        recorded in the user's guilds so they show on that server's
+        leaderboard straight away."""
+        if not await self.ensure_connected():
+            return BalanceUpdate(False)
+
+        guard = {field: {"$gte": -amount}} if amount < 0 else None
+        pipeline = [
+            {"$set": {field: {"$min": [{"$add": [{"$ifNull": [f"${field}", 0]}, amount]}, MAX_BALANCE]}}},
+            NET_WORTH_STAGE
+        ]
+        if guild_id:
+            pipeline.append({"$set": {"guilds": {"$setUnion": [{"$ifNull": ["$guilds", []]}, [str(guild_id)]]}}})
+        before = await self._update_user_before(
+            user_id,
+            pipeline,
+            projection={"wallet": 1, "bank": 1, "guilds": 1},
+            upsert=guard is None,
+            guard=guard
+        )
+        if before is None:
+            return BalanceUpdate(False, guard_failed=guard is not None)
+
+        # Replay the pipeline on the pre-image, so the ledger gets the
+        # amount actually added after clamping
+        after = {"wallet": before.get("wallet", 0), "bank": before.get("bank", 0)}
+        after[field] = min(after[field] + amount, MAX_BALANCE)
+        delta = after[field] - before.get(field, 0)
+        after["net_worth"] = after["wallet"] + after["bank"]
+        if guild_id:
+            after["guilds"] = list(dict.fromkeys(before.get("guilds", []) + [str(guild_id)]))
+        self.user_cache.merge(user_id, after)
+        self.leaderboards.note_mutation()
+        self.record_ledger(user_id, field, delta, after[field], reason, guild_id)
+        return BalanceUpdate(True, balance=after[field])
+
+    async def update_wallet(self, user_id: int, amount: int, guild_id: int = None, reason: str = None) -> BalanceUpdate:
+        """Update user's wallet balance with overflow protection"""
+        return await self._increment_balance(user_id, "wallet", amount, guild_id, reason)
+
+    async def update_bank(self, user_id: int, amount: int, guild_id: int = None, reason: str = None) -> BalanceUpdate:
+        """Update user's bank balance with overflow protection"""
+        return await self._increment_balance(user_id, "bank", amount, guild_id, reason)
+
+    @staticmethod
+    def _parse_move_amount(amount):
+        """Split a deposit/withdraw amount into (kind, value).
+
+        Accepts a positive int, 'all'/'max', or a percentage string like '50%'."""
+        if isinstance(amount, str):
+            if amount.lower() in ("all", "max"):
+                return "all", None
+            if amount.endswith("%"):
+                try:
+                    percentage = float(amount[:-1])
+                except ValueError:
+                    raise ValueError("Invalid percentage") from None
+                if not 0 < percentage <= 100:
+                    raise ValueError("Percentage must be between 0 and 100")
+                return "percent", percentage / 100
+            amount = int(amount)
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+        return "exact", int(amount)
+
+    @staticmethod
+    def _plan_move(kind: str, value, source: int, space: Optional[int]) -> tuple[int, Optional[str]]:
+        """Work out how much a move takes from source given the free space.
+
+        This mirrors the pipeline built by _move_expression exactly, so the
+        amount moved can be recovered from the pre-image."""
+        if space is not None:
+            space = max(space, 0)
+        if kind == "exact":
+            if value > source:
+                return 0, "insufficient"
+            if space is not None and value > space:
+                return 0, "no_space"
+            return value, None
+        requested = source if kind == "all" else int(source * value)
+        moved = requested if space is None else min(requested, space)
+        return (moved, None) if moved > 0 else (0, "too_small")
+
+    @staticmethod
+    def _move_expression(kind: str, value, source, space) -> Dict[str, Any]:
+        """Aggregation expression for the amount a move takes from source"""
+        if kind == "exact":
+            fits = [{"$lte": [value, source]}]
+            if space is not None:
+                fits.append({"$lte": [value, space]})
+            return {"$cond": [{"$and": fits}, value, 0]}
+        if kind == "all":
+            requested = source
+        else:
+            requested = {"$toLong": {"$floor": {"$multiply": [source, value]}}}
+        return requested if space is None else {"$min": [requested, space]}
+
+    async def _move_balance(self, user_id: int, source: str, dest: str, amount, capped: bool,
+                            guild_id: int = None) -> Dict[str, Any]:
+        """Move money between wallet and bank in a single atomic update.
+
+        The amount is computed server-side from the stored balances, so
+        there is no window where the money is in neither account. The
+        pre-image comes back with the update and the moved amount is
+        recovered from it with _plan_move."""
+        kind, value = self._parse_move_amount(amount)
+        result = {field: USER_DEFAULTS[field] for field in ("wallet", "bank", "bank_limit")}
+        if not await self.ensure_connected():
+            result.update(moved=0, reason="unavailable")
+            return result
+
+        balance = {field: {"$ifNull": [f"${field}", USER_DEFAULTS[field]]} for field in ("wallet", "bank", "bank_limit")}
+        space = {"$max": [{"$subtract": [balance["bank_limit"], balance["bank"]]}, 0]} if capped else None
+        pipeline = [
+            {"$set": {"_moved": self._move_expression(kind, value, balance[source], space)}},
+            {"$set": {
+                source: {"$subtract": [balance[source], "$_moved"]},
+                dest: {"$add": [balance[dest], "$_moved"]}
+            }},
+            {"$unset": "_moved"},
+            NET_WORTH_STAGE
+        ]
+        before = await self.db.users.find_one_and_update(
+            {"_id": str(user_id)},
+            pipeline,
+            projection={"wallet": 1, "bank": 1, "bank_limit": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        for field in result:
+            result[field] = (before or {}).get(field, USER_DEFAULTS[field])
+        space_left = result["bank_limit"] - result["bank"] if capped else None
+        moved, reason = self._plan_move(kind, value, result[source], space_left)
+        result[source] -= moved
+        result[dest] += moved
+        result["moved"] = moved
+        result["reason"] = reason
+        self.user_cache.merge(user_id, {source: result[source], dest: result[dest]})
+        if moved:
+            reason = "deposit" if dest == "bank" else "withdraw"
+            self.record_ledger(user_id, source, -moved, result[source], reason, guild_id)
+            self.record_ledger(user_id, dest, moved, result[dest], reason, guild_id)
+        return result
+
+    async def move_wallet_to_bank(self, user_id: int, amount, guild_id: int = None) -> Dict[str, Any]:
+        """Deposit an amount, 'all' or a percentage of the wallet into the bank.
+
+        Returns the post-transfer wallet, bank and bank_limit along with the
+        amount moved; reason is None on success or one of 'insufficient',
+        'no_space', 'too_small' or 'unavailable'. Raises ValueError for a
+        malformed amount."""
+        return await self._move_balance(user_id, "wallet", "bank", amount, capped=True, guild_id=guild_id)
+
+    async def move_bank_to_wallet(self, user_id: int, amount, guild_id: int = None) -> Dict[str, Any]:
+        """Withdraw an amount, 'all' or a percentage of the bank into the wallet.
+
+        Same return shape as move_wallet_to_bank."""
+        return await self._move_balance(user_id, "bank", "wallet", amount, capped=False, guild_id=guild_id)
+
+    async def update_bank_limit(self, user_id: int, amount: int, guild_id: int = None) -> bool:
+        """Update user's bank storage limit"""
+        if not await self.ensure_connected():
+            return False
+            
+        # Prevent negative limits
+        current_limit = await self.get_bank_limit(user_id, guild_id)
+        new_limit = current_limit + amount
+        if new_limit < 0:
+            return False
+            
+        doc = await self._update_user(user_id, {"$inc": {"bank_limit": amount}})
+        return doc is not None
+
+    async def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
+        """Get guild settings"""
+        if not await self.ensure_connected():
+            return {}
+        settings = await self.db.guild_settings.find_one({"_id": str(guild_id)})
+        return settings if settings else {}
+
+    async def update_guild_settings(self, guild_id: int, settings: Dict[str, Any]) -> bool:
+        """Update guild settings"""
+        if not await self.ensure_connected():
+            return False
+        result = await self.db.guild_settings.update_one(
+            {"_id": str(guild_id)},
+            {"$set": settings},
+            upsert=True
+        )
+        return result.modified_count > 0 or result.upserted_id is not None
+
+    async def store_stats(self, guild_id: int, stat_type: str, amount: int = 1) -> None:
+        """Buffer a guild stat increment.
+
+        Increments are summed in memory per (guild, stat) and written by
+        flush_stats every stats_flush_interval seconds, or as soon as
+        stats_flush_size distinct counters are pending."""
+        self._stats_buffer[(str(guild_id), stat_type)] += amount
+        if len(self._stats_buffer) >= self.stats_flush_size:
+            await self.flush_stats()
+        elif self._stats_flush_task is None or self._stats_flush_task.done():
+            self._stats_flush_task = asyncio.get_running_loop().create_task(self._stats_flush_loop())
+
+    async def flush_stats(self) -> int:
+        """Write all buffered stat increments as one unordered bulk_write.
+
+        Returns the number of guild documents written. Counters that fail to
+        write are put back in the buffer for the next flush."""
+        if not self._stats_buffer:
+            return 0
+        buffer, self._stats_buffer = self._stats_buffer, defaultdict(int)
+
+        per_guild = defaultdict(dict)
+        for (guild_id, stat_type), amount in buffer.items():
+            per_guild[guild_id][stat_type] = amount
+        guild_ids = list(per_guild)
+        ops = [UpdateOne({"_id": guild_id}, {"$inc": per_guild[guild_id]}, upsert=True) for guild_id in guild_ids]
+
+        failed = guild_ids
+        try:
+            if await self.ensure_connected():
+                await self.db.stats.bulk_write(ops, ordered=False)
+                failed = []
+        except BulkWriteError as e:
+            failed = [guild_ids[error["index"]] for error in e.details.get("writeErrors", [])]
+            self.logger.error(f"Failed to flush stats for {len(failed)} guilds: {e}")
+        except Exception as e:
+            self.logger.error(f"Failed to flush stats: {e}")
+
+        for guild_id in failed:
+            for stat_type, amount in per_guild[guild_id].items():
+                self._stats_buffer[(guild_id, stat_type)] += amount
+        return len(ops) - len(failed)
+
+    # Interest
+
+    @staticmethod
+    def _interest_expression(rates: Dict[str, float], step: int = None) -> Dict[str, Any]:
+        """Aggregation expression for one user's daily interest. The random
+        bonus step (0-100) is drawn per document with $rand, unless given."""
+        total = {"$add": [{"$ifNull": ["$wallet", 0]}, {"$ifNull": ["$bank", 0]}]}
+        if step is None:
+            step = {"$floor": {"$multiply": [{"$rand": {}}, 101]}}
+        rate = {"$add": [
+            rates["base"],
+            {"$multiply": [{"$ifNull": ["$interest_level", 0]}, rates["per_level"]]},
+            {"$multiply": [step, rates["random_max"] / 100]}
+        ]}
+        return {"$toLong": {"$floor": {"$max": [
+            1, {"$min": [{"$multiply": [total, rate]}, {"$multiply": [total, rates["cap"]]}]}
+        ]}}}
+
+    @staticmethod
+    def _interest_amount(rates: Dict[str, float], user: dict, step: int) -> int:
+        """_interest_expression with a given step, worked out in Python from
+        the user's (pre-update) document"""
+        total = (user.get("wallet") or 0) + (user.get("bank") or 0)
+        rate = rates["base"] + (user.get("interest_level") or 0) * rates["per_level"] + step * (rates["random_max"] / 100)
+        return int(math.floor(max(1, min(total * rate, total * rates["cap"]))))
+
+    def _interest_pipeline(self, rates: Dict[str, float], claimed_at: datetime.datetime,
+                           step: int = None, paid_field: str = None) -> list:
+        """Update pipeline paying interest into the wallet, clamped to
+        MAX_BALANCE. With paid_field, the amount paid is also stored in that
+        field, for a batch to total up and then unset."""
+        wallet = {"$ifNull": ["$wallet", 0]}
+        interest = self._interest_expression(rates, step)
+        stages = []
+        if paid_field:
+            stages = [
+                {"$set": {paid_field: interest}},
+                {"$set": {paid_field: {"$subtract": [{"$min": [{"$add": [wallet, f"${paid_field}"]}, MAX_BALANCE]}, wallet]}}}
+            ]
+            interest = f"${paid_field}"
+        return stages + [
+            {"$set": {
+                "wallet": {"$min": [{"$add": [wallet, interest]}, MAX_BALANCE]},
+                "interest_claimed_at": claimed_at
+            }},
+            NET_WORTH_STAGE
+        ]
+
+    @staticmethod
+    def _interest_due(now: datetime.datetime) -> Dict[str, Any]:
+        """Filter for users who haven't had interest within INTEREST_PERIOD"""
+        return {"$or": [
+            {"interest_claimed_at": {"$exists": False}},
+            {"interest_claimed_at": {"$lte": now - INTEREST_PERIOD}}
+        ]}
+
+    async def claim_interest(self, user_id: int, guild_id: int = None) -> Optional[int]:
+        """Pay one user's daily interest, usually in a single round trip.
+
+        The bonus step is drawn here, so the amount can be worked out from
+        the pre-image the guarded update returns. If nothing matched, the
+        user is on cooldown or has no document yet: an empty document is
+        created if missing and the update tried once more.
+
+        Returns the amount paid, None if they already had interest within
+        INTEREST_PERIOD, or 0 if the database is unavailable."""
+        if not await self.ensure_connected():
+            return 0
+        now = datetime.datetime.utcnow()
+        step = random.randint(0, 100)
+        pipeline = self._interest_pipeline(INTEREST_RATES, now, step=step)
+        projection = {"wallet": 1, "bank": 1, "interest_level": 1}
+        guard = self._interest_due(now)
+
+        before = await self._update_user_before(user_id, pipeline, projection, upsert=False, guard=guard)
+        if before is None:
+            await self.db.users.update_one(
+                {"_id": str(user_id)},
+                {"$setOnInsert": {"wallet": USER_DEFAULTS["wallet"]}},
+                upsert=True
+            )
+            before = await self._update_user_before(user_id, pipeline, projection, upsert=False, guard=guard)
+            if before is None:
+                return None
+
+        wallet, bank = before.get("wallet") or 0, before.get("bank") or 0
+        paid = min(wallet + self._interest_amount(INTEREST_RATES, before, step), MAX_BALANCE) - wallet
+        self.user_cache.merge(user_id, {
+            "wallet": wallet + paid,
+            "net_worth": wallet + paid + bank,
+            "interest_claimed_at": now
+        })
+        self.leaderboards.note_mutation()
+        self.record_ledger(user_id, "wallet", paid, wallet + paid, "interest", guild_id)
+        return paid
+
+    async def apply_interest(self, dry_run: bool = False, rates: Dict[str, float] = None) -> Dict[str, Any]:
+        """Pay daily interest to every eligible user with one update_many.
+
+        Eligible users have money and haven't had interest within
+        INTEREST_PERIOD. rates overrides entries of INTEREST_RATES. With
+        dry_run the same expression runs in an aggregation instead, so
+        nothing is written and the report shows what the run would pay."""
+        if not await self.ensure_connected():
+            return {"users": 0, "total": 0, "max": 0, "dry_run": dry_run}
+        rates = {**INTEREST_RATES, **(rates or {})}
+        now = datetime.datetime.utcnow()
+        eligible = {"net_worth": {"$gt": 0}, **self._interest_due(now)}
+
+        if dry_run:
+            results = await self.db.users.aggregate([
+                {"$match": eligible},
+                {"$project": {"interest": self._interest_expression(rates)}},
+                {"$group": {"_id": None, "users": {"$sum": 1}, "total": {"$sum": "$interest"}, "max": {"$max": "$interest"}}}
+            ]).to_list(1)
+            report = results[0] if results else {"users": 0, "total": 0, "max": 0}
+            return {"users": report["users"], "total": report["total"], "max": report["max"], "dry_run": True}
+
+        result = await self.db.users.update_many(
+            eligible, self._interest_pipeline(rates, now, paid_field=INTEREST_PAID_FIELD)
+        )
+        paid = {"interest_claimed_at": now, INTEREST_PAID_FIELD: {"$exists": True}}
+        results = await self.db.users.aggregate([
+            {"$match": paid},
+            {"$group": {"_id": None, "total": {"$sum": f"${INTEREST_PAID_FIELD}"}, "max": {"$max": f"${INTEREST_PAID_FIELD}"}}}
+        ]).to_list(1)
+        report = results[0] if results else {"total": 0, "max": 0}
+        await self.db.users.update_many(paid, {"$unset": {INTEREST_PAID_FIELD: ""}})
+
+        self.user_cache.clear()
+        self.leaderboards.invalidate()
+        if report["total"]:
+            self.record_ledger(None, "wallet", report["total"], 0, "interest_batch")
+        self.logger.info(f"Paid {report['total']:,} interest to {result.modified_count} users")
+        return {"users": result.modified_count, "total": report["total"], "max": report["max"], "dry_run": False}
+
+    # Ledger
+
+    @staticmethod
+    def _ledger_partition(ts: datetime.datetime) -> str:
+        """Monthly ledger collection an entry at ts belongs to"""
+        return f"ledger_{ts:%Y_%m}"
+
+    def _ledger_partitions_since(self, since: datetime.datetime) -> list:
+        partitions = []
+        year, month = since.year, since.month
+        now = datetime.datetime.utcnow()
+        while (year, month) <= (now.year, now.month):
+            partitions.append(f"ledger_{year:04d}_{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return partitions
+
+    def record_ledger(self, user_id: int, account: str, delta: int, balance: int,
+                      reason: str = None, guild_id: int = None) -> None:
+        """Buffer a ledger entry for a balance change.
+
+        Nothing is written here; flush_ledger inserts buffered entries with
+        insert_many every ledger_flush_interval seconds, or as soon as
+        ledger_flush_size are pending. reason defaults to the command
+        being run (see ledger_reason)."""
+        self._ledger_buffer.append({
+            "user_id": str(user_id) if user_id is not None else None,
+            "account": account,
+            "delta": delta,
+            "balance": balance,
+            "reason": reason or ledger_reason.get(),
+            "guild_id": str(guild_id) if guild_id else None,
+            "ts": datetime.datetime.utcnow()
+        })
+        if len(self._ledger_buffer) >= self.ledger_flush_size:
+            if self._ledger_size_flush_task is None or self._ledger_size_flush_task.done():
+                self._ledger_size_flush_task = asyncio.get_running_loop().create_task(self.flush_ledger())
+        elif self._ledger_flush_task is None or self._ledger_flush_task.done():
+            self._ledger_flush_task = asyncio.get_running_loop().create_task(self._ledger_flush_loop())
+
+    async def flush_ledger(self) -> int:
+        """Insert buffered ledger entries, one unordered insert_many per
+        monthly partition. Entries that fail to insert go back in the
+        buffer, keeping the _id insert_many gave them; a duplicate key on a
+        retry means an earlier attempt did write the entry, so it counts as
+        written. Returns the number written."""
+        if not self._ledger_buffer:
+            return 0
+        buffer, self._ledger_buffer = self._ledger_buffer, []
+
+        by_partition = defaultdict(list)
+        for entry in buffer:
+            by_partition[self._ledger_partition(entry["ts"])].append(entry)
+
+        written = 0
+        for partition, entries in by_partition.items():
+            try:
+                if not await self.ensure_connected():
+                    raise ConnectionError("database unavailable")
+                if partition not in self._ledger_partitions:
+                    await self.db[partition].create_index(
+                        "ts", expireAfterSeconds=self.ledger_retention_days * 86400
+                    )
+                    await self.db[partition].create_index([("reason", 1), ("ts", -1)])
+                    await self.db[partition].create_index("flushed_at")
+                    self._ledger_partitions.add(partition)
+                flushed_at = datetime.datetime.utcnow()
+                for entry in entries:
+                    entry["flushed_at"] = flushed_at
+                await self.db[partition].insert_many(entries, ordered=False)
+                written += len(entries)
+            except BulkWriteError as e:
+                failed = {error["index"] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != DUPLICATE_KEY_ERROR}
+                self._ledger_buffer.extend(entry for i, entry in enumerate(entries) if i in failed)
+                written += len(entries) - len(failed)
+                if failed:
+                    self.logger.error(f"Failed to write {len(failed)} ledger entries: {e}")
+            except Exception as e:
+                self._ledger_buffer.extend(entries)
+                self.logger.error(f"Failed to flush ledger: {e}")
+        return written
+
+    async def _ledger_flush_loop(self):
+        while True:
+            await asyncio.sleep(self.ledger_flush_interval)
+            await self.flush_ledger()
+            today = datetime.datetime.utcnow().date()
+            if self._ledger_rolled_up != today:
+                try:
+                    await self.rollup_ledger(today - datetime.timedelta(days=1))
+                    await self.checkpoint_money_supply()
+                    self._ledger_rolled_up = today
+                except Exception as e:
+                    self.logger.error(f"Ledger rollup failed: {e}")
+
+    async def rollup_ledger(self, day: datetime.date) -> None:
+        """Summarize one day of ledger entries into ledger_daily, per reason
+        and guild. Idempotent, so rollups outlive the partitions' TTL."""
+        if not await self.ensure_connected():
+            return
+        start = datetime.datetime.combine(day, datetime.time())
+        end = start + datetime.timedelta(days=1)
+        await self.db[self._ledger_partition(start)].aggregate([
+            {"$match": {"ts": {"$gte": start, "$lt": end}}},
+            {"$group": {
+                "_id": {"day": start, "reason": "$reason", "guild_id": "$guild_id"},
+                "delta": {"$sum": "$delta"},
+                "count": {"$sum": 1}
+            }},
+            {"$merge": {"into": "ledger_daily", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]).to_list(None)
+
+    async def _ledger_tail(self, since: datetime.datetime, until: datetime.datetime = None,
+                           guild_id: int = None, group_by=None) -> Dict[Any, Dict[str, int]]:
+        """Sum ledger deltas with ts in (since, until], optionally per group_by expression"""
+        match = {"ts": {"$gt": since, **({"$lte": until} if until else {})}}
+        if guild_id:
+            match["guild_id"] = str(guild_id)
+        return await self._sum_ledger(self._ledger_partitions_since(since), match, group_by)
 
-    async def get_bank_limit(self, user_id: int, guild_id: int = None) -> int:
-        """Get user's bank limit"""
-        if not await self.ensure_connected():
-            return 10000
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("bank_limit", 10000) if user else 10000
+    async def _sum_ledger(self, partitions: list, match: dict, group_by=None) -> Dict[Any, Dict[str, Any]]:
+        totals = defaultdict(lambda: {"delta": 0, "count": 0, "last_flushed": None})
+        for partition in partitions:
+            results = await self.db[partition].aggregate([
+                {"$match": match},
+                {"$group": {
+                    "_id": group_by,
+                    "delta": {"$sum": "$delta"},
+                    "count": {"$sum": 1},
+                    "last_flushed": {"$max": "$flushed_at"}
+                }}
+            ]).to_list(None)
+            for result in results:
+                total = totals[result["_id"]]
+                total["delta"] += result["delta"]
+                total["count"] += result["count"]
+                if result["last_flushed"] and (total["last_flushed"] is None or result["last_flushed"] > total["last_flushed"]):
+                    total["last_flushed"] = result["last_flushed"]
+        return totals
 
-    async def update_wallet(self, user_id: int, amount: int, guild_id: int = None) -> bool:
-        """Update user's wallet balance with overflow protection"""
+    async def _supply_tail(self, baseline: dict, until: datetime.datetime = None) -> Dict[str, Any]:
+        """Ledger entries the money supply baseline doesn't include yet: those
+        flushed after its as_of (up to until), for balance changes made
+        after its from_ts. Entries are matched by when they were written,
+        not when the change was made, so ones that were re-queued or sat in
+        another process's buffer still count once they land."""
+        flushed = {"$gt": baseline["as_of"], **({"$lte": until} if until else {})}
+        match = {"flushed_at": flushed, "ts": {"$gt": baseline["from_ts"]}}
+        # Late entries live in the partition of their ts, possibly last month's
+        partitions = self._ledger_partitions_since(min(baseline["as_of"], baseline["from_ts"]) - LEDGER_LATE_WINDOW)
+        return (await self._sum_ledger(partitions, match))[None]
+
+    async def get_ledger_totals(self, since: datetime.datetime, guild_id: int = None) -> Dict[str, Dict[str, int]]:
+        """Net payout and entry count per reason since a time, read from the
+        ledger (plus entries not flushed yet) rather than from users"""
         if not await self.ensure_connected():
-            return False
-            
-        # Get current balance
-        current = await self.get_wallet_balance(user_id)
-        
-        # Check for overflow/underflow
-        MAX_BALANCE = 9223372036854775807  # PostgreSQL bigint max
-        new_balance = current + amount
-        
-        if new_balance > MAX_BALANCE:
-            new_balance = MAX_BALANCE
-        elif new_balance < 0:
-            return False
-            
-        # Update with the safe balance
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$set": {"wallet": new_balance}},
-            upsert=True
-        )
-        return result.modified_count > 0 or result.upserted_id is not None
+            return {}
+        totals = await self._ledger_tail(since, guild_id=guild_id, group_by="$reason")
+        for entry in self._ledger_buffer:
+            if entry["ts"] > since and (not guild_id or entry["guild_id"] == str(guild_id)):
+                totals[entry["reason"]]["delta"] += entry["delta"]
+                totals[entry["reason"]]["count"] += 1
+        return dict(totals)
 
-    async def update_bank(self, user_id: int, amount: int, guild_id: int = None) -> bool:
-        """Update user's bank balance with overflow protection"""
+    async def checkpoint_money_supply(self) -> int:
+        """Advance the stored money supply baseline.
+
+        The first checkpoint sums net_worth over users once; after that the
+        baseline only moves by the ledger entries written since the last
+        one, up to LEDGER_SETTLE ago, and as_of moves to the newest of
+        those entries' flushed_at rather than to the current time. The
+        update is guarded on the previous as_of, so concurrent checkpoints
+        from several processes can't apply the same entries twice."""
         if not await self.ensure_connected():
-            return False
-            
-        current = await self.get_bank_balance(user_id)
-        MAX_BALANCE = 9223372036854775807
-        new_balance = current + amount
-        
-        if new_balance > MAX_BALANCE:
-            new_balance = MAX_BALANCE
-        elif new_balance < 0:
-            return False
-            
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$set": {"bank": new_balance}},
-            upsert=True
+            return 0
+        await self.flush_ledger()
+        baseline = await self.db.meta.find_one({"_id": "money_supply"})
+        if baseline is None or "from_ts" not in baseline:
+            return await self.reset_money_supply(await self._users_net_worth())
+
+        tail = await self._supply_tail(baseline, until=datetime.datetime.utcnow() - LEDGER_SETTLE)
+        if not tail["count"]:
+            return baseline["total"]
+        total = baseline["total"] + tail["delta"]
+        result = await self.db.meta.update_one(
+            {"_id": "money_supply", "as_of": baseline["as_of"]},
+            {"$set": {"total": total, "as_of": tail["last_flushed"]}}
         )
-        return result.modified_count > 0 or result.upserted_id is not None
+        if not result.modified_count:
+            return await self.get_money_supply()
+        return total
 
-    async def update_bank_limit(self, user_id: int, amount: int, guild_id: int = None) -> bool:
-        """Update user's bank storage limit"""
+    async def _users_net_worth(self) -> int:
+        result = await self.db.users.aggregate([
+            {"$group": {"_id": None, "total": {"$sum": {"$ifNull": ["$net_worth", 0]}}}}
+        ]).to_list(1)
+        return result[0]["total"] if result else 0
+
+    async def reset_money_supply(self, total: int = 0) -> int:
+        """Start the money supply baseline over at total as of now; ledger
+        entries for balance changes made before now are no longer counted.
+        Used for the first checkpoint and after an economy reset."""
         if not await self.ensure_connected():
-            return False
-            
-        # Prevent negative limits
-        current_limit = await self.get_bank_limit(user_id, guild_id)
-        new_limit = current_limit + amount
-        if new_limit < 0:
-            return False
-            
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$inc": {"bank_limit": amount}},
+            return 0
+        now = datetime.datetime.utcnow()
+        await self.db.meta.update_one(
+            {"_id": "money_supply"},
+            {"$set": {"total": total, "as_of": now, "from_ts": now}},
             upsert=True
         )
-        return result.modified_count > 0 or result.upserted_id is not None
+        return total
 
-    async def get_guild_settings(self, guild_id: int) -> Dict[str, Any]:
-        """Get guild settings"""
+    async def get_money_supply(self) -> int:
+        """Total wallet + bank across all users: the last checkpoint plus the
+        ledger entries written since it and those still in this process's
+        buffer"""
         if not await self.ensure_connected():
-            return {}
-        settings = await self.db.guild_settings.find_one({"_id": str(guild_id)})
-        return settings if settings else {}
+            return 0
+        baseline = await self.db.meta.find_one({"_id": "money_supply"})
+        if baseline is None or "from_ts" not in baseline:
+            return await self.checkpoint_money_supply()
+        tail = await self._supply_tail(baseline)
+        pending = sum(entry["delta"] for entry in self._ledger_buffer if entry["ts"] > baseline["from_ts"])
+        return baseline["total"] + tail["delta"] + pending
 
-    async def update_guild_settings(self, guild_id: int, settings: Dict[str, Any]) -> bool:
-        """Update guild settings"""
-        if not await self.ensure_connected():
-            return False
-        result = await self.db.guild_settings.update_one(
-            {"_id": str(guild_id)},
-            {"$set": settings},
-            upsert=True
-        )
-        return result.modified_count > 0 or result.upserted_id is not None
+    async def _stats_flush_loop(self):
+        while True:
+            await asyncio.sleep(self.stats_flush_interval)
+            await self.flush_stats()
+
+    async def migrate_guild_stats(self) -> int:
+        """Add every guild's counts from the old SQLite guild_stats table to
+        its stats document.
 
-    async def store_stats(self, guild_id: int, stat_type: str) -> None:
-        """Store guild stats"""
+        Each guild's import is marked on its document in the same update,
+        and guilds already marked are skipped, so re-running (or running
+        from another process) doesn't add the counts twice. Returns the
+        number of guilds imported."""
         if not await self.ensure_connected():
-            return
-        await self.db.stats.update_one(
-            {"_id": str(guild_id)},
-            {"$inc": {stat_type: 1}},
-            upsert=True
-        )
+            return 0
+        
+        legacy = await asyncio.to_thread(SyncDatabase().get_all_stats)
+        if not legacy:
+            return 0
+        done = set(await self.db.stats.distinct("_id", {"_id": {"$in": list(legacy)}, STATS_IMPORTED_FIELD: True}))
+        requests = [
+            UpdateOne(
+                {"_id": guild_id, STATS_IMPORTED_FIELD: {"$ne": True}},
+                {"$inc": counts, "$set": {STATS_IMPORTED_FIELD: True}},
+                upsert=True
+            )
+            for guild_id, counts in legacy.items() if guild_id not in done
+        ]
+        if not requests:
+            return 0
+        try:
+            result = await self.db.stats.bulk_write(requests, ordered=False)
+            migrated = result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            # A guild marked since the distinct above fails the upsert with a
+            # duplicate key; it was imported by whoever marked it
+            details = e.details
+            failed = [err for err in details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY_ERROR]
+            if failed:
+                self.logger.error(f"Failed to import stats for {len(failed)} guilds: {failed[0].get('errmsg')}")
+            migrated = details.get("nUpserted", 0) + details.get("nModified", 0)
+        
+        self.logger.info(f"Imported SQLite stats for {migrated} guilds")
+        return migrated
 
     async def get_stats(self, guild_id: int) -> Dict[str, int]:
-        """Get guild stats"""
-        if not await self.ensure_connected():
-            return {}
-        stats = await self.db.stats.find_one({"_id": str(guild_id)})
-        return stats if stats else {}
+        """Get guild stats, including increments that haven't been flushed yet"""
+        stats = {}
+        if await self.ensure_connected():
+            stats = await self.db.stats.find_one({"_id": str(guild_id)}, projection={"_id": 0, STATS_IMPORTED_FIELD: 0}) or {}
+        for (pending_guild, stat_type), amount in self._stats_buffer.items():
+            if pending_guild == str(guild_id):
+                stats[stat_type] = stats.get(stat_type, 0) + amount
+        return stats
 
     async def reset_stats(self, guild_id: int) -> bool:
         """Reset guild stats"""
+        for key in [key for key in self._stats_buffer if key[0] == str(guild_id)]:
+            del self._stats_buffer[key]
         if not await self.ensure_connected():
             return False
-        result = await self.db.stats.delete_one({"_id": str(guild_id)})
-        return result.deleted_count > 0
+        # Keep the import marker, so the SQLite counts don't come back
+        await self.db.stats.replace_one({"_id": str(guild_id)}, {STATS_IMPORTED_FIELD: True}, upsert=True)
+        return True
+
+    async def close(self) -> None:
+        """Flush buffered writes and stop background tasks; call on shutdown"""
+        if self._stats_flush_task is not None:
+            self._stats_flush_task.cancel()
+            self._stats_flush_task = None
+        await self.flush_stats()
+        if self._ledger_flush_task is not None:
+            self._ledger_flush_task.cancel()
+            self._ledger_flush_task = None
+        await self.flush_ledger()
+        self.leaderboards.stop()
+        self.stop_user_changes_watch()
+        self.stop_health_monitor()
+        if isinstance(self._client, StorageClient):
+            await self._client.aclose()
 
     async def add_global_buff(self, buff_data: Dict[str, Any]) -> bool:
         """Add global buff"""
@@ -216,10 +2058,6 @@ class AsyncDatabase:
         if not await self.ensure_connected():
             return False
             
-        from_balance = await self.get_wallet_balance(from_id, guild_id)
-        if from_balance < amount:
-            return False
-            
         async with await self.client.start_session() as session:
             async with session.start_transaction():
                 if not await self.update_wallet(from_id, -amount, guild_id):
@@ -231,64 +2069,31 @@ class AsyncDatabase:
 
     async def update_balance(self, user_id: int, amount: int, guild_id: int = None) -> bool:
         """Update user's wallet balance, handling both positive and negative amounts"""
-        current = await self.get_wallet_balance(user_id, guild_id)
-        if amount < 0 and abs(amount) > current:  # Check if user has enough for deduction
-            return False
+        # Deductions are guarded by update_wallet itself
         return await self.update_wallet(user_id, amount, guild_id)
 
     async def increase_bank_limit(self, user_id: int, amount: int, guild_id: int = None) -> bool:
         """Increase user's bank storage limit"""
         if not await self.ensure_connected():
             return False
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$inc": {"bank_limit": amount}},
-            upsert=True
-        )
-        return result.modified_count > 0 or result.upserted_id is not None
+        doc = await self._update_user(user_id, {"$inc": {"bank_limit": amount}})
+        return doc is not None
 
     async def get_global_net_worth(self, user_id: int, excluded_guilds: list = None) -> int:
         """Get user's total net worth across all guilds"""
         if not await self.ensure_connected():
             return 0
         excluded_guilds = excluded_guilds or []
-        pipeline = [
-            {"$match": {"_id": str(user_id)}},
-            {"$project": {
-                "total": {"$add": ["$wallet", "$bank"]}
-            }}
-        ]
-        result = await self.db.users.aggregate(pipeline).to_list(1)
-        return result[0]["total"] if result else 0
+        user = await self._get_user(user_id)
+        return user.get("wallet", 0) + user.get("bank", 0)
 
     async def get_inventory(self, user_id: int, guild_id: int = None) -> list:
         """Get user's inventory with proper quantity grouping"""
         if not await self.ensure_connected():
             return []
         
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        if not user or "inventory" not in user:
-            return []
-        
-        # Group items by id and sum quantities
-        from collections import defaultdict
-        item_counts = defaultdict(int)
-        item_data = {}
-        
-        for item in user.get("inventory", []):
-            item_key = item.get("id", item.get("name", "unknown"))
-            item_counts[item_key] += item.get("quantity", 1)  # Add quantity if exists, default to 1
-            if item_key not in item_data:
-                item_data[item_key] = item.copy()
-        
-        # Convert to list with quantities
-        result = []
-        for item_key, quantity in item_counts.items():
-            item = item_data[item_key].copy()
-            item["quantity"] = quantity
-            result.append(item)
-        
-        return result
+        user = await self._get_user(user_id)
+        return self._inventory_list(user)
     
     async def buy_item(self, user_id: int, item_id: str, guild_id: int = None) -> tuple[bool, str]:
         """Buy an item from any shop"""
@@ -296,35 +2101,11 @@ class AsyncDatabase:
             return False, "Database connection failed"
             
         try:
-            # Check all shop collections for the item
-            item = None
-            item_type = None
-            
-            # Check shop_items
-            item = await self.db.shop_items.find_one({"id": item_id})
-            if item:
-                item_type = "item"
-            
-            # Check shop_fishing
-            if not item:
-                item = await self.db.shop_fishing.find_one({"id": item_id})
-                if item:
-                    item_type = "fishing"
-            
-            # Check shop_potions
-            if not item:
-                item = await self.db.shop_potions.find_one({"id": item_id})
-                if item:
-                    item_type = "potion"
-                    
-            # Check shop_upgrades
-            if not item:
-                item = await self.db.shop_upgrades.find_one({"id": item_id})
-                if item:
-                    item_type = "upgrade"
-            
+            # Resolve the item from the in-memory shop catalog
+            shop_type, item = await self.catalog.lookup(item_id, guild_id, sources=SHOP_COLLECTIONS)
             if not item:
                 return False, "Item not found in any shop"
+            item_type = SHOP_ITEM_TYPES[shop_type]
                 
             # Check if user has enough money
             wallet_balance = await self.get_wallet_balance(user_id, guild_id)
@@ -366,12 +2147,7 @@ class AsyncDatabase:
                                 
                         elif item_type == "item":
                             # Add to inventory
-                            result = await self.db.users.update_one(
-                                {"_id": str(user_id)},
-                                {"$push": {"inventory": item}},
-                                upsert=True
-                            )
-                            if result.modified_count == 0 and not result.upserted_id:
+                            if not await self.add_to_inventory(user_id, guild_id, item):
                                 await self.update_wallet(user_id, item["price"], guild_id)  # Refund
                                 return False, "Failed to add item to inventory"
                         
@@ -393,34 +2169,13 @@ class AsyncDatabase:
         if not await self.ensure_connected():
             return False, "Database connection failed"
             
+        item = None
         try:
-            # Find the item in shops
-            item = None
-            item_type = None
-            
-            # Check shop_items
-            item = await self.db.shop_items.find_one({"id": item_id})
-            if item:
-                item_type = "item"
-            
-            # Check other shop types...
-            if not item:
-                item = await self.db.shop_fishing.find_one({"id": item_id})
-                if item:
-                    item_type = "fishing"
-            
-            if not item:
-                item = await self.db.shop_potions.find_one({"id": item_id})
-                if item:
-                    item_type = "potion"
-                    
-            if not item:
-                item = await self.db.shop_upgrades.find_one({"id": item_id})
-                if item:
-                    item_type = "upgrade"
-            
+            # Find the item in the shop catalog
+            shop_type, item = await self.catalog.lookup(item_id, guild_id, sources=SHOP_COLLECTIONS)
             if not item:
                 return False, "Item not found in any shop"
+            item_type = SHOP_ITEM_TYPES[shop_type]
                 
             # Check if user has enough money
             wallet_balance = await self.get_wallet_balance(user_id, guild_id)
@@ -436,21 +2191,7 @@ class AsyncDatabase:
             error_msg = ""
             
             if item_type == "item":
-                # Add to inventory - create a clean copy without MongoDB ObjectId
-                clean_item = {
-                    "id": item["id"],
-                    "name": item["name"],
-                    "price": item["price"],
-                    "description": item.get("description", ""),
-                    "type": item.get("type", "item")
-                }
-                
-                result = await self.db.users.update_one(
-                    {"_id": str(user_id)},
-                    {"$push": {"inventory": clean_item}},
-                    upsert=True
-                )
-                success = result.modified_count > 0 or result.upserted_id is not None
+                success = await self.add_to_inventory(user_id, guild_id, item)
                 error_msg = "Failed to add item to inventory"
             
             # Handle other item types as before...
@@ -468,7 +2209,8 @@ class AsyncDatabase:
         except Exception as e:
             # Try to refund if we got this far
             try:
-                await self.update_wallet(user_id, item["price"], guild_id)
+                if item:
+                    await self.update_wallet(user_id, item["price"], guild_id)
             except:
                 pass
             return False, f"Purchase failed: {str(e)}"
@@ -477,68 +2219,211 @@ class AsyncDatabase:
         """Remove specific quantity of items from user's inventory"""
         if not await self.ensure_connected():
             return False
-        
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        if not user or "inventory" not in user:
+        if quantity <= 0:
             return False
         
-        inventory = user["inventory"]
-        items_to_keep = []
-        remaining_to_remove = quantity
+        user = await self._get_user(user_id)
+        if user.get("inventory"):
+            # Compact a legacy inventory array before decrementing the map
+            filter_, update = self._compact_inventory_update(user)
+            await self.db.users.update_one(filter_, update)
+            self.user_cache.invalidate(user_id)
+            user = await self._get_user(user_id)
         
-        # Filter items to keep/remove
-        for item in inventory:
-            if (item.get("id") == item_id or item.get("name") == item_id) and remaining_to_remove > 0:
-                item_quantity = item.get("quantity", 1)
-                if item_quantity > remaining_to_remove:
-                    # Keep the item but reduce its quantity
-                    new_item = item.copy()
-                    new_item["quantity"] = item_quantity - remaining_to_remove
-                    items_to_keep.append(new_item)
-                    remaining_to_remove = 0
-                else:
-                    # Remove the entire item (or reduce quantity to 0)
-                    remaining_to_remove -= item_quantity
-            else:
-                items_to_keep.append(item.copy())
+        # Match by id, falling back to the item name
+        key = self._inventory_key(item_id)
+        items = user.get("items") or {}
+        if key not in items:
+            key = next(
+                (k for k, entry in items.items() if entry.get("meta", {}).get("name") == item_id),
+                key
+            )
+        path = f"items.{key}"
         
-        if remaining_to_remove > 0:
+        # Guarded decrement: never lets a count go negative
+        doc = await self.db.users.find_one_and_update(
+            {"_id": str(user_id), f"{path}.qty": {"$gte": quantity}},
+            {"$inc": {f"{path}.qty": -quantity}},
+            projection={path: 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            self.user_cache.invalidate(user_id)
             return False  # Not enough items to remove
         
-        # Update the user's inventory
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$set": {"inventory": items_to_keep}}
+        entry = doc.get("items", {}).get(key)
+        if entry is not None and entry.get("qty", 0) <= 0:
+            await self.db.users.update_one(
+                {"_id": str(user_id), f"{path}.qty": {"$lte": 0}},
+                {"$unset": {path: ""}}
+            )
+            entry = None
+        self.user_cache.merge_entry(user_id, "items", key, entry)
+        return True
+
+    @staticmethod
+    def _fish_document(user_id, fish: dict) -> dict:
+        """A fish as stored in the fish collection, keyed by its id"""
+        doc = dict(fish, user_id=str(user_id))
+        if "id" in fish:
+            doc["_id"] = fish["id"]
+        return doc
+
+    async def _insert_fish(self, docs: list) -> int:
+        """Insert fish documents, ignoring ones that already exist"""
+        try:
+            result = await self.db.fish.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            return e.details.get("nInserted", 0)
+
+    async def _ensure_fish_migrated(self, user_id: int) -> None:
+        """Move a user's legacy fish array into the fish collection"""
+        user = await self._get_user(user_id)
+        if not user.get("fish"):
+            return
+        await self._insert_fish([self._fish_document(user_id, fish) for fish in user["fish"]])
+        await self.db.users.update_one(
+            {"_id": str(user_id), "fish": user["fish"]},
+            {"$unset": {"fish": ""}}
         )
-        
-        return result.modified_count > 0
+        self.user_cache.invalidate(user_id)
 
-    async def get_fish(self, user_id: int) -> list:
-        """Get user's caught fish"""
+    async def get_fish(self, user_id: int, fish_type: str = None, skip: int = 0, limit: int = 0) -> list:
+        """Get user's caught fish, newest first, or one type's fish by value"""
         if not await self.ensure_connected():
             return []
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("fish", []) if user else []
+        await self._ensure_fish_migrated(user_id)
+        query = {"user_id": str(user_id)}
+        if fish_type:
+            query["type"] = fish_type
+            sort = [("value", -1)]
+        else:
+            sort = [("caught_at", -1)]
+        cursor = self.db.fish.find(query, projection={"_id": 0, "user_id": 0, "sale": 0}).sort(sort).skip(skip).limit(limit)
+        return await cursor.to_list(None)
+
+    async def get_fish_summary(self, user_id: int) -> Dict[str, Dict[str, int]]:
+        """Count and total value of a user's fish, per type"""
+        if not await self.ensure_connected():
+            return {}
+        await self._ensure_fish_migrated(user_id)
+        pipeline = [
+            {"$match": {"user_id": str(user_id)}},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}, "value": {"$sum": "$value"}}}
+        ]
+        results = await self.db.fish.aggregate(pipeline).to_list(None)
+        return {r["_id"]: {"count": r["count"], "value": r["value"]} for r in results}
 
     async def add_fish(self, user_id: int, fish: dict) -> bool:
         """Add a fish to user's collection"""
         if not await self.ensure_connected():
             return False
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$push": {"fish": fish}}
+        result = await self.db.fish.insert_one(self._fish_document(user_id, fish))
+        return result.inserted_id is not None
+
+    async def sell_fish(self, user_id: int, fish_id: str) -> Optional[dict]:
+        """Remove one fish and pay its value into the wallet. Returns the sold
+        fish, or None if the user doesn't have it."""
+        if not await self.ensure_connected():
+            return None
+        await self._ensure_fish_migrated(user_id)
+        fish = await self.db.fish.find_one_and_delete(
+            {"user_id": str(user_id), "id": fish_id, "sale": None},
+            projection={"_id": 0, "user_id": 0, "sale": 0}
         )
-        return result.modified_count > 0
+        if fish is None:
+            return None
+        if not await self.update_wallet(user_id, fish.get("value", 0)):
+            await self.db.fish.insert_one(self._fish_document(user_id, fish))
+            return None
+        return fish
+
+    async def sell_all_fish(self, user_id: int) -> tuple[int, int]:
+        """Sell every fish caught so far. The fish are first claimed with a
+        sale token, so a concurrent sell_fish or sell-all (from any process)
+        can't sell the same fish again, then counted, deleted and paid for
+        by that token. Returns (count, total value); fish caught while the
+        sale runs are left alone."""
+        if not await self.ensure_connected():
+            return 0, 0
+        await self._ensure_fish_migrated(user_id)
+        token = uuid.uuid4().hex
+        claimed = await self.db.fish.update_many(
+            {"user_id": str(user_id), "sale": None, "caught_at": {"$lte": datetime.datetime.utcnow().isoformat()}},
+            {"$set": {"sale": token}}
+        )
+        if claimed.modified_count == 0:
+            return 0, 0
+        query = {"user_id": str(user_id), "sale": token}
+        results = await self.db.fish.aggregate([
+            {"$match": query},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "value": {"$sum": "$value"}}}
+        ]).to_list(1)
+        if not results or results[0]["count"] == 0:
+            return 0, 0
+        count, total_value = results[0]["count"], results[0]["value"]
+        
+        if not await self.update_wallet(user_id, total_value):
+            # Release the claim so the fish can be sold later
+            await self.db.fish.update_many(query, {"$unset": {"sale": ""}})
+            return 0, 0
+        await self.db.fish.delete_many(query)
+        return count, total_value
+
+    async def migrate_fish(self, batch_size: int = 500) -> int:
+        """Move every legacy users.fish array into the fish collection.
+
+        Users are streamed with a cursor; their fish are inserted in
+        batches and the arrays unset with one bulk_write per batch. Fish
+        keep their ids as _id, so re-running after a partial failure
+        doesn't duplicate them. Returns the number of users migrated."""
+        if not await self.ensure_connected():
+            return 0
+        
+        migrated = 0
+        users = []
+        docs = []
+        
+        async def flush():
+            if docs:
+                await self._insert_fish(docs)
+            result = await self.db.users.bulk_write([
+                UpdateOne({"_id": user["_id"], "fish": user["fish"]}, {"$unset": {"fish": ""}})
+                for user in users
+            ], ordered=False)
+            return result.modified_count
+        
+        cursor = self.db.users.find(
+            {"fish": {"$exists": True}},
+            projection={"fish": 1},
+            batch_size=batch_size
+        )
+        async for user in cursor:
+            users.append(user)
+            docs.extend(self._fish_document(user["_id"], fish) for fish in user["fish"])
+            if len(users) >= batch_size:
+                migrated += await flush()
+                users, docs = [], []
+        if users:
+            migrated += await flush()
+        
+        self.user_cache.clear()
+        self.logger.info(f"Migrated fish for {migrated} users")
+        return migrated
 
     async def get_fishing_items(self, user_id: int) -> dict:
         """Get user's fishing items (rods and bait)"""
         if not await self.ensure_connected():
             return {"rods": [], "bait": []}
-        user = await self.db.users.find_one({"_id": str(user_id)})
+        user = await self._get_user(user_id)
         return {
-            "rods": user.get("fishing_rods", []),
-            "bait": user.get("fishing_bait", [])
-        } if user else {"rods": [], "bait": []}
+            "rods": list(user.get("fishing_rods", [])),
+            "bait": list(user.get("fishing_bait", []))
+        }
 
     async def add_fishing_item(self, user_id: int, item: dict, item_type: str) -> bool:
         """Add a fishing item (rod or bait) to user's inventory"""
@@ -549,6 +2434,7 @@ class AsyncDatabase:
             {"_id": str(user_id)},
             {"$push": {field: item}}
         )
+        self.user_cache.invalidate(user_id)
         return result.modified_count > 0
 
     async def remove_bait(self, user_id: int, bait_id: str, amount: int = 1) -> bool:
@@ -566,8 +2452,158 @@ class AsyncDatabase:
                 {"_id": str(user_id)},
                 {"$pull": {"fishing_bait": {"amount": {"$lte": 0}}}}
             )
+        self.user_cache.invalidate(user_id)
         return result.modified_count > 0
 
+    async def ensure_indexes(self) -> Dict[str, int]:
+        """Apply INDEX_MANIFEST. create_index is a no-op for indexes that
+        already exist, so this is safe on every startup; one index failing
+        (e.g. a conflicting spec) doesn't stop the rest."""
+        created, failed = 0, 0
+        for collection, indexes in INDEX_MANIFEST.items():
+            for keys, options in indexes:
+                try:
+                    await self.db[collection].create_index(keys, **options)
+                    created += 1
+                except Exception as e:
+                    failed += 1
+                    self.logger.error(f"Failed to create index {keys} on {collection}: {e}")
+        return {"ensured": created, "failed": failed}
+
+    @staticmethod
+    def _plan_stages(plan) -> list:
+        """Every stage name in an explain() plan tree"""
+        stages = []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for value in plan.values():
+                stages.extend(AsyncDatabase._plan_stages(value))
+        elif isinstance(plan, list):
+            for value in plan:
+                stages.extend(AsyncDatabase._plan_stages(value))
+        return stages
+
+    async def audit_queries(self) -> list:
+        """Explain every query in HOT_QUERIES and report its winning plan.
+
+        Returns one dict per query with the plan's stages and whether it
+        falls back to a COLLSCAN."""
+        if not await self.ensure_connected():
+            return []
+        report = []
+        for name, collection, query, sort, limit in HOT_QUERIES:
+            entry = {"name": name, "collection": collection, "stages": [], "collscan": False, "error": None}
+            try:
+                cursor = self.db[collection].find(query() if callable(query) else query)
+                if sort:
+                    cursor = cursor.sort(sort)
+                if limit:
+                    cursor = cursor.limit(limit)
+                explain = await cursor.explain()
+                stages = self._plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+                entry["stages"] = list(dict.fromkeys(stages))
+                entry["collscan"] = "COLLSCAN" in stages
+            except Exception as e:
+                entry["error"] = str(e)
+            report.append(entry)
+        return report
+
+    async def backfill_net_worth(self) -> int:
+        """Set net_worth on every user whose stored value is missing or stale.
+
+        One server-side update_many; only mismatched documents are written,
+        so it's cheap to re-run. Returns the number of users updated."""
+        if not await self.ensure_connected():
+            return 0
+        result = await self.db.users.update_many(
+            {"$expr": {"$ne": ["$net_worth", NET_WORTH_STAGE["$set"]["net_worth"]]}},
+            [NET_WORTH_STAGE]
+        )
+        if result.modified_count:
+            self.user_cache.clear()
+            self.logger.info(f"Backfilled net_worth for {result.modified_count} users")
+        return result.modified_count
+
+    async def _backfill_net_worth_once(self) -> None:
+        """Run backfill_net_worth if this database hasn't had it at
+        NET_WORTH_BACKFILL_VERSION yet. The version is recorded in meta after
+        the backfill succeeds, so later connects skip the collection scan."""
+        marker = await self.db.meta.find_one({"_id": "net_worth_backfill"}) or {}
+        if marker.get("version", 0) >= NET_WORTH_BACKFILL_VERSION:
+            return
+        await self.backfill_net_worth()
+        await self.db.meta.update_one(
+            {"_id": "net_worth_backfill"},
+            {"$max": {"version": NET_WORTH_BACKFILL_VERSION}},
+            upsert=True
+        )
+
+    async def get_top_net_worth(self, limit: int = 10) -> list:
+        """Richest users by wallet + bank, read straight off the net_worth index"""
+        if not await self.ensure_connected():
+            return []
+        cursor = self.db.users.find(
+            {"net_worth": {"$gt": 0}},
+            projection={"_id": 1, "net_worth": 1}
+        ).sort("net_worth", -1).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def add_guild_member(self, guild_id: int, user_id: int) -> bool:
+        """Record that an existing economy user is in a guild"""
+        if not await self.ensure_connected():
+            return False
+        doc = await self._update_user(user_id, {"$addToSet": {"guilds": str(guild_id)}}, upsert=False)
+        return doc is not None
+
+    async def remove_guild_member(self, guild_id: int, user_id: int) -> bool:
+        """Drop a guild from a user's guilds"""
+        if not await self.ensure_connected():
+            return False
+        doc = await self._update_user(user_id, {"$pull": {"guilds": str(guild_id)}}, upsert=False)
+        return doc is not None
+
+    async def remove_guild(self, guild_id: int) -> int:
+        """Drop a guild from every user's guilds, e.g. after the bot leaves it"""
+        if not await self.ensure_connected():
+            return 0
+        result = await self.db.users.update_many(
+            {"guilds": str(guild_id)},
+            {"$pull": {"guilds": str(guild_id)}}
+        )
+        self.user_cache.clear()
+        return result.modified_count
+
+    async def sync_guild_members(self, guild_id: int, member_ids: list, batch_size: int = 1000) -> int:
+        """Add a guild to the guilds of every existing economy user in member_ids.
+
+        Runs in batches of batch_size ids and only writes users that are
+        missing the guild. Members who left while the bot was offline are
+        pruned lazily when the leaderboard finds them."""
+        if not await self.ensure_connected():
+            return 0
+        guild_id = str(guild_id)
+        updated = 0
+        for i in range(0, len(member_ids), batch_size):
+            result = await self.db.users.update_many(
+                {"_id": {"$in": [str(m) for m in member_ids[i:i + batch_size]]}, "guilds": {"$ne": guild_id}},
+                {"$addToSet": {"guilds": guild_id}}
+            )
+            updated += result.modified_count
+        if updated:
+            self.user_cache.clear()
+        return updated
+
+    async def get_guild_leaderboard(self, guild_id: int, limit: int = 10) -> list:
+        """Richest members of a guild, read off the (guilds, net_worth) index"""
+        if not await self.ensure_connected():
+            return []
+        cursor = self.db.users.find(
+            {"guilds": str(guild_id), "net_worth": {"$gt": 0}},
+            projection={"_id": 1, "net_worth": 1}
+        ).sort("net_worth", -1).limit(limit)
+        return await cursor.to_list(limit)
+
     async def init_collections(self):
         """Initialize database collections and indexes"""
         if not await self.ensure_connected():
@@ -606,7 +2642,8 @@ class AsyncDatabase:
             "shop_bait",
             "shop_rod",
             "active_potions",
-            "active_buffs"
+            "active_buffs",
+            "fish"
         ]
         
         for coll_name in collections:
@@ -614,10 +2651,7 @@ class AsyncDatabase:
                 await self.db.create_collection(coll_name)
 
         # Set up indexes
-        await self.db.users.create_index("_id")  # User ID
-        await self.db.shops.create_index([("guild_id", 1), ("type", 1)])  # Shop lookups
-        await self.db.active_potions.create_index("expires_at", expireAfterSeconds=0)  # TTL index
-        await self.db.active_buffs.create_index("expires_at", expireAfterSeconds=0)  # TTL index
+        await self.ensure_indexes()
         
         # Initialize default shops if empty
         if await self.db.shop_items.count_documents({}) == 0:
@@ -720,6 +2754,7 @@ class AsyncDatabase:
                     "multiplier": 1.0
                 }
             ])
+        await self.bump_shop_version()
         return True
         
     async def get_shop_items(self, shop_type: str, guild_id: int = None) -> list:
@@ -727,6 +2762,10 @@ class AsyncDatabase:
         if not await self.ensure_connected():
             return []
         
+        items = await self.catalog.items_for(shop_type, guild_id)
+        if items is not None:
+            return items
+        
         collection = getattr(self.db, f"shop_{shop_type}", None)
         if not collection:
             return []
@@ -767,14 +2806,56 @@ class AsyncDatabase:
             {"$set": item},
             upsert=True
         )
+        await self.bump_shop_version()
         return result.modified_count > 0 or result.upserted_id is not None
 
+    async def update_shop_item(self, item_id: str, shop_type: str, fields: Dict[str, Any], guild_id: int = None) -> bool:
+        """Update fields of an item in a specific shop"""
+        if not await self.ensure_connected():
+            return False
+        if shop_type not in ALL_SHOP_COLLECTIONS:
+            return False
+        result = await self.db[f"shop_{shop_type}"].update_one(
+            {"id": item_id, "guild_id": str(guild_id) if guild_id else None},
+            {"$set": fields}
+        )
+        if result.modified_count > 0:
+            await self.bump_shop_version()
+        return result.modified_count > 0
+
+    async def remove_shop_item(self, item_id: str, shop_type: str, guild_id: int = None) -> bool:
+        """Remove an item from a specific shop"""
+        if not await self.ensure_connected():
+            return False
+        if shop_type not in ALL_SHOP_COLLECTIONS:
+            return False
+        result = await self.db[f"shop_{shop_type}"].delete_one(
+            {"id": item_id, "guild_id": str(guild_id) if guild_id else None}
+        )
+        if result.deleted_count > 0:
+            await self.bump_shop_version()
+        return result.deleted_count > 0
+
+    async def get_shop_version(self) -> int:
+        """Get the shop catalog version stamp"""
+        doc = await self.db.meta.find_one({"_id": "shop_catalog"})
+        return doc.get("version", 0) if doc else 0
+
+    async def bump_shop_version(self) -> None:
+        """Mark every shop catalog (in this and other processes) as stale"""
+        self.catalog.invalidate()
+        await self.db.meta.update_one(
+            {"_id": "shop_catalog"},
+            {"$inc": {"version": 1}},
+            upsert=True
+        )
+
     async def get_interest_level(self, user_id: int) -> int:
         """Get user's interest level"""
         if not await self.ensure_connected():
             return 0
-        user = await self.db.users.find_one({"_id": str(user_id)})
-        return user.get("interest_level", 0) if user else 0
+        user = await self._get_user(user_id)
+        return user.get("interest_level", 0)
 
     async def upgrade_interest(self, user_id: int, cost: int, item_required: bool = False) -> tuple[bool, str]:
         """Upgrade user's interest level"""
@@ -825,13 +2906,9 @@ class AsyncDatabase:
                     return False, "Failed to consume Interest Token!"
             
             # 3. Update interest level
-            result = await self.db.users.update_one(
-                {"_id": str(user_id)},
-                {"$inc": {"interest_level": 1}},
-                upsert=True
-            )
+            doc = await self._update_user(user_id, {"$inc": {"interest_level": 1}})
             
-            if result.modified_count > 0 or result.upserted_id is not None:
+            if doc is not None:
                 new_level = current_level + 1
                 new_rate = 0.003 + (new_level * 0.05)
                 return True, f"✅ Interest level upgraded to **{new_level}**! Your new daily rate is **{new_rate:.3f}%**"
@@ -847,11 +2924,7 @@ class AsyncDatabase:
                         "description": "Required to upgrade interest rate beyond level 20",
                         "type": "special"
                     }
-                    await self.db.users.update_one(
-                        {"_id": str(user_id)},
-                        {"$push": {"inventory": token_item}},
-                        upsert=True
-                    )
+                    await self.add_to_inventory(user_id, None, token_item)
                 return False, "Failed to upgrade interest level"
                 
         except Exception as e:
@@ -863,21 +2936,17 @@ class AsyncDatabase:
         """Clear all fish from user's collection"""
         if not await self.ensure_connected():
             return False
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$set": {"fish": []}}
-        )
-        return result.modified_count > 0
+        await self._ensure_fish_migrated(user_id)
+        result = await self.db.fish.delete_many({"user_id": str(user_id)})
+        return result.deleted_count > 0
 
     async def remove_fish(self, user_id: int, fish_id: str) -> bool:
         """Remove a specific fish from user's collection"""
         if not await self.ensure_connected():
             return False
-        result = await self.db.users.update_one(
-            {"_id": str(user_id)},
-            {"$pull": {"fish": {"id": fish_id}}}
-        )
-        return result.modified_count > 0
+        await self._ensure_fish_migrated(user_id)
+        result = await self.db.fish.delete_one({"user_id": str(user_id), "id": fish_id})
+        return result.deleted_count > 0
     
     async def add_to_inventory(self, user_id: int, guild_id: int, item_data: dict, quantity: int = 1) -> bool:
         """Add an item to user's inventory with quantity support"""
@@ -888,36 +2957,43 @@ class AsyncDatabase:
             return False
         
         try:
-            # Create a clean item copy without MongoDB-specific fields
-            clean_item = {
-                'id': item_data['id'],
-                'name': item_data.get('name', item_data['id']),
-                'description': item_data.get('description', ''),
-                'type': item_data.get('type', 'item'),
-                'price': item_data.get('price', 0),
-                'value': item_data.get('value', item_data.get('price', 0))
-            }
+            key = self._inventory_key(item_data['id'])
+            path = f"items.{key}"
             
-            # If the item has additional properties, include them
-            for key, value in item_data.items():
-                if key not in clean_item and not key.startswith('_'):
-                    clean_item[key] = value
-            
-            # Add the item to inventory (multiple times if quantity > 1)
-            result = await self.db.users.update_one(
+            # One $inc regardless of quantity; metadata tracks the latest item definition
+            doc = await self.db.users.find_one_and_update(
                 {"_id": str(user_id)},
-                {"$push": {"inventory": {"$each": [clean_item] * (quantity if quantity > 0 else 1)}}},
-                upsert=True
+                {
+                    "$inc": {f"{path}.qty": quantity if quantity > 0 else 1},
+                    "$set": {f"{path}.meta": self._item_metadata(item_data['id'], item_data)}
+                },
+                projection={path: 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
             )
-            
-            return result.modified_count > 0 or result.upserted_id is not None
+            self.user_cache.merge_entry(user_id, "items", key, doc["items"][key])
+            return True
             
         except Exception as e:
+            self.user_cache.invalidate(user_id)
             self.logger.error(f"Failed to add item to inventory: {e}")
             return False
 
+# Statements SyncDatabase runs on SQLite. Each thread's connection caches
+# compiled statements by SQL text, so these are reused rather than re-parsed.
+SQLITE_SELECT_BALANCE = "SELECT wallet, bank FROM economy WHERE user_id = ? AND guild_id = ?"
+SQLITE_SELECT_STATS = "SELECT stat_type, count FROM guild_stats WHERE guild_id = ?"
+SQLITE_SELECT_ALL_STATS = "SELECT guild_id, stat_type, count FROM guild_stats"
+SQLITE_INCREMENT_STAT = """
+    INSERT INTO guild_stats (guild_id, stat_type, count) VALUES (?, ?, ?)
+    ON CONFLICT(guild_id, stat_type) DO UPDATE SET count = count + excluded.count
+"""
+
 class SyncDatabase:
-    """Synchronous database class for use with Flask web interface (SQLite & MongoDB)"""
+    """Synchronous database class for use with Flask web interface (SQLite & MongoDB)
+
+    Each thread gets its own SQLite connection (WAL, synchronous=NORMAL), so
+    gunicorn's threads never share a cursor."""
     _instance = None
     _client = None
     _db = None
@@ -942,24 +3018,47 @@ class SyncDatabase:
         # Ensure data directory exists
         data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
         os.makedirs(data_dir, exist_ok=True)
-        db_path = os.getenv('SQLITE_DATABASE_PATH', os.path.join(data_dir, 'database.sqlite'))
-        self.logger.info(f"Using SQLite database at {db_path}")
+        self.db_path = os.getenv('SQLITE_DATABASE_PATH', os.path.join(data_dir, 'database.sqlite'))
+        self.logger.info(f"Using SQLite database at {self.db_path}")
+
+        self.busy_timeout = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        # gunicorn preloads the app, so the master's connections must not
+        # leak into forked workers
+        os.register_at_fork(after_in_child=self._reset_thread_state)
 
         try:
-            import sqlite3
-            self.conn = sqlite3.connect(db_path, check_same_thread=False)
-            self.cursor = self.conn.cursor()
-            self._create_tables()
-            self.conn.commit()
+            with self.connection() as conn:
+                self._create_tables(conn)
             self.logger.info("SQLite database initialized successfully")
         except Exception as e:
             self.logger.error(f"Failed to initialize SQLite database: {e}")
             raise
 
-    def _create_tables(self):
+    def _reset_thread_state(self):
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's SQLite connection, opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close this thread's SQLite connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _create_tables(self, conn: sqlite3.Connection):
         """Create database tables if they don't exist."""
         try:
-            self.cursor.execute("""
+            conn.execute("""
                 CREATE TABLE IF NOT EXISTS economy (
                     user_id INTEGER,
                     guild_id INTEGER DEFAULT 0,
@@ -968,7 +3067,7 @@ class SyncDatabase:
                     PRIMARY KEY (user_id, guild_id)
                 )
             """)
-            self.cursor.execute("""
+            conn.execute("""
                 CREATE TABLE IF NOT EXISTS guild_stats (
                     guild_id INTEGER,
                     stat_type TEXT,
@@ -984,7 +3083,7 @@ class SyncDatabase:
     def client(self):
         if self._client is None:
             MONGO_URI = os.getenv('MONGO_URI', config['MONGO_URI'])
-            self._client = pymongo.MongoClient(MONGO_URI)
+            self._client = pymongo.MongoClient(MONGO_URI, **mongo_client_options(config))
         return self._client
 
     @property
@@ -1034,11 +3133,7 @@ class SyncDatabase:
     def get_user_balance(self, user_id: int, guild_id: int = None):
         """Get user's wallet and bank balance"""
         try:
-            self.cursor.execute("""
-                SELECT wallet, bank FROM economy 
-                WHERE user_id = ? AND guild_id = ?
-            """, (user_id, guild_id or 0))
-            result = self.cursor.fetchone()
+            result = self.connection().execute(SQLITE_SELECT_BALANCE, (user_id, guild_id or 0)).fetchone()
             if result:
                 return {"wallet": result[0], "bank": result[1]}
             return {"wallet": 0, "bank": 0}
@@ -1050,21 +3145,15 @@ class SyncDatabase:
     async def store_stats(self, guild_id: int, stat_type: str):
         """Store guild statistics asynchronously"""
         return self.store_stats_sync(guild_id, stat_type)
-    
+
     def store_stats_sync(self, guild_id: int, stat_type: str):
         """Store guild statistics synchronously"""
         try:
             valid_types = ["messages", "gained", "lost"]
             if stat_type not in valid_types:
                 return False
-                
-            self.cursor.execute("""
-                INSERT INTO guild_stats (guild_id, stat_type, count)
-                VALUES (?, ?, 1)
-                ON CONFLICT(guild_id, stat_type) DO UPDATE 
-                SET count = count + 1
-            """, (guild_id, stat_type))
-            self.conn.commit()
+            with self.connection() as conn:
+                conn.execute(SQLITE_INCREMENT_STAT, (guild_id, stat_type, 1))
             return True
         except Exception as e:
             self.logger.error(f"Error storing stats: {e}")
@@ -1073,16 +3162,21 @@ class SyncDatabase:
     def get_stats(self, guild_id: int):
         """Get guild statistics"""
         try:
-            self.cursor.execute("""
-                SELECT stat_type, count FROM guild_stats
-                WHERE guild_id = ?
-            """, (guild_id,))
-            results = self.cursor.fetchall()
-            return {stat[0]: stat[1] for stat in results}
+            return dict(self.connection().execute(SQLITE_SELECT_STATS, (guild_id,)).fetchall())
         except Exception as e:
             self.logger.error(f"Error getting stats: {e}")
             return {}
 
+    def get_all_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get every guild's statistics, keyed by str(guild_id)"""
+        stats = {}
+        try:
+            for guild_id, stat_type, count in self.connection().execute(SQLITE_SELECT_ALL_STATS):
+                stats.setdefault(str(guild_id), {})[stat_type] = count
+        except Exception as e:
+            self.logger.error(f"Error getting stats: {e}")
+        return stats
+
 
 
 # Create global database instances
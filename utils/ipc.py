@@ -0,0 +1,168 @@
+"""Local IPC between cluster.py and the bot processes it launches.
+
+Messages are JSON objects, one per line, over a Unix socket. Each has an
+"op"; requests carry an "id" that the reply echoes:
+
+    worker -> launcher  {"op": "hello", "cluster": 0, "shards": [0, 1], "pid": 123}
+                        {"op": "ready", "cluster": 0}
+                        {"op": "stats", "cluster": 0, "stats": {...}}
+                        {"op": "request", "id": 1, "method": "clusters"}
+                        {"op": "request", "id": 2, "method": "restart", "params": {"cluster": null}}
+                        {"op": "broadcast", "topic": "user_cache", "data": {...}}
+    launcher -> worker  {"op": "reply", "id": 1, "result": ...} or {"op": "reply", "id": 1, "error": "..."}
+                        {"op": "broadcast", "topic": "user_cache", "data": {...}, "from": 0}
+                        {"op": "shutdown"}
+
+The launcher forwards a broadcast to every other connected cluster.
+
+A bot started without BRONX_CLUSTER_ID runs standalone and has no client."""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+# Lines longer than this are refused; stats payloads carry the guild list
+MAX_MESSAGE_SIZE = 64 * 2**20
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(',', ':'), default=str).encode() + b'\n'
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Next message from reader, or None once the other side is gone"""
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+def shard_ranges(shard_count: int, clusters: int) -> List[List[int]]:
+    """Split shards 0..shard_count-1 into contiguous ranges, sizes differing by at most one"""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for cluster_id in range(clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+class ClusterClient:
+    """A bot process's connection to its launcher.
+
+    Reconnects in the background if the launcher socket goes away; sends
+    made while disconnected are dropped and requests fail with
+    ConnectionError."""
+
+    def __init__(self, cluster_id: int, shard_ids: List[int], shard_count: int, path: str):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.path = path
+        self.logger = logging.getLogger(f'ClusterClient[{cluster_id}]')
+        self.on_shutdown: Optional[Callable] = None
+        # Called after every (re)connect, e.g. to resync state whose
+        # broadcasts may have been missed while disconnected
+        self.on_connect: Optional[Callable] = None
+        self.broadcast_handlers: Dict[str, Callable] = {}  # topic -> handler(data, from cluster)
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._replies = {}
+        self._next_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional['ClusterClient']:
+        """Client for the cluster described by BRONX_* env vars, set by cluster.py"""
+        if os.getenv('BRONX_CLUSTER_ID') is None:
+            return None
+        return cls(
+            cluster_id=int(os.environ['BRONX_CLUSTER_ID']),
+            shard_ids=[int(shard_id) for shard_id in os.environ['BRONX_SHARD_IDS'].split(',')],
+            shard_count=int(os.environ['BRONX_SHARD_COUNT']),
+            path=os.environ['BRONX_IPC_PATH']
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _run(self):
+        delay = 1
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path, limit=MAX_MESSAGE_SIZE)
+                await self.send({'op': 'hello', 'shards': self.shard_ids, 'pid': os.getpid()})
+                delay = 1
+                if self.on_connect is not None:
+                    await self.on_connect()
+                while (message := await read_message(reader)) is not None:
+                    await self._handle(message)
+                self.logger.warning("Launcher closed the IPC connection")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"IPC connection failed: {e}")
+            finally:
+                self._writer = None
+                for future in self._replies.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("IPC connection lost"))
+                self._replies.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _handle(self, message: dict):
+        if message.get('op') == 'reply':
+            future = self._replies.pop(message.get('id'), None)
+            if future is None or future.done():
+                return
+            if 'error' in message:
+                future.set_exception(RuntimeError(message['error']))
+            else:
+                future.set_result(message.get('result'))
+        elif message.get('op') == 'broadcast':
+            handler = self.broadcast_handlers.get(message.get('topic'))
+            if handler is not None:
+                handler(message.get('data'), message.get('from'))
+        elif message.get('op') == 'shutdown':
+            self.logger.info("Shutdown requested by launcher")
+            if self.on_shutdown is not None:
+                asyncio.get_running_loop().create_task(self.on_shutdown())
+
+    async def send(self, message: dict) -> bool:
+        """Send a message, returns False if not connected"""
+        if not self.connected:
+            return False
+        self._writer.write(encode({**message, 'cluster': self.cluster_id}))
+        await self._writer.drain()
+        return True
+
+    async def broadcast(self, topic: str, data) -> bool:
+        """Send data to every other cluster's handler for topic; returns
+        False if not connected"""
+        return await self.send({'op': 'broadcast', 'topic': topic, 'data': data})
+
+    async def request(self, method: str, timeout: float = 10, **params):
+        """Call a launcher method and wait for its result"""
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = future
+        if not await self.send({'op': 'request', 'id': request_id, 'method': method, 'params': params}):
+            self._replies.pop(request_id, None)
+            raise ConnectionError("Not connected to the cluster launcher")
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._replies.pop(request_id, None)
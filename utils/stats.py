@@ -0,0 +1,291 @@
+"""Running shard/guild counters and the publisher that posts them.
+
+StatsAggregator listens to guild, member and shard events and keeps the
+totals BronxBot.update_stats reports, so building a snapshot does not walk
+every guild. StatsPublisher posts snapshots to the dashboards over one
+long-lived aiohttp session as a full snapshot followed by gzipped deltas,
+backing off endpoints that fail."""
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional
+
+import aiohttp
+
+class StatsAggregator:
+    """Guild and member counts kept current from gateway events.
+
+    Each guild is remembered with the shard and member_count it was last
+    counted with, so every event is applied as a delta to the totals.
+    rebuild() recounts from scratch and runs on ready; everything else is
+    O(1) per event, and snapshot() is O(shards)."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started_at = time.time()
+        self.guilds: Dict[int, tuple] = {}  # guild id -> (shard id, member count)
+        self.member_count = 0
+        self.shard_guilds = defaultdict(int)
+        self.shard_members = defaultdict(int)
+        self.shard_connected_at: Dict[int, Optional[float]] = {}
+        self._guild_ids = None  # cached list of str ids, rebuilt after joins/removes
+
+    @property
+    def shard_count(self) -> int:
+        return self.bot.shard_count or 1
+
+    def shard_of(self, guild) -> int:
+        shard_id = getattr(guild, 'shard_id', None)
+        return shard_id if shard_id is not None else (guild.id >> 22) % self.shard_count
+
+    def listeners(self) -> Dict[str, callable]:
+        """Event name -> handler, for Bot.add_listener"""
+        return {
+            'on_ready': self.on_ready,
+            'on_guild_join': self.on_guild_join,
+            'on_guild_available': self.on_guild_join,
+            'on_guild_remove': self.on_guild_remove,
+            'on_member_join': self.on_member_join,
+            'on_member_remove': self.on_member_remove,
+            'on_shard_connect': self.on_shard_connect,
+            'on_shard_ready': self.on_shard_connect,
+            'on_shard_resumed': self.on_shard_connect,
+            'on_shard_disconnect': self.on_shard_disconnect,
+        }
+
+    def rebuild(self, guilds) -> None:
+        """Recount everything from the guild cache"""
+        self.guilds.clear()
+        self.shard_guilds.clear()
+        self.shard_members.clear()
+        self.member_count = 0
+        self._guild_ids = None
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def add_guild(self, guild) -> None:
+        """Count guild, or update its member count if already counted"""
+        shard_id = self.shard_of(guild)
+        members = guild.member_count or 0
+        previous = self.guilds.get(guild.id)
+        if previous is None:
+            self._guild_ids = None
+        else:
+            self.shard_guilds[previous[0]] -= 1
+            self.shard_members[previous[0]] -= previous[1]
+            self.member_count -= previous[1]
+        self.guilds[guild.id] = (shard_id, members)
+        self.shard_guilds[shard_id] += 1
+        self.shard_members[shard_id] += members
+        self.member_count += members
+
+    def remove_guild(self, guild) -> None:
+        previous = self.guilds.pop(guild.id, None)
+        if previous is None:
+            return
+        self.shard_guilds[previous[0]] -= 1
+        self.shard_members[previous[0]] -= previous[1]
+        self.member_count -= previous[1]
+        self._guild_ids = None
+
+    async def on_ready(self):
+        # Guilds seen before/after a reconnect may differ; recount once
+        self.rebuild(self.bot.guilds)
+
+    async def on_guild_join(self, guild):
+        self.add_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        self.remove_guild(guild)
+
+    async def on_member_join(self, member):
+        # guild.member_count is already updated by discord.py
+        self.add_guild(member.guild)
+
+    async def on_member_remove(self, member):
+        if member.guild.id in self.guilds:
+            self.add_guild(member.guild)
+
+    async def on_shard_connect(self, shard_id: int):
+        if self.shard_connected_at.get(shard_id) is None:
+            self.shard_connected_at[shard_id] = time.time()
+
+    async def on_shard_disconnect(self, shard_id: int):
+        self.shard_connected_at[shard_id] = None
+
+    @property
+    def guild_ids(self) -> list:
+        if self._guild_ids is None:
+            self._guild_ids = [str(guild_id) for guild_id in self.guilds]
+        return self._guild_ids
+
+    def snapshot(self) -> dict:
+        """Counters in the /api/stats payload shape"""
+        now = time.time()
+        shard_stats = {}
+        for shard_id, shard in getattr(self.bot, 'shards', {}).items():
+            connected_at = self.shard_connected_at.get(shard_id, self.started_at)
+            closed = shard.is_closed() if hasattr(shard, 'is_closed') else False
+            shard_stats[str(shard_id)] = {
+                'status': 'offline' if closed or connected_at is None else 'online',
+                'latency': shard.latency * 1000,
+                'guild_count': self.shard_guilds.get(shard_id, 0),
+                'user_count': self.shard_members.get(shard_id, 0),
+                'uptime': int(now - connected_at) if connected_at else 0
+            }
+        return {
+            'server_count': len(self.guilds),
+            'user_count': self.member_count,
+            'uptime': int(now - self.started_at),
+            'guilds': self.guild_ids,
+            'shard_count': self.shard_count,
+            'shard_stats': shard_stats
+        }
+
+# Version of the payloads StatsPublisher sends; dashboard/app.py applies them
+# (see apply_stats_payload there)
+STATS_PROTOCOL = 1
+
+def encode_delta(old: dict, new: dict) -> dict:
+    """Changes taking stats old to new: top-level keys set/unset, and guild
+    ids added/removed. Unchanged guild lists (the aggregator hands out the
+    same list object until the guild set changes) cost nothing."""
+    delta = {
+        'set': {key: value for key, value in new.items()
+                if key != 'guilds' and (key not in old or old[key] != value)},
+        'unset': [key for key in old if key not in new]
+    }
+    old_guilds, new_guilds = old.get('guilds', []), new.get('guilds', [])
+    if old_guilds is not new_guilds and old_guilds != new_guilds:
+        old_set, new_set = set(old_guilds), set(new_guilds)
+        delta['guilds_added'] = [guild_id for guild_id in new_guilds if guild_id not in old_set]
+        delta['guilds_removed'] = [guild_id for guild_id in old_guilds if guild_id not in new_set]
+    return delta
+
+class StatsPublisher:
+    """Posts stats to a set of endpoints concurrently over one aiohttp
+    session, using the delta protocol.
+
+    Every publish gets the next seq. An endpoint that hasn't acknowledged
+    anything gets a full snapshot; after that it gets a gzipped delta
+    against the last seq it acknowledged. If the endpoint's state doesn't
+    match the delta's base it answers 409 with the seq it has, and gets a
+    delta from that seq if it is still in history, otherwise a full
+    snapshot. (The dashboard runs several workers, each at its own seq.)
+
+    An endpoint that fails (connection error, timeout or other non-2xx) is
+    skipped until its backoff expires: backoff_base * 2**failures seconds
+    with jitter, capped at backoff_max, or the server's Retry-After if
+    given. Its acknowledged seq is kept, so the next delta covers the gap."""
+
+    def __init__(self, endpoints: Dict[str, str], timeout: float = 10,
+                 backoff_base: float = 30, backoff_max: float = 600, history: int = 8):
+        self.endpoints = endpoints
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failures = defaultdict(int)
+        self.retry_at = defaultdict(float)
+        self.logger = logging.getLogger('StatsPublisher')
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # Identifies this bot process, so a dashboard notices restarts
+        self.stream_id = uuid.uuid4().hex
+        self.seq = 0
+        self.history = OrderedDict()  # seq -> stats, the last `history` published
+        self.history_size = history
+        self.acked: Dict[str, int] = {}  # env -> last seq it acknowledged
+        self.bytes_sent = defaultdict(int)
+        self.payloads_sent = defaultdict(lambda: defaultdict(int))
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _backoff(self, env: str, retry_after: Optional[float] = None) -> float:
+        self.failures[env] += 1
+        if retry_after is None:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self.failures[env] - 1))
+            delay *= random.uniform(0.5, 1)
+        else:
+            delay = min(self.backoff_max, retry_after)
+        self.retry_at[env] = time.monotonic() + delay
+        return delay
+
+    def _payload(self, base: Optional[int]) -> dict:
+        payload = {'protocol': STATS_PROTOCOL, 'stream': self.stream_id, 'seq': self.seq}
+        if base is None or base not in self.history:
+            payload.update(type='full', stats=self.history[self.seq])
+        else:
+            payload.update(type='delta', base=base, **encode_delta(self.history[base], self.history[self.seq]))
+        return payload
+
+    async def _send(self, env: str, url: str, payload: dict):
+        body = gzip.compress(json.dumps(payload, separators=(',', ':')).encode(), compresslevel=6)
+        self.bytes_sent[env] += len(body)
+        self.payloads_sent[env][payload['type']] += 1
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        async with self.session.post(url, data=body, headers=headers) as resp:
+            try:
+                reply = await resp.json(content_type=None)
+            except ValueError:
+                reply = None
+            return resp.status, resp.headers.get('Retry-After'), reply if isinstance(reply, dict) else {}
+
+    async def _post(self, env: str, url: str) -> bool:
+        try:
+            base = self.acked.get(env)
+            status, retry_after, reply = await self._send(env, url, self._payload(base))
+            if status == 409:
+                # The endpoint is at another seq (or none); answer from there
+                self.acked.pop(env, None)
+                status, retry_after, reply = await self._send(env, url, self._payload(reply.get('seq')))
+            if status < 300:
+                self.acked[env] = self.seq
+                self.failures.pop(env, None)
+                self.retry_at.pop(env, None)
+                return True
+            delay = self._backoff(env, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            self.logger.error(f"[{env.upper()}] Failed to update stats: {status}, retrying in {delay:.0f}s")
+        except Exception as e:
+            delay = self._backoff(env)
+            self.logger.error(f"[{env.upper()}] Failed to update stats: {e!r}, retrying in {delay:.0f}s")
+        return False
+
+    async def publish(self, stats: dict) -> Dict[str, bool]:
+        """Publish stats as the next seq to every endpoint not backing off.
+        Returns env -> whether it was delivered, for the endpoints attempted."""
+        self.seq += 1
+        self.history[self.seq] = stats
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+
+        now = time.monotonic()
+        due = {env: url for env, url in self.endpoints.items() if self.retry_at[env] <= now}
+        results = await asyncio.gather(*(self._post(env, url) for env, url in due.items()))
+        return dict(zip(due, results))
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        return {
+            env: {
+                'failures': self.failures.get(env, 0),
+                'retry_in': max(0, round(self.retry_at.get(env, 0) - now, 1)),
+                'acked_seq': self.acked.get(env),
+                'bytes_sent': self.bytes_sent.get(env, 0),
+                'payloads': dict(self.payloads_sent.get(env, {}))
+            }
+            for env in self.endpoints
+        }
@@ -0,0 +1,1469 @@
+"""Storage backends for AsyncDatabase.
+
+AsyncDatabase only talks to its client through the Motor API:
+client.bronxbot.<collection> for queries, client.admin.command('ping') for
+health checks and client.start_session() for transactions. MemoryClient
+and SQLiteClient implement the part of that API it uses, so every
+AsyncDatabase method runs unchanged on top of them; create_client picks
+one from the DB_BACKEND setting (mongo, memory or sqlite).
+
+Semantics follow MongoDB where the bot relies on them:
+- Every write to a single document is atomic, including find_one_and_update
+  with guards and update pipelines, so guarded wallet/bank/inventory updates
+  can't go negative or double-apply under concurrency.
+- Upserts seed the new document from the filter's equality fields.
+- Multi-document transactions are accepted but not isolated (the bot only
+  uses them around single-document writes with explicit refunds).
+- Indexes are recorded but not used to read, and TTL indexes never expire
+  anything. explain() plans from the recorded indexes the way the server's
+  planner roughly would (IDHACK, IXSCAN with FETCH/SORT/OR, or COLLSCAN),
+  so query audits reflect the index manifest rather than this backend.
+"""
+import asyncio
+import contextlib
+import copy
+import datetime
+import functools
+import json
+import os
+import random
+import re
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+try:
+    from bson import ObjectId
+except ImportError:  # bson ships with pymongo; only missing in stripped installs
+    ObjectId = None
+
+_MISSING = object()
+
+# Query engine
+
+def _new_id():
+    if ObjectId is not None:
+        return ObjectId()
+    return "%024x" % random.getrandbits(96)
+
+def _freeze(value):
+    """Hashable form of a document value, for _id keys and $group keys"""
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _split(path: str) -> list:
+    return path.split(".")
+
+def get_path(doc, path: str, default=None):
+    """Value at a dotted path, or default when any part is missing"""
+    value = doc
+    for part in _split(path):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return default
+    return value
+
+def set_path(doc: dict, path: str, value) -> None:
+    parts = _split(path)
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            target = target[int(part)]
+            continue
+        if not isinstance(target.get(part), (dict, list)):
+            target[part] = {}
+        target = target[part]
+    if isinstance(target, list) and parts[-1].isdigit():
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+def unset_path(doc: dict, path: str) -> None:
+    parts = _split(path)
+    target = get_path(doc, ".".join(parts[:-1])) if len(parts) > 1 else doc
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+def _resolve(value, parts: list) -> list:
+    """All values a query path reaches, descending into arrays of documents"""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        return _resolve(value[parts[0]], parts[1:]) if parts[0] in value else []
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _resolve(value[index], parts[1:]) if index < len(value) else []
+        found = []
+        for item in value:
+            if isinstance(item, dict):
+                found.extend(_resolve(item, parts))
+        return found
+    return []
+
+# BSON comparison order for values of different types
+def _type_rank(value) -> int:
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+def compare(a, b) -> int:
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 1:
+        return 0
+    if rank_a == 4:
+        return compare(list(a.items()), list(b.items()))
+    if rank_a == 5:
+        for x, y in zip(a, b):
+            result = compare(x, y)
+            if result:
+                return result
+        return compare(len(a), len(b))
+    if isinstance(a, tuple):
+        result = compare(a[0], b[0])
+        return result or compare(a[1], b[1])
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return compare(str(a), str(b))
+
+def _candidates(values: list) -> list:
+    """Values a query condition is tested against: each value, and each
+    element of array values; a missing field behaves like null"""
+    if not values:
+        return [None]
+    found = []
+    for value in values:
+        found.append(value)
+        if isinstance(value, list):
+            found.extend(value)
+    return found
+
+_TYPE_NAMES = {
+    "double": float, "string": str, "object": dict, "array": list, "bool": bool,
+    "date": datetime.datetime, "null": type(None), "int": int, "long": int,
+}
+
+def _matches_operator(values: list, op: str, arg) -> bool:
+    if op == "$exists":
+        return bool(values) == bool(arg)
+    if op == "$ne":
+        return not _matches_operator(values, "$eq", arg)
+    if op == "$nin":
+        return not _matches_operator(values, "$in", arg)
+    if op == "$not":
+        return not _matches_condition(values, arg)
+    if op == "$size":
+        return any(isinstance(value, list) and len(value) == arg for value in values)
+    if op == "$elemMatch":
+        return any(
+            isinstance(value, list) and any(
+                matches(item, arg) if isinstance(item, dict) and not _is_operator_doc(arg)
+                else _matches_condition([item], arg)
+                for item in value
+            )
+            for value in values
+        )
+    if op == "$all":
+        return all(_matches_operator(values, "$eq", item) for item in arg)
+    candidates = _candidates(values)
+    if op == "$eq":
+        return any(compare(value, arg) == 0 for value in candidates)
+    if op == "$in":
+        return any(_matches_operator(values, "$eq", item) for item in arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for value in candidates:
+            if _type_rank(value) != _type_rank(arg) or _type_rank(value) == 1:
+                continue
+            result = compare(value, arg)
+            if (op == "$gt" and result > 0) or (op == "$gte" and result >= 0) \
+                    or (op == "$lt" and result < 0) or (op == "$lte" and result <= 0):
+                return True
+        return False
+    if op == "$regex":
+        pattern = re.compile(arg) if isinstance(arg, str) else arg
+        return any(isinstance(value, str) and pattern.search(value) for value in candidates)
+    if op == "$options":
+        return True
+    if op == "$type":
+        names = arg if isinstance(arg, list) else [arg]
+        return any(
+            isinstance(value, _TYPE_NAMES[name]) and not (name != "bool" and isinstance(value, bool))
+            for value in values for name in names if name in _TYPE_NAMES
+        )
+    raise NotImplementedError(f"Query operator {op} is not supported by this storage backend")
+
+def _is_operator_doc(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(str(key).startswith("$") for key in value)
+
+def _matches_condition(values: list, condition) -> bool:
+    if _is_operator_doc(condition):
+        if "$regex" in condition and "$options" in condition:
+            flags = re.IGNORECASE if "i" in condition["$options"] else 0
+            condition = {**condition, "$regex": re.compile(condition["$regex"], flags)}
+        return all(_matches_operator(values, op, arg) for op, arg in condition.items())
+    if hasattr(condition, "search") and hasattr(condition, "pattern"):
+        return _matches_operator(values, "$regex", condition)
+    return _matches_operator(values, "$eq", condition)
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """Whether doc satisfies a MongoDB query document"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$expr":
+            if not _truthy(evaluate(condition, doc)):
+                return False
+        elif key == "$comment":
+            continue
+        elif not _matches_condition(_resolve(doc, _split(key)), condition):
+            return False
+    return True
+
+# Aggregation expressions
+
+def _truthy(value) -> bool:
+    return value not in (None, False, 0) and value is not _MISSING
+
+def _number_args(args: list):
+    """args, or None when any is null (arithmetic propagates null)"""
+    return None if any(arg is None for arg in args) else args
+
+def _to_int(value):
+    return None if value is None else int(value)
+
+def _arithmetic(op: str, args: list):
+    args = _number_args(args)
+    if args is None:
+        return None
+    if op == "$add":
+        dates = [arg for arg in args if isinstance(arg, datetime.datetime)]
+        total = sum(arg for arg in args if not isinstance(arg, datetime.datetime))
+        return dates[0] + datetime.timedelta(milliseconds=total) if dates else total
+    if op == "$subtract":
+        a, b = args
+        if isinstance(a, datetime.datetime):
+            if isinstance(b, datetime.datetime):
+                return int((a - b).total_seconds() * 1000)
+            return a - datetime.timedelta(milliseconds=b)
+        return a - b
+    if op == "$multiply":
+        return functools.reduce(lambda a, b: a * b, args, 1)
+    if op == "$divide":
+        return args[0] / args[1]
+    if op == "$mod":
+        return args[0] % args[1]
+
+_SINGLE_ARG_OPS = {
+    "$floor": lambda v: None if v is None else int(v // 1) if isinstance(v, float) else v,
+    "$ceil": lambda v: None if v is None else -int(-v // 1) if isinstance(v, float) else v,
+    "$abs": lambda v: None if v is None else abs(v),
+    "$toLong": _to_int,
+    "$toInt": _to_int,
+    "$toDouble": lambda v: None if v is None else float(v),
+    "$toString": lambda v: None if v is None else str(v),
+    "$toBool": lambda v: None if v is None else _truthy(v),
+    "$size": lambda v: len(v),
+    "$not": lambda v: not _truthy(v),
+    "$isArray": lambda v: isinstance(v, list),
+}
+
+_COMPARISONS = {
+    "$eq": lambda r: r == 0, "$ne": lambda r: r != 0,
+    "$gt": lambda r: r > 0, "$gte": lambda r: r >= 0,
+    "$lt": lambda r: r < 0, "$lte": lambda r: r <= 0,
+}
+
+def evaluate(expr, doc, variables: Dict[str, Any] = None):
+    """Evaluate an aggregation expression against doc"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr.startswith("$$"):
+            name, _, path = expr[2:].partition(".")
+            if name == "ROOT" or name == "CURRENT":
+                base = doc
+            elif name == "NOW":
+                base = datetime.datetime.utcnow()
+            elif name == "REMOVE":
+                return _MISSING
+            else:
+                base = (variables or {})[name]
+            return get_path(base, path) if path else base
+        return get_path(doc, expr[1:])
+    if isinstance(expr, list):
+        return [evaluate(item, doc, variables) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        result = {}
+        for key, item in expr.items():
+            value = evaluate(item, doc, variables)
+            if value is not _MISSING:
+                result[key] = value
+        return result
+
+    op, arg = next(iter(expr.items()))
+    if op == "$literal":
+        return arg
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        branch = arg[1] if _truthy(evaluate(arg[0], doc, variables)) else arg[2]
+        return evaluate(branch, doc, variables)
+    if op == "$rand":
+        return random.random()
+    if op == "$let":
+        scope = {**(variables or {}), **{k: evaluate(v, doc, variables) for k, v in arg["vars"].items()}}
+        return evaluate(arg["in"], doc, scope)
+
+    args = evaluate(arg, doc, variables) if isinstance(arg, list) else [evaluate(arg, doc, variables)]
+    if op in _SINGLE_ARG_OPS:
+        return _SINGLE_ARG_OPS[op](args[0])
+    if op in ("$add", "$subtract", "$multiply", "$divide", "$mod"):
+        return _arithmetic(op, args)
+    if op == "$ifNull":
+        return next((value for value in args[:-1] if value is not None), args[-1])
+    if op in _COMPARISONS:
+        return _COMPARISONS[op](compare(args[0], args[1]))
+    if op == "$and":
+        return all(_truthy(value) for value in args)
+    if op == "$or":
+        return any(_truthy(value) for value in args)
+    if op in ("$min", "$max", "$sum", "$avg"):
+        if len(args) == 1 and isinstance(args[0], list):
+            args = args[0]
+        values = [value for value in args if value is not None]
+        if op == "$sum":
+            return sum(value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool))
+        if op == "$avg":
+            numbers = [value for value in values if isinstance(value, (int, float))]
+            return sum(numbers) / len(numbers) if numbers else None
+        if not values:
+            return None
+        pick = min if op == "$min" else max
+        return pick(values, key=functools.cmp_to_key(compare))
+    if op == "$in":
+        return any(compare(args[0], item) == 0 for item in args[1])
+    if op == "$setUnion":
+        union = []
+        for values in args:
+            for value in values or []:
+                if not any(compare(value, seen) == 0 for seen in union):
+                    union.append(value)
+        return union
+    if op == "$concat":
+        return None if any(value is None for value in args) else "".join(args)
+    if op == "$concatArrays":
+        return None if any(value is None for value in args) else [item for value in args for item in value]
+    if op == "$arrayElemAt":
+        values, index = args
+        return values[index] if values is not None and -len(values) <= index < len(values) else _MISSING
+    raise NotImplementedError(f"Expression operator {op} is not supported by this storage backend")
+
+# Updates
+
+def _apply_stage(doc: dict, stage: dict) -> dict:
+    (op, spec), = stage.items()
+    if op in ("$set", "$addFields"):
+        result = copy.deepcopy(doc)
+        for path, expr in spec.items():
+            value = evaluate(expr, doc)
+            if value is _MISSING:
+                unset_path(result, path)
+            else:
+                set_path(result, path, value)
+        return result
+    if op == "$unset":
+        result = copy.deepcopy(doc)
+        for path in [spec] if isinstance(spec, str) else spec:
+            unset_path(result, path)
+        return result
+    if op == "$project":
+        return project(doc, spec, computed=True)
+    if op in ("$replaceWith", "$replaceRoot"):
+        return evaluate(spec["newRoot"] if op == "$replaceRoot" else spec, doc)
+    raise NotImplementedError(f"Update pipeline stage {op} is not supported by this storage backend")
+
+def _element_filter(array_filters: list, identifier: str):
+    """Predicate for the array elements $[identifier] refers to"""
+    conditions = {}
+    for array_filter in array_filters or []:
+        for key, condition in array_filter.items():
+            if key == identifier or key.startswith(identifier + "."):
+                conditions[key[len(identifier) + 1:]] = condition
+    if not conditions:
+        raise ValueError(f"No array filter found for identifier '{identifier}'")
+    if "" in conditions:
+        return lambda element: _matches_condition([element], conditions[""])
+    return lambda element: isinstance(element, dict) and matches(element, conditions)
+
+def _expand_positional(doc: dict, path: str, array_filters: list) -> list:
+    """Concrete paths for a path with $[] / $[identifier] segments"""
+    if "$[" not in path:
+        return [path]
+    paths = [""]
+    for part in _split(path):
+        expanded = []
+        for prefix in paths:
+            if part.startswith("$[") and part.endswith("]"):
+                identifier = part[2:-1]
+                values = get_path(doc, prefix) if prefix else doc
+                if not isinstance(values, list):
+                    continue
+                keep = _element_filter(array_filters, identifier) if identifier else (lambda element: True)
+                expanded.extend(f"{prefix}.{i}" for i, element in enumerate(values) if keep(element))
+            else:
+                expanded.append(f"{prefix}.{part}" if prefix else part)
+        paths = expanded
+    return paths
+
+def apply_update(doc: dict, update, inserting: bool = False, array_filters: list = None) -> dict:
+    """Copy of doc with an update document or update pipeline applied"""
+    if isinstance(update, list):
+        result = doc
+        for stage in update:
+            result = _apply_stage(result, stage)
+        result["_id"] = doc["_id"]
+        return result
+
+    result = copy.deepcopy(doc)
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, arg in [(concrete, arg) for path, arg in fields.items()
+                          for concrete in _expand_positional(result, path, array_filters)]:
+            current = get_path(result, path, _MISSING)
+            if op in ("$set", "$setOnInsert"):
+                set_path(result, path, copy.deepcopy(arg))
+            elif op == "$unset":
+                unset_path(result, path)
+            elif op == "$inc":
+                set_path(result, path, arg if current is _MISSING or current is None else current + arg)
+            elif op == "$mul":
+                set_path(result, path, 0 if current is _MISSING or current is None else current * arg)
+            elif op in ("$min", "$max"):
+                if current is _MISSING or (compare(arg, current) < 0 if op == "$min" else compare(arg, current) > 0):
+                    set_path(result, path, arg)
+            elif op in ("$push", "$addToSet"):
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                values = [] if current is _MISSING or current is None else list(current)
+                for item in items:
+                    if op == "$push" or not any(compare(item, value) == 0 for value in values):
+                        values.append(copy.deepcopy(item))
+                if isinstance(arg, dict) and "$slice" in arg:
+                    size = arg["$slice"]
+                    values = values[size:] if size < 0 else values[:size]
+                set_path(result, path, values)
+            elif op in ("$pull", "$pullAll"):
+                if not isinstance(current, list):
+                    continue
+                if op == "$pullAll":
+                    kept = [value for value in current if not any(compare(value, item) == 0 for item in arg)]
+                elif isinstance(arg, dict) and not _is_operator_doc(arg):
+                    kept = [value for value in current if not (isinstance(value, dict) and matches(value, arg))]
+                else:
+                    kept = [value for value in current if not _matches_condition([value], arg)]
+                set_path(result, path, kept)
+            elif op == "$rename":
+                if current is not _MISSING:
+                    unset_path(result, path)
+                    set_path(result, arg, current)
+            elif op == "$currentDate":
+                set_path(result, path, datetime.datetime.utcnow())
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by this storage backend")
+    return result
+
+def _upsert_seed(query: dict) -> dict:
+    """New document for an upsert: the filter's equality conditions"""
+    seed = {}
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            for clause in condition:
+                for path, value in _upsert_seed(clause).items():
+                    set_path(seed, path, value)
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_doc(condition):
+            if "$eq" in condition:
+                set_path(seed, key, copy.deepcopy(condition["$eq"]))
+        else:
+            set_path(seed, key, copy.deepcopy(condition))
+    return seed
+
+def _is_update_document(update) -> bool:
+    return isinstance(update, list) or _is_operator_doc(update)
+
+# Projection and sorting
+
+def project(doc: dict, projection, computed: bool = False) -> dict:
+    """Apply a find projection (or a $project stage when computed)"""
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1) not in (0, False)
+    spec = {key: value for key, value in projection.items() if key != "_id"}
+    inclusive = any(value not in (0, False) for value in spec.values())
+    if not inclusive and spec:
+        result = copy.deepcopy(doc)
+        for path in spec:
+            unset_path(result, path)
+        if not include_id:
+            result.pop("_id", None)
+        return result
+
+    result = {}
+    if computed and projection.get("_id", 1) not in (0, 1, True, False):
+        result["_id"] = evaluate(projection["_id"], doc)
+    elif include_id and "_id" in doc:
+        result["_id"] = copy.deepcopy(doc["_id"])
+    for path, value in spec.items():
+        if computed and value not in (0, 1, True, False):
+            evaluated = evaluate(value, doc)
+            if evaluated is not _MISSING:
+                set_path(result, path, evaluated)
+            continue
+        found = get_path(doc, path, _MISSING)
+        if found is not _MISSING:
+            set_path(result, path, copy.deepcopy(found))
+    return result
+
+def _sort_spec(key_or_list, direction=None) -> list:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+def sort_documents(docs: list, spec: list) -> list:
+    def order(a, b):
+        for path, direction in spec:
+            result = compare(get_path(a, path), get_path(b, path))
+            if result:
+                return result * (1 if direction in (1, "asc", "ascending") else -1)
+        return 0
+    return sorted(docs, key=functools.cmp_to_key(order))
+
+# Aggregation
+
+_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$count")
+
+def _group(docs: list, spec: dict) -> list:
+    groups = {}
+    for doc in docs:
+        key = evaluate(spec["_id"], doc)
+        frozen = _freeze(key)
+        if frozen not in groups:
+            groups[frozen] = {"_id": key, "__values": {field: [] for field in spec if field != "_id"}}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            if op not in _ACCUMULATORS:
+                raise NotImplementedError(f"Accumulator {op} is not supported by this storage backend")
+            groups[frozen]["__values"][field].append(1 if op == "$count" else evaluate(expr, doc))
+
+    results = []
+    for group in groups.values():
+        result = {"_id": group["_id"]}
+        for field, values in group["__values"].items():
+            op = next(iter(spec[field]))
+            present = [value for value in values if value is not None and value is not _MISSING]
+            if op in ("$sum", "$count"):
+                result[field] = sum(v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool))
+            elif op == "$avg":
+                numbers = [v for v in present if isinstance(v, (int, float))]
+                result[field] = sum(numbers) / len(numbers) if numbers else None
+            elif op in ("$min", "$max"):
+                pick = min if op == "$min" else max
+                result[field] = pick(present, key=functools.cmp_to_key(compare)) if present else None
+            elif op == "$first":
+                result[field] = values[0] if values else None
+            elif op == "$last":
+                result[field] = values[-1] if values else None
+            elif op == "$push":
+                result[field] = present
+            elif op == "$addToSet":
+                result[field] = evaluate({"$setUnion": [{"$literal": present}]}, {})
+        results.append(result)
+    return results
+
+def _unwind(docs: list, spec) -> list:
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    path = spec["path"].lstrip("$")
+    keep_empty = spec.get("preserveNullAndEmptyArrays", False)
+    results = []
+    for doc in docs:
+        values = get_path(doc, path)
+        if isinstance(values, list) and values:
+            for value in values:
+                result = copy.deepcopy(doc)
+                set_path(result, path, value)
+                results.append(result)
+        elif values is not None and not isinstance(values, list):
+            results.append(doc)
+        elif keep_empty:
+            results.append(doc)
+    return results
+
+# Collections
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+class InsertManyResult:
+    def __init__(self, inserted_ids: list):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+class BulkWriteResult:
+    def __init__(self, counts: Dict[str, int], upserted_ids: dict):
+        self.inserted_count = counts["nInserted"]
+        self.matched_count = counts["nMatched"]
+        self.modified_count = counts["nModified"]
+        self.deleted_count = counts["nRemoved"]
+        self.upserted_count = counts["nUpserted"]
+        self.upserted_ids = upserted_ids
+        self.acknowledged = True
+
+class Cursor:
+    """Lazy result cursor with the Motor cursor methods AsyncDatabase uses"""
+
+    def __init__(self, load, collection=None, query=None):
+        self._load = load
+        self._collection = collection
+        self._query = query
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    async def _fetch(self) -> list:
+        if self._results is None:
+            docs = await self._load()
+            if self._sort:
+                docs = sort_documents(docs, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = docs
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> list:
+        docs = await self._fetch()
+        return list(docs[:length] if length else docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self._fetch():
+            yield doc
+
+    async def explain(self) -> dict:
+        indexes = self._collection._index_specs() if self._collection is not None else {}
+        return {"queryPlanner": {"winningPlan": plan_query(self._query or {}, self._sort, indexes)}}
+
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$in"}
+
+def _predicate_kind(condition) -> Optional[str]:
+    """'eq' or 'range' for a filter condition an index can seek on, else None"""
+    if not isinstance(condition, dict) or not any(str(op).startswith("$") for op in condition):
+        return "eq"
+    if set(condition) == {"$eq"}:
+        return "eq"
+    if set(condition) <= _RANGE_OPERATORS | {"$eq"}:
+        return "range"
+    return None
+
+def _index_fit(query: dict, keys: list, sort: Optional[list]) -> tuple:
+    """How well an index serves a filter and sort: (fields bound, sort provided)"""
+    bound = 0
+    for field, _ in keys:
+        kind = _predicate_kind(query[field]) if field in query else None
+        if kind is None:
+            break
+        bound += 1
+        if kind == "range":
+            break
+    # The index provides the sort if it continues the equality prefix in
+    # the sort's order (or exactly reversed)
+    equal = 0
+    for field, _ in keys:
+        if field in query and _predicate_kind(query[field]) == "eq":
+            equal += 1
+        else:
+            break
+    rest = keys[equal:equal + len(sort)] if sort else []
+    provides_sort = bool(sort) and len(rest) == len(sort) and all(
+        key == field for (key, _), (field, _) in zip(rest, sort)
+    ) and len({_direction(d) * _direction(s) for (_, d), (_, s) in zip(rest, sort)}) == 1
+    return bound, provides_sort
+
+def _direction(value) -> int:
+    return 1 if value in (1, "asc", "ascending") else -1
+
+def plan_query(query: dict, sort: Optional[list], indexes: Dict[str, list]) -> dict:
+    """The winning plan a MongoDB server would roughly pick for query and
+    sort given indexes (name -> key list), in explain()'s winningPlan shape"""
+    if "_id" in query and _predicate_kind(query["_id"]) == "eq" and not sort:
+        return {"stage": "IDHACK"}
+    if "$or" in query:
+        rest = {field: condition for field, condition in query.items() if field != "$or"}
+        branches = [plan_query(dict(rest, **branch), None, indexes) for branch in query["$or"]]
+        if all(branch["stage"] != "COLLSCAN" for branch in branches):
+            plan = {"stage": "FETCH", "inputStage": {"stage": "OR", "inputStages": [
+                branch.get("inputStage", branch) for branch in branches
+            ]}}
+            return {"stage": "SORT", "inputStage": plan} if sort else plan
+    best = None
+    for name, keys in indexes.items():
+        bound, provides_sort = _index_fit(query, keys, sort)
+        if not bound and not provides_sort:
+            continue
+        if best is None or (bound, provides_sort) > best[0]:
+            best = ((bound, provides_sort), name, keys)
+    if best is None:
+        plan = {"stage": "COLLSCAN"}
+        return {"stage": "SORT", "inputStage": plan} if sort else plan
+    (_, provides_sort), name, keys = best
+    plan = {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": name, "keyPattern": dict(keys)
+    }}
+    return plan if provides_sort or not sort else {"stage": "SORT", "inputStage": plan}
+
+def _counted(method):
+    """Count each call in the client's opcounters, like a server's"""
+    name = method.__name__
+    if asyncio.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            self._client.opcounters[name] += 1
+            return await method(self, *args, **kwargs)
+    else:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self._client.opcounters[name] += 1
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class Collection:
+    """Motor-style collection over a backend's document store.
+
+    Reads work on copies; every write runs inside the client's write lock,
+    so the read-modify-write of one operation is atomic with respect to
+    every other write, like a single-document update on the server."""
+
+    def __init__(self, database, name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+
+    @property
+    def _client(self):
+        return self.database.client
+
+    def with_options(self, **kwargs):
+        return self
+
+    # Storage primitives, delegated to the client
+    async def _all(self) -> list:
+        return await self._client._all(self.full_name)
+
+    async def _get(self, doc_id) -> Optional[dict]:
+        return await self._client._get(self.full_name, doc_id)
+
+    async def _put(self, doc: dict) -> None:
+        await self._client._put(self.full_name, doc)
+
+    async def _insert(self, doc: dict) -> None:
+        await self._client._insert(self.full_name, doc)
+
+    async def _remove(self, doc_id) -> None:
+        await self._client._remove(self.full_name, doc_id)
+
+    @staticmethod
+    def _id_lookup(query):
+        """The _id an equality filter pins, so reads skip the scan"""
+        if not query or "_id" not in query:
+            return None
+        condition = query["_id"]
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                return condition["$eq"]
+            return None
+        return condition
+
+    async def _matching(self, query, sort=None) -> list:
+        doc_id = self._id_lookup(query)
+        if doc_id is not None:
+            doc = await self._get(doc_id)
+            docs = [doc] if doc is not None else []
+        else:
+            docs = await self._all()
+        docs = [doc for doc in docs if matches(doc, query)]
+        if sort:
+            docs = sort_documents(docs, _sort_spec(sort))
+        return docs
+
+    # Reads
+    @_counted
+    async def find_one(self, filter=None, projection=None, *args, sort=None, session=None, **kwargs) -> Optional[dict]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        docs = await self._matching(filter, sort)
+        return project(docs[0], projection) if docs else None
+
+    @_counted
+    def find(self, filter=None, projection=None, *args, sort=None, skip: int = 0, limit: int = 0, session=None, **kwargs) -> Cursor:
+        async def load():
+            return [project(doc, projection) for doc in await self._matching(filter)]
+        cursor = Cursor(load, self, filter)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    @_counted
+    async def count_documents(self, filter=None, *args, session=None, **kwargs) -> int:
+        docs = await self._matching(filter)
+        skip, limit = kwargs.get("skip", 0), kwargs.get("limit", 0)
+        docs = docs[skip:]
+        return len(docs[:limit] if limit else docs)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(await self._all())
+
+    @_counted
+    async def distinct(self, key: str, filter=None, session=None, **kwargs) -> list:
+        values = []
+        for doc in await self._matching(filter):
+            for value in _candidates(_resolve(doc, _split(key))):
+                if value is not None and not isinstance(value, list) and not any(compare(value, seen) == 0 for seen in values):
+                    values.append(value)
+        return values
+
+    @_counted
+    def aggregate(self, pipeline: list, *args, session=None, **kwargs) -> Cursor:
+        async def load():
+            return await self._aggregate(pipeline)
+        return Cursor(load)
+
+    async def _aggregate(self, pipeline: list) -> list:
+        stages = list(pipeline)
+        if stages and "$match" in stages[0]:
+            docs = await self._matching(stages.pop(0)["$match"])
+        else:
+            docs = await self._all()
+        docs = [copy.deepcopy(doc) for doc in docs]
+        for stage in stages:
+            (op, spec), = stage.items()
+            if op == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif op in ("$set", "$addFields", "$unset", "$project", "$replaceWith", "$replaceRoot"):
+                docs = [_apply_stage(doc, stage) for doc in docs]
+            elif op == "$group":
+                docs = _group(docs, spec)
+            elif op == "$sort":
+                docs = sort_documents(docs, _sort_spec(spec))
+            elif op == "$skip":
+                docs = docs[spec:]
+            elif op == "$limit":
+                docs = docs[:spec]
+            elif op == "$count":
+                docs = [{spec: len(docs)}] if docs else []
+            elif op == "$unwind":
+                docs = _unwind(docs, spec)
+            elif op == "$sample":
+                docs = random.sample(docs, min(spec["size"], len(docs)))
+            elif op == "$merge":
+                await self._merge(docs, spec)
+                docs = []
+            else:
+                raise NotImplementedError(f"Pipeline stage {op} is not supported by this storage backend")
+        return docs
+
+    async def _merge(self, docs: list, spec) -> None:
+        if isinstance(spec, str):
+            spec = {"into": spec}
+        target = spec["into"]
+        target = self.database[target] if isinstance(target, str) else self.database.client[target["db"]][target["coll"]]
+        when_matched = spec.get("whenMatched", "merge")
+        when_not_matched = spec.get("whenNotMatched", "insert")
+        async with self._client._write():
+            for doc in docs:
+                doc.setdefault("_id", _new_id())
+                existing = await target._get(doc["_id"])
+                if existing is None:
+                    if when_not_matched == "insert":
+                        await target._put(doc)
+                    elif when_not_matched == "fail":
+                        raise DuplicateKeyError("$merge target document not found")
+                elif when_matched == "replace":
+                    await target._put(doc)
+                elif when_matched == "merge":
+                    await target._put({**existing, **doc})
+                elif when_matched == "fail":
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {target.full_name}", 11000)
+
+    # Writes
+    @_counted
+    async def insert_one(self, document: dict, *args, session=None, **kwargs) -> InsertOneResult:
+        document.setdefault("_id", _new_id())
+        async with self._client._write():
+            await self._insert(copy.deepcopy(document))
+        return InsertOneResult(document["_id"])
+
+    @_counted
+    async def insert_many(self, documents, ordered: bool = True, *args, session=None, **kwargs) -> InsertManyResult:
+        documents = list(documents)
+        inserted, errors = [], []
+        async with self._client._write():
+            for index, document in enumerate(documents):
+                document.setdefault("_id", _new_id())
+                try:
+                    await self._insert(copy.deepcopy(document))
+                    inserted.append(document["_id"])
+                except DuplicateKeyError as e:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+            })
+        return InsertManyResult(inserted)
+
+    async def _update(self, filter, update, upsert: bool, multi: bool, replace: bool = False, array_filters: list = None):
+        """Locked update; returns (matched, modified, upserted_id, before, after)"""
+        if not replace and not _is_update_document(update):
+            raise ValueError("update only works with $ operators or pipelines")
+        docs = await self._matching(filter)
+        if not multi:
+            docs = docs[:1]
+        matched = modified = 0
+        before = after = None
+        for doc in docs:
+            if replace:
+                updated = {**copy.deepcopy(update), "_id": doc["_id"]}
+            else:
+                updated = apply_update(doc, update, array_filters=array_filters)
+            if updated.get("_id") != doc.get("_id"):
+                raise ValueError("Performing an update on the path '_id' would modify the immutable field '_id'")
+            matched += 1
+            if updated != doc:
+                modified += 1
+                await self._put(updated)
+            if before is None:
+                before, after = doc, updated
+        if matched or not upsert:
+            return matched, modified, None, before, after
+
+        seed = _upsert_seed(filter)
+        if replace:
+            created = {**seed, **copy.deepcopy(update)}
+        else:
+            created = apply_update({"_id": seed.pop("_id", None), **seed}, update, inserting=True, array_filters=array_filters)
+        if created.get("_id") is None:
+            created["_id"] = _new_id()
+        await self._insert(created)
+        return 0, 0, created["_id"], None, created
+
+    @_counted
+    async def update_one(self, filter, update, upsert: bool = False, *args, array_filters: list = None,
+                         session=None, **kwargs) -> UpdateResult:
+        async with self._client._write():
+            matched, modified, upserted_id, _, _ = await self._update(filter, update, upsert, multi=False, array_filters=array_filters)
+        return UpdateResult(matched, modified, upserted_id)
+
+    @_counted
+    async def update_many(self, filter, update, upsert: bool = False, *args, array_filters: list = None,
+                          session=None, **kwargs) -> UpdateResult:
+        async with self._client._write():
+            matched, modified, upserted_id, _, _ = await self._update(filter, update, upsert, multi=True, array_filters=array_filters)
+        return UpdateResult(matched, modified, upserted_id)
+
+    @_counted
+    async def replace_one(self, filter, replacement: dict, upsert: bool = False, *args, session=None, **kwargs) -> UpdateResult:
+        async with self._client._write():
+            matched, modified, upserted_id, _, _ = await self._update(filter, replacement, upsert, multi=False, replace=True)
+        return UpdateResult(matched, modified, upserted_id)
+
+    @_counted
+    async def find_one_and_update(self, filter, update, projection=None, sort=None, upsert: bool = False,
+                                  return_document=ReturnDocument.BEFORE, *args, array_filters: list = None,
+                                  session=None, **kwargs) -> Optional[dict]:
+        async with self._client._write():
+            if sort:
+                docs = await self._matching(filter, sort)
+                filter = {"_id": docs[0]["_id"]} if docs else filter
+            _, _, _, before, after = await self._update(filter, update, upsert, multi=False, array_filters=array_filters)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return project(doc, projection) if doc is not None else None
+
+    @_counted
+    async def find_one_and_replace(self, filter, replacement: dict, projection=None, sort=None, upsert: bool = False,
+                                   return_document=ReturnDocument.BEFORE, *args, session=None, **kwargs) -> Optional[dict]:
+        async with self._client._write():
+            _, _, _, before, after = await self._update(filter, replacement, upsert, multi=False, replace=True)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return project(doc, projection) if doc is not None else None
+
+    @_counted
+    async def find_one_and_delete(self, filter, projection=None, sort=None, *args, session=None, **kwargs) -> Optional[dict]:
+        async with self._client._write():
+            docs = await self._matching(filter, sort)
+            if not docs:
+                return None
+            await self._remove(docs[0]["_id"])
+        return project(docs[0], projection)
+
+    @_counted
+    async def delete_one(self, filter, *args, session=None, **kwargs) -> DeleteResult:
+        async with self._client._write():
+            docs = await self._matching(filter)
+            if docs:
+                await self._remove(docs[0]["_id"])
+        return DeleteResult(1 if docs else 0)
+
+    @_counted
+    async def delete_many(self, filter, *args, session=None, **kwargs) -> DeleteResult:
+        async with self._client._write():
+            docs = await self._matching(filter)
+            for doc in docs:
+                await self._remove(doc["_id"])
+        return DeleteResult(len(docs))
+
+    @_counted
+    async def bulk_write(self, requests: list, ordered: bool = True, *args, session=None, **kwargs) -> BulkWriteResult:
+        """Run pymongo write models (UpdateOne, InsertOne, ...) in order"""
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0}
+        upserted, errors = {}, []
+        async with self._client._write():
+            for index, request in enumerate(requests):
+                kind = type(request).__name__
+                try:
+                    if kind == "InsertOne":
+                        document = request._doc
+                        document.setdefault("_id", _new_id())
+                        await self._insert(copy.deepcopy(document))
+                        counts["nInserted"] += 1
+                    elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                        matched, modified, upserted_id, _, _ = await self._update(
+                            request._filter, request._doc, request._upsert,
+                            multi=kind == "UpdateMany", replace=kind == "ReplaceOne"
+                        )
+                        counts["nMatched"] += matched
+                        counts["nModified"] += modified
+                        if upserted_id is not None:
+                            counts["nUpserted"] += 1
+                            upserted[index] = upserted_id
+                    elif kind in ("DeleteOne", "DeleteMany"):
+                        docs = await self._matching(request._filter)
+                        if kind == "DeleteOne":
+                            docs = docs[:1]
+                        for doc in docs:
+                            await self._remove(doc["_id"])
+                        counts["nRemoved"] += len(docs)
+                    else:
+                        raise NotImplementedError(f"Bulk write model {kind} is not supported by this storage backend")
+                except (DuplicateKeyError, ValueError) as e:
+                    errors.append({"index": index, "code": getattr(e, "code", None), "errmsg": str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({
+                "writeErrors": errors, "writeConcernErrors": [],
+                "upserted": [{"index": i, "_id": _id} for i, _id in upserted.items()], **counts
+            })
+        return BulkWriteResult(counts, upserted)
+
+    # Indexes are recorded for explain() and index_information(), but reads
+    # don't use them
+    def _index_specs(self) -> Dict[str, list]:
+        return dict(self._client._indexes[self.full_name], _id_=[("_id", 1)])
+
+    async def create_index(self, keys, **kwargs) -> str:
+        keys = _sort_spec(keys, 1)
+        name = kwargs.get("name") or "_".join(f"{key}_{direction}" for key, direction in keys)
+        self._client._indexes[self.full_name][name] = keys
+        return name
+
+    async def create_indexes(self, indexes: list, **kwargs) -> list:
+        return [
+            await self.create_index(list(model.document["key"].items()), name=model.document["name"])
+            for model in indexes
+        ]
+
+    async def index_information(self, **kwargs) -> dict:
+        return {name: {"key": keys} for name, keys in self._index_specs().items()}
+
+    async def drop_index(self, index, **kwargs) -> None:
+        if not isinstance(index, str):
+            index = "_".join(f"{key}_{direction}" for key, direction in _sort_spec(index, 1))
+        self._client._indexes[self.full_name].pop(index, None)
+
+    async def drop(self, **kwargs) -> None:
+        self._client._indexes.pop(self.full_name, None)
+        await self._client._drop(self.full_name)
+
+class Database:
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> Collection:
+        if name not in self._collections:
+            self._collections[name] = Collection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> Collection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> Collection:
+        return self[name]
+
+    async def list_collection_names(self, **kwargs) -> list:
+        return await self.client._collection_names(self.name)
+
+    async def create_collection(self, name: str, **kwargs) -> Collection:
+        return self[name]
+
+    async def drop_collection(self, name: str, **kwargs) -> None:
+        await self[name].drop()
+
+    async def command(self, command, *args, **kwargs) -> dict:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ("ping", "ismaster", "isMaster", "hello"):
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Command {name} is not supported by this storage backend")
+
+class Session:
+    """Session/transaction stand-in: transactions are accepted but not
+    isolated, see the module docstring"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self):
+        yield self
+
+    def start_transaction(self, *args, **kwargs):
+        return self._transaction()
+
+    async def commit_transaction(self) -> None:
+        pass
+
+    async def abort_transaction(self) -> None:
+        pass
+
+    async def end_session(self) -> None:
+        pass
+
+class StorageClient:
+    """Base for the non-Mongo backends: the Motor client surface plus five
+    storage primitives (_all, _get, _put, _insert, _remove) per collection.
+
+    _write() serializes every write operation, which is what gives the
+    per-operation atomicity described in the module docstring."""
+
+    def __init__(self):
+        self._databases = {}
+        self._write_lock = None
+        self._indexes = defaultdict(dict)  # collection -> index name -> key list
+        self.opcounters = defaultdict(int)
+
+    def __getitem__(self, name: str) -> Database:
+        if name not in self._databases:
+            self._databases[name] = Database(self, name)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> Database:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs) -> Database:
+        return self[name]
+
+    async def start_session(self, **kwargs) -> Session:
+        return Session()
+
+    @contextlib.asynccontextmanager
+    async def _write(self):
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            yield
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        self.close()
+
+    # Storage primitives
+    async def _all(self, collection: str) -> list:
+        raise NotImplementedError
+
+    async def _get(self, collection: str, doc_id) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def _put(self, collection: str, doc: dict) -> None:
+        raise NotImplementedError
+
+    async def _insert(self, collection: str, doc: dict) -> None:
+        raise NotImplementedError
+
+    async def _remove(self, collection: str, doc_id) -> None:
+        raise NotImplementedError
+
+    async def _drop(self, collection: str) -> None:
+        raise NotImplementedError
+
+    async def _collection_names(self, database: str) -> list:
+        raise NotImplementedError
+
+class MemoryClient(StorageClient):
+    """Process-local backend: dicts of documents keyed by _id.
+
+    Fast and deterministic, for benchmarks and local runs; nothing
+    survives a restart."""
+
+    def __init__(self):
+        super().__init__()
+        self._collections = {}
+
+    def _store(self, collection: str) -> dict:
+        return self._collections.setdefault(collection, {})
+
+    async def _all(self, collection: str) -> list:
+        return list(self._store(collection).values())
+
+    async def _get(self, collection: str, doc_id) -> Optional[dict]:
+        return self._store(collection).get(_freeze(doc_id))
+
+    async def _put(self, collection: str, doc: dict) -> None:
+        self._store(collection)[_freeze(doc["_id"])] = doc
+
+    async def _insert(self, collection: str, doc: dict) -> None:
+        store = self._store(collection)
+        key = _freeze(doc["_id"])
+        if key in store:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {collection} dup key: {{ _id: {doc['_id']!r} }}", 11000)
+        store[key] = doc
+
+    async def _remove(self, collection: str, doc_id) -> None:
+        self._store(collection).pop(_freeze(doc_id), None)
+
+    async def _drop(self, collection: str) -> None:
+        self._collections.pop(collection, None)
+
+    async def _collection_names(self, database: str) -> list:
+        prefix = f"{database}."
+        return [name[len(prefix):] for name, docs in self._collections.items() if name.startswith(prefix) and docs]
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.isoformat()}
+    if ObjectId is not None and isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode(obj: dict):
+    if len(obj) == 1:
+        if "$date" in obj:
+            return datetime.datetime.fromisoformat(obj["$date"])
+        if "$oid" in obj and ObjectId is not None:
+            return ObjectId(obj["$oid"])
+    return obj
+
+def dumps(doc) -> str:
+    return json.dumps(doc, default=_encode, separators=(",", ":"))
+
+def loads(data: str):
+    return json.loads(data, object_hook=_decode)
+
+class SQLiteClient(StorageClient):
+    """aiosqlite backend: one table of JSON documents keyed by
+    (collection, _id), in WAL mode.
+
+    Lookups by _id use the primary key; every other filter is evaluated in
+    Python over the collection, so this is meant for local runs and
+    benchmarks, not production-sized data. Each write operation is one
+    SQLite transaction."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._connection = None
+        self._connect_lock = None
+
+    async def _conn(self):
+        if self._connection is None:
+            if self._connect_lock is None:
+                self._connect_lock = asyncio.Lock()
+            async with self._connect_lock:
+                if self._connection is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = await aiosqlite.connect(self.path)
+                    await connection.execute("PRAGMA journal_mode=WAL")
+                    await connection.execute("PRAGMA synchronous=NORMAL")
+                    await connection.execute("""
+                        CREATE TABLE IF NOT EXISTS documents (
+                            collection TEXT NOT NULL,
+                            id TEXT NOT NULL,
+                            doc TEXT NOT NULL,
+                            PRIMARY KEY (collection, id)
+                        ) WITHOUT ROWID
+                    """)
+                    await connection.commit()
+                    self._connection = connection
+        return self._connection
+
+    @contextlib.asynccontextmanager
+    async def _write(self):
+        async with super()._write():
+            connection = await self._conn()
+            await connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                await connection.rollback()
+                raise
+            await connection.commit()
+
+    async def _all(self, collection: str) -> list:
+        connection = await self._conn()
+        async with connection.execute("SELECT doc FROM documents WHERE collection = ?", (collection,)) as cursor:
+            return [loads(row[0]) for row in await cursor.fetchall()]
+
+    async def _get(self, collection: str, doc_id) -> Optional[dict]:
+        connection = await self._conn()
+        async with connection.execute(
+            "SELECT doc FROM documents WHERE collection = ? AND id = ?", (collection, dumps(doc_id))
+        ) as cursor:
+            row = await cursor.fetchone()
+        return loads(row[0]) if row else None
+
+    async def _put(self, collection: str, doc: dict) -> None:
+        connection = await self._conn()
+        await connection.execute(
+            "INSERT OR REPLACE INTO documents (collection, id, doc) VALUES (?, ?, ?)",
+            (collection, dumps(doc["_id"]), dumps(doc))
+        )
+
+    async def _insert(self, collection: str, doc: dict) -> None:
+        connection = await self._conn()
+        try:
+            await connection.execute(
+                "INSERT INTO documents (collection, id, doc) VALUES (?, ?, ?)",
+                (collection, dumps(doc["_id"]), dumps(doc))
+            )
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {collection} dup key: {{ _id: {doc['_id']!r} }}", 11000)
+
+    async def _remove(self, collection: str, doc_id) -> None:
+        connection = await self._conn()
+        await connection.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, dumps(doc_id)))
+
+    async def _drop(self, collection: str) -> None:
+        async with self._write():
+            await self._connection.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+
+    async def _collection_names(self, database: str) -> list:
+        connection = await self._conn()
+        async with connection.execute(
+            "SELECT DISTINCT collection FROM documents WHERE collection LIKE ?", (f"{database}.%",)
+        ) as cursor:
+            return [row[0][len(database) + 1:] for row in await cursor.fetchall()]
+
+    async def aclose(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+# Backends selectable through DB_BACKEND
+BACKENDS = ("mongo", "memory", "sqlite")
+
+def create_client(config: dict, mongo_factory):
+    """Client for config["DB_BACKEND"]; mongo_factory builds the Motor client"""
+    backend = (config.get("DB_BACKEND") or "mongo").lower()
+    if backend == "memory":
+        return MemoryClient()
+    if backend == "sqlite":
+        return SQLiteClient(config.get("DB_SQLITE_PATH") or "data/bronxbot.db")
+    if backend != "mongo":
+        raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return mongo_factory()